@@ -1,6 +1,5 @@
 
 import logging
-import io
 import time
 from fastapi import APIRouter, UploadFile, File, HTTPException, status, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -28,8 +27,7 @@ async def process_pdf_for_ai(file: UploadFile = File(..., description="Arquivo P
     logger.info(f"Recebido arquivo para processamento: {file.filename}")
     try:
         pdf_content = await file.read()
-        pdf_stream = io.BytesIO(pdf_content)
-        full_text = text_processor.extract_text_from_pdf(pdf_stream)
+        full_text = await text_processor.extract_text_from_pdf_async(pdf_content)
         if not full_text.strip():
              raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
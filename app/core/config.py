@@ -1,4 +1,6 @@
 
+import os
+
 # Configurações para o processamento de texto.
 # Regra geral para estimativa: 1 token ~ 4 caracteres.
 # O alvo de 500-800 tokens se traduz em aproximadamente 2000-3200 caracteres.
@@ -10,3 +12,11 @@ CHUNK_OVERLAP: int = 200
 
 # Timeout em segundos para chamadas à API de IA. Evita que a requisição fique presa.
 AI_REQUEST_TIMEOUT: int = 60
+
+# Extração de PDF em paralelo.
+# Número de processos usados para extrair páginas de um PDF.
+PDF_EXTRACTION_WORKERS: int = int(os.environ.get("PDF_EXTRACTION_WORKERS", max(1, min(4, os.cpu_count() or 1))))
+# Limite de páginas por documento; PDFs maiores são recusados.
+PDF_MAX_PAGES: int = int(os.environ.get("PDF_MAX_PAGES", 800))
+# Mínimo de páginas por tarefa enviada ao pool, para não pagar o custo de abrir o PDF por poucas páginas.
+PDF_MIN_PAGES_PER_TASK: int = 8
@@ -0,0 +1,102 @@
+
+import asyncio
+import io
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Tuple, Union
+
+import pdfplumber
+
+from app.core.config import PDF_EXTRACTION_WORKERS, PDF_MAX_PAGES, PDF_MIN_PAGES_PER_TASK
+
+logger = logging.getLogger(__name__)
+
+# Um PDF pode ser passado como caminho de arquivo ou como bytes.
+PdfSource = Union[str, bytes]
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def _open_pdf(source: PdfSource):
+    if isinstance(source, (bytes, bytearray)):
+        return pdfplumber.open(io.BytesIO(source))
+    return pdfplumber.open(source)
+
+
+# --- Funções executadas nos processos do pool ---
+
+def _count_pages(source: PdfSource) -> int:
+    with _open_pdf(source) as pdf:
+        return len(pdf.pages)
+
+
+def _extract_page_range(source: PdfSource, start: int, end: int) -> List[str]:
+    with _open_pdf(source) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages[start:end]]
+
+
+# --- Gerenciamento do pool ---
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        logger.info(f"Iniciando pool de extração de PDF com {PDF_EXTRACTION_WORKERS} processos.")
+        _executor = ProcessPoolExecutor(max_workers=PDF_EXTRACTION_WORKERS)
+    return _executor
+
+
+def shutdown_executor() -> None:
+    """Encerra o pool de processos. Chamado no shutdown da aplicação."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def split_page_ranges(total_pages: int, workers: int, min_pages_per_task: int) -> List[Tuple[int, int]]:
+    """Divide as páginas em intervalos [início, fim) contíguos, um por tarefa."""
+    if total_pages <= 0:
+        return []
+    pages_per_task = max(min_pages_per_task, -(-total_pages // max(1, workers)))
+    return [
+        (start, min(start + pages_per_task, total_pages))
+        for start in range(0, total_pages, pages_per_task)
+    ]
+
+
+async def extract_pages(source: PdfSource) -> List[str]:
+    """
+    Extrai o texto de cada página do PDF em paralelo, fora do event loop.
+
+    As páginas são divididas em intervalos processados no pool de processos e
+    o resultado é devolvido na ordem original das páginas.
+    """
+    global _executor
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    try:
+        total_pages = await loop.run_in_executor(executor, _count_pages, source)
+        if total_pages > PDF_MAX_PAGES:
+            raise ValueError(
+                f"O PDF possui {total_pages} páginas, acima do limite de {PDF_MAX_PAGES} páginas por documento."
+            )
+
+        ranges = split_page_ranges(total_pages, PDF_EXTRACTION_WORKERS, PDF_MIN_PAGES_PER_TASK)
+        logger.info(f"Extraindo {total_pages} páginas em {len(ranges)} tarefas.")
+        results = await asyncio.gather(*(
+            loop.run_in_executor(executor, _extract_page_range, source, start, end)
+            for start, end in ranges
+        ))
+    except ValueError:
+        raise
+    except BrokenProcessPool as e:
+        # Um processo morreu (ex: falta de memória); recria o pool na próxima chamada.
+        logger.error(f"Pool de extração de PDF corrompido: {e}")
+        _executor = None
+        raise ValueError("Não foi possível processar o arquivo PDF.")
+    except Exception as e:
+        logger.error(f"Erro ao extrair texto do PDF: {e}")
+        raise ValueError("Não foi possível processar o arquivo PDF.")
+
+    return [text for page_texts in results for text in page_texts]
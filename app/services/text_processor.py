@@ -10,6 +10,7 @@ from fastapi import HTTPException, status
 
 from app.core.config import CHUNK_SIZE, CHUNK_OVERLAP
 from app.services.ai_service import call_google_ai_async
+from app.services import pdf_extractor
 from app.repositories import summary_cache_repository
 
 logging.basicConfig(level=logging.INFO)
@@ -28,6 +29,13 @@ def extract_text_from_pdf(pdf_file_stream: IO[bytes]) -> str:
         logger.error(f"Erro ao extrair texto do PDF: {e}")
         raise ValueError("Não foi possível processar o arquivo PDF.")
 
+async def extract_text_from_pdf_async(pdf_source: pdf_extractor.PdfSource) -> str:
+    """Versão assíncrona de extract_text_from_pdf que extrai as páginas em um pool de processos."""
+    pages = await pdf_extractor.extract_pages(pdf_source)
+    full_text = "".join(pages)
+    logger.info(f"Texto extraído com sucesso. Total de {len(full_text)} caracteres em {len(pages)} páginas.")
+    return full_text
+
 def chunk_text(text: str) -> List[str]:
     if not text:
         return []
@@ -1,49 +1,103 @@
 
+import asyncio
+import json
 import logging
-import io
 import time
-from fastapi import APIRouter, UploadFile, File, HTTPException, status, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, status, Depends, Request, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..services import text_processor, ai_service
-from ..schemas.upload import PDFProcessResponse
-from ..schemas.summary import SummaryRequest, SummaryResponse
+from ..services import text_processor, ai_service, ai_scheduler, ai_resilience, upload_spool, job_queue, summary_cache, document_store
+from ..schemas.upload import PDFProcessResponse, ExtractionCacheStatsResponse
+from ..schemas.summary import (
+    SummaryRequest, SummaryResponse, MultiLevelSummaryRequest, MultiLevelSummaryResponse
+)
 from ..schemas.generation import (
     QuizRequest, QuizResponse,
     FlashcardRequest, FlashcardResponse,
     StudyPlanRequest, StudyPlanResponse,
     QuestionRequest, QuestionResponse
 )
-from ..database.database import get_db
+from ..schemas.job import JobStatusResponse
+from ..core.config import JOB_POLL_INTERVAL
+from ..database.database import get_db, AsyncSessionLocal
+from ..database.models import JOB_SUCCEEDED, JOB_FAILED
+from ..repositories import extraction_cache_repository, generation_job_repository
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Descrição do parâmetro `compact` dos endpoints de upload.
+_COMPACT_DESCRIPTION = (
+    "Mantém o texto no servidor e retorna document_handle e chunk_offsets em vez dos chunks. "
+    "Envie o document_handle aos endpoints de geração no lugar de chunks/text."
+)
+
+def _build_pdf_response(
+    filename: str, full_text: str, offsets, page_offsets, cache_key: str, compact: bool
+) -> PDFProcessResponse:
+    if compact:
+        return PDFProcessResponse(
+            filename=filename, total_chunks=len(offsets), document_handle=cache_key,
+            chunk_offsets=offsets, page_offsets=page_offsets
+        )
+    text_chunks = text_processor.chunks_from_offsets(full_text, offsets)
+    return PDFProcessResponse(filename=filename, total_chunks=len(text_chunks), chunks=text_chunks)
+
+async def _process_spooled_pdf(
+    filename: str, spooled: upload_spool.SpooledUpload, db: AsyncSession, compact: bool = False
+) -> PDFProcessResponse:
+    """Extrai e fatia o texto de um PDF já gravado em disco, reaproveitando o cache de extração."""
+    cache_key = text_processor.create_extraction_key(spooled.sha256)
+    cached = await extraction_cache_repository.get_cached_extraction(db, cache_key)
+    if cached:
+        logger.info(f"Cache de extração HIT para {filename} ({spooled.sha256})")
+        offsets = extraction_cache_repository.get_chunk_offsets(cached)
+        page_offsets = extraction_cache_repository.get_page_offsets(cached)
+        return _build_pdf_response(filename, cached.full_text, offsets, page_offsets, cache_key, compact)
+
+    # O caminho do arquivo é enviado ao pool de extração, que abre o PDF direto do disco.
+    full_text, page_offsets = await text_processor.extract_document_async(await spooled.ensure_path())
+    if not full_text.strip():
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="O PDF parece estar vazio ou não contém texto extraível."
+        )
+    offsets = text_processor.chunk_offsets(full_text)
+    stored = await extraction_cache_repository.save_extraction_to_cache(
+        db, cache_key=cache_key, pdf_sha256=spooled.sha256, full_text=full_text,
+        chunk_offsets=offsets, page_offsets=page_offsets
+    )
+    if compact and not stored:
+        # Sem o texto no servidor não há handle válido; responde com os chunks completos.
+        logger.info(f"Arquivo {filename} grande demais para o modo compacto; retornando os chunks.")
+        compact = False
+    logger.info(f"Arquivo {filename} processado. Total de chunks: {len(offsets)}")
+    return _build_pdf_response(filename, full_text, offsets, page_offsets, cache_key, compact)
+
 @router.post(
     "/upload-pdf/",
     response_model=PDFProcessResponse,
     tags=["Processamento de PDF"],
     summary="Processa um PDF para preparação de IA"
 )
-async def process_pdf_for_ai(file: UploadFile = File(..., description="Arquivo PDF a ser processado.")):
+async def process_pdf_for_ai(
+    file: UploadFile = File(..., description="Arquivo PDF a ser processado."),
+    compact: bool = Query(False, description=_COMPACT_DESCRIPTION),
+    db: AsyncSession = Depends(get_db)
+):
     if not file.filename or not file.filename.lower().endswith(".pdf"):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Formato de arquivo inválido. Por favor, envie um PDF."
         )
     logger.info(f"Recebido arquivo para processamento: {file.filename}")
+    spooled = None
     try:
-        pdf_content = await file.read()
-        pdf_stream = io.BytesIO(pdf_content)
-        full_text = text_processor.extract_text_from_pdf(pdf_stream)
-        if not full_text.strip():
-             raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail="O PDF parece estar vazio ou não contém texto extraível."
-            )
-        text_chunks = text_processor.chunk_text(full_text)
-        logger.info(f"Arquivo {file.filename} processado. Total de chunks: {len(text_chunks)}")
-        return PDFProcessResponse(filename=file.filename, total_chunks=len(text_chunks), chunks=text_chunks)
+        spooled = await upload_spool.spool_upload_file(file)
+        return await _process_spooled_pdf(file.filename, spooled, db, compact)
+    except HTTPException:
+        raise
     except ValueError as e:
         logger.error(f"Erro de valor ao processar {file.filename}: {e}")
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
@@ -51,8 +105,138 @@ async def process_pdf_for_ai(file: UploadFile = File(..., description="Arquivo P
         logger.error(f"Erro inesperado ao processar {file.filename}: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Ocorreu um erro interno ao processar o arquivo.")
     finally:
+        if spooled:
+            spooled.cleanup()
         await file.close()
 
+@router.post(
+    "/upload-pdf-stream/",
+    response_model=PDFProcessResponse,
+    tags=["Processamento de PDF"],
+    summary="Processa um PDF enviado como corpo bruto da requisição (application/pdf)"
+)
+async def process_pdf_stream_for_ai(
+    request: Request,
+    filename: str = Query(..., description="Nome do arquivo PDF enviado."),
+    compact: bool = Query(False, description=_COMPACT_DESCRIPTION),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Variante de /upload-pdf/ sem multipart: o corpo da requisição é o próprio PDF.
+
+    O corpo é gravado em disco em blocos à medida que chega, sem nunca ficar
+    inteiro em memória.
+    """
+    if not filename.lower().endswith(".pdf"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato de arquivo inválido. Por favor, envie um PDF."
+        )
+    logger.info(f"Recebido arquivo (stream) para processamento: {filename}")
+    spooled = None
+    try:
+        spooled = await upload_spool.spool_stream(request.stream())
+        return await _process_spooled_pdf(filename, spooled, db, compact)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        logger.error(f"Erro de valor ao processar {filename}: {e}")
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro inesperado ao processar {filename}: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Ocorreu um erro interno ao processar o arquivo.")
+    finally:
+        if spooled:
+            spooled.cleanup()
+
+@router.get(
+    "/cache/extraction/stats/",
+    response_model=ExtractionCacheStatsResponse,
+    tags=["Processamento de PDF"],
+    summary="Estatísticas de hit/miss do cache de extração deste worker"
+)
+async def get_extraction_cache_stats():
+    return ExtractionCacheStatsResponse(**extraction_cache_repository.get_extraction_cache_stats())
+
+@router.get(
+    "/cache/generation/stats/",
+    tags=["Geração de Conteúdo"],
+    summary="Acertos em memória, no banco e falhas do cache de cada gerador neste worker"
+)
+async def get_generation_cache_stats():
+    return ai_service.get_generation_cache_stats()
+
+@router.get(
+    "/cache/summary/stats/",
+    tags=["Geração de Conteúdo"],
+    summary="Acertos por camada (memória, negativa, banco) do cache de resumos neste worker"
+)
+async def get_summary_cache_stats():
+    return summary_cache.get_summary_cache_stats()
+
+@router.get(
+    "/ai/scheduler/stats/",
+    tags=["Geração de Conteúdo"],
+    summary="Filas do agendador de chamadas à IA, latências por tipo de chamada e estado do circuit breaker"
+)
+async def get_ai_scheduler_stats():
+    return {**ai_scheduler.scheduler.stats(), "resilience": ai_resilience.stats()}
+
+_EMPTY_SUMMARY_DETAIL = "Não há conteúdo para gerar um resumo."
+
+@router.post(
+    "/summarize-pdf/",
+    response_model=SummaryResponse,
+    tags=["Geração de Conteúdo"],
+    summary="Resume um PDF diretamente, resumindo os chunks enquanto as páginas são extraídas"
+)
+async def summarize_pdf(
+    file: UploadFile = File(..., description="Arquivo PDF a ser resumido."),
+    level: str = Query(..., description="Nível do aluno."),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Equivale a /upload-pdf/ seguido de /generate-summary/, em uma só requisição.
+
+    Se o PDF já está no cache de extração, usa os chunks armazenados. Caso contrário,
+    a fase MAP começa assim que as primeiras páginas são extraídas, e o texto completo
+    do documento não é montado em memória (nem armazenado no cache de extração).
+    """
+    if not file.filename or not file.filename.lower().endswith(".pdf"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato de arquivo inválido. Por favor, envie um PDF."
+        )
+    start_time = time.time()
+    logger.info(f"Recebido arquivo para resumo direto: {file.filename}")
+    spooled = None
+    try:
+        spooled = await upload_spool.spool_upload_file(file)
+        cache_key = text_processor.create_extraction_key(spooled.sha256)
+        cached = await extraction_cache_repository.get_cached_extraction(db, cache_key)
+        if cached:
+            logger.info(f"Cache de extração HIT para {file.filename} ({spooled.sha256})")
+            chunks = text_processor.chunks_from_offsets(
+                cached.full_text, extraction_cache_repository.get_chunk_offsets(cached)
+            )
+            final_summary = await text_processor.generate_summary_with_cache(db=db, chunks=chunks, level=level)
+        else:
+            final_summary = await text_processor.summarize_pdf_streaming(await spooled.ensure_path(), level)
+        return SummaryResponse(summary=final_summary)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        logger.error(f"Erro de valor ao resumir {file.filename}: {e}")
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro inesperado ao resumir {file.filename}: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Ocorreu um erro interno ao gerar o resumo.")
+    finally:
+        if spooled:
+            spooled.cleanup()
+        await file.close()
+        logger.info(f"Resumo direto de {file.filename} finalizado em {time.time() - start_time:.2f} segundos.")
+
 @router.post(
     "/generate-summary/",
     response_model=SummaryResponse,
@@ -61,11 +245,10 @@ async def process_pdf_for_ai(file: UploadFile = File(..., description="Arquivo P
 )
 async def generate_summary(payload: SummaryRequest, db: AsyncSession = Depends(get_db)):
     start_time = time.time()
-    logger.info(f"Iniciando requisição para gerar resumo com {len(payload.chunks)} chunks.")
-    if not payload.chunks:
-        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Não há conteúdo para gerar um resumo.")
+    chunks = await document_store.resolve_chunks(db, payload.chunks, payload.document_handle, _EMPTY_SUMMARY_DETAIL)
+    logger.info(f"Iniciando requisição para gerar resumo com {len(chunks)} chunks.")
     try:
-        final_summary = await text_processor.generate_summary_with_cache(db=db, chunks=payload.chunks, level=payload.level)
+        final_summary = await text_processor.generate_summary_with_cache(db=db, chunks=chunks, level=payload.level)
         return SummaryResponse(summary=final_summary)
     except HTTPException:
         raise
@@ -76,19 +259,149 @@ async def generate_summary(payload: SummaryRequest, db: AsyncSession = Depends(g
         duration = time.time() - start_time
         logger.info(f"Requisição de resumo finalizada em {duration:.2f} segundos.")
 
+@router.post(
+    "/generate-summaries/",
+    response_model=MultiLevelSummaryResponse,
+    tags=["Geração de Conteúdo"],
+    summary="Gera resumos do mesmo conteúdo para vários níveis de aluno, com uma única fase MAP"
+)
+async def generate_summaries(payload: MultiLevelSummaryRequest, db: AsyncSession = Depends(get_db)):
+    start_time = time.time()
+    if not payload.levels:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Informe ao menos um nível.")
+    chunks = await document_store.resolve_chunks(db, payload.chunks, payload.document_handle, _EMPTY_SUMMARY_DETAIL)
+    logger.info(f"Iniciando requisição para gerar resumos de {len(payload.levels)} níveis com {len(chunks)} chunks.")
+    try:
+        summaries = await text_processor.generate_summaries_with_cache(db=db, chunks=chunks, levels=payload.levels)
+        return MultiLevelSummaryResponse(summaries=summaries)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro inesperado na geração de resumos: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Ocorreu um erro interno ao gerar os resumos.")
+    finally:
+        logger.info(f"Requisição de resumos finalizada em {time.time() - start_time:.2f} segundos.")
+
+def _format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post(
+    "/generate-summary/stream/",
+    tags=["Geração de Conteúdo"],
+    summary="Gera um resumo com progresso e texto transmitidos via Server-Sent Events"
+)
+async def generate_summary_stream(payload: SummaryRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Variante de /generate-summary/ que responde em text/event-stream.
+
+    Eventos: `progress` (andamento das fases MAP e REDUCE), `token` (trechos do
+    resumo final), `done` (resumo completo) e `error` (falha durante a geração).
+    """
+    # Resolvido antes de abrir o stream, para que um handle expirado responda 404.
+    chunks = await document_store.resolve_chunks(db, payload.chunks, payload.document_handle, _EMPTY_SUMMARY_DETAIL)
+    logger.info(f"Iniciando requisição (streaming) para gerar resumo com {len(chunks)} chunks.")
+
+    async def event_stream():
+        start_time = time.time()
+        try:
+            async for event, data in text_processor.stream_summary_with_cache(chunks=chunks, level=payload.level):
+                yield _format_sse(event, data)
+        except HTTPException as e:
+            yield _format_sse("error", {"status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            logger.error(f"Erro inesperado na geração de resumo (streaming): {e}", exc_info=True)
+            yield _format_sse("error", {"status_code": 500, "detail": "Ocorreu um erro interno ao gerar o resumo."})
+        finally:
+            logger.info(f"Requisição de resumo (streaming) finalizada em {time.time() - start_time:.2f} segundos.")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/generate-quiz/", response_model=QuizResponse, tags=["Geração de Conteúdo"])
-async def generate_quiz(payload: QuizRequest):
-    return await ai_service.generate_quiz_from_text(payload.text, payload.studentLevel)
+async def generate_quiz(payload: QuizRequest, db: AsyncSession = Depends(get_db)):
+    text = await document_store.resolve_text(db, payload.text, payload.document_handle)
+    return await ai_service.generate_quiz_from_text(text, payload.studentLevel)
 
 @router.post("/generate-flashcards/", response_model=FlashcardResponse, tags=["Geração de Conteúdo"])
-async def generate_flashcards(payload: FlashcardRequest):
-    return await ai_service.generate_flashcards_from_text(payload.text, payload.studentLevel)
+async def generate_flashcards(payload: FlashcardRequest, db: AsyncSession = Depends(get_db)):
+    text = await document_store.resolve_text(db, payload.text, payload.document_handle)
+    return await ai_service.generate_flashcards_from_text(text, payload.studentLevel)
 
 @router.post("/generate-study-plan/", response_model=StudyPlanResponse, tags=["Geração de Conteúdo"])
-async def generate_study_plan(payload: StudyPlanRequest):
-    plan = await ai_service.generate_study_plan_from_text(payload.text, payload.studentLevel, payload.days)
+async def generate_study_plan(payload: StudyPlanRequest, db: AsyncSession = Depends(get_db)):
+    text = await document_store.resolve_text(db, payload.text, payload.document_handle)
+    plan = await ai_service.generate_study_plan_from_text(text, payload.studentLevel, payload.days)
     return StudyPlanResponse(plan=plan)
 
 @router.post("/generate-questions/", response_model=QuestionResponse, tags=["Geração de Conteúdo"])
-async def generate_questions(payload: QuestionRequest):
-    return await ai_service.generate_questions_from_text(payload.text, payload.count, payload.difficulty)
+async def generate_questions(payload: QuestionRequest, db: AsyncSession = Depends(get_db)):
+    text = await document_store.resolve_text(db, payload.text, payload.document_handle)
+    return await ai_service.generate_questions_from_text(text, payload.count, payload.difficulty)
+
+# --- Jobs em segundo plano ---
+
+async def _submit(db: AsyncSession, kind: str, payload) -> JobStatusResponse:
+    # O job guarda só o handle; o conteúdo é carregado quando ele executa.
+    if not getattr(payload, "chunks", None) and not getattr(payload, "text", None) and not payload.document_handle:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Não há conteúdo para gerar.")
+    job = await job_queue.submit_job(db, kind, payload)
+    return JobStatusResponse.from_job(job)
+
+@router.post("/jobs/summary/", response_model=JobStatusResponse, status_code=status.HTTP_202_ACCEPTED, tags=["Jobs"])
+async def submit_summary_job(payload: SummaryRequest, db: AsyncSession = Depends(get_db)):
+    return await _submit(db, "summary", payload)
+
+@router.post("/jobs/summaries/", response_model=JobStatusResponse, status_code=status.HTTP_202_ACCEPTED, tags=["Jobs"])
+async def submit_summaries_job(payload: MultiLevelSummaryRequest, db: AsyncSession = Depends(get_db)):
+    if not payload.levels:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Informe ao menos um nível.")
+    return await _submit(db, "summaries", payload)
+
+@router.post("/jobs/quiz/", response_model=JobStatusResponse, status_code=status.HTTP_202_ACCEPTED, tags=["Jobs"])
+async def submit_quiz_job(payload: QuizRequest, db: AsyncSession = Depends(get_db)):
+    return await _submit(db, "quiz", payload)
+
+@router.post("/jobs/flashcards/", response_model=JobStatusResponse, status_code=status.HTTP_202_ACCEPTED, tags=["Jobs"])
+async def submit_flashcards_job(payload: FlashcardRequest, db: AsyncSession = Depends(get_db)):
+    return await _submit(db, "flashcards", payload)
+
+@router.post("/jobs/study-plan/", response_model=JobStatusResponse, status_code=status.HTTP_202_ACCEPTED, tags=["Jobs"])
+async def submit_study_plan_job(payload: StudyPlanRequest, db: AsyncSession = Depends(get_db)):
+    return await _submit(db, "study_plan", payload)
+
+@router.post("/jobs/questions/", response_model=JobStatusResponse, status_code=status.HTTP_202_ACCEPTED, tags=["Jobs"])
+async def submit_questions_job(payload: QuestionRequest, db: AsyncSession = Depends(get_db)):
+    return await _submit(db, "questions", payload)
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse, tags=["Jobs"], summary="Consulta o estado e o resultado de um job")
+async def get_job_status(job_id: str, db: AsyncSession = Depends(get_db)):
+    job = await generation_job_repository.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job não encontrado.")
+    return JobStatusResponse.from_job(job)
+
+@router.get("/jobs/{job_id}/events", tags=["Jobs"], summary="Acompanha um job via Server-Sent Events até sua conclusão")
+async def stream_job_status(job_id: str):
+    async def event_stream():
+        last_status = None
+        while True:
+            async with AsyncSessionLocal() as db:
+                job = await generation_job_repository.get_job(db, job_id)
+            if job is None:
+                yield _format_sse("error", {"status_code": 404, "detail": "Job não encontrado."})
+                return
+            if job.status != last_status:
+                last_status = job.status
+                yield _format_sse("status", JobStatusResponse.from_job(job).model_dump(mode="json"))
+            if job.status in (JOB_SUCCEEDED, JOB_FAILED):
+                return
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,9 +1,195 @@
 # config.py
 # Configurações do backend FastAPI
 
+import os
+
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
 
+# Chunking por sentenças com orçamento de tokens (CHUNKER = "sentence").
+# Com CHUNKER = "fixed", usa janelas fixas de CHUNK_SIZE/CHUNK_OVERLAP caracteres.
+CHUNKER = os.environ.get("CHUNKER", "sentence")
+# Tokens máximos por chunk e tokens de sobreposição entre chunks consecutivos.
+CHUNK_TOKEN_BUDGET = 250
+CHUNK_OVERLAP_TOKENS = 40
+# Caracteres por token usados pelo estimador. O padrão (4.0) é uma aproximação genérica,
+# não uma medida: meça a razão nos materiais reais com `python -m tools.calibrate_tokens`
+# (countTokens da API) e defina a variável. Faz parte de chunking_signature, então
+# alterá-la invalida o cache de extração.
+CHUNK_CHARS_PER_TOKEN = float(os.environ.get("CHUNK_CHARS_PER_TOKEN", 4.0))
+
+
+# Banco de dados
+# URLs postgres:// e postgresql:// usam o driver asyncpg; o padrão é SQLite em arquivo (nó único).
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite+aiosqlite:///./cache.db")
+# Conexões mantidas no pool por processo e conexões extras permitidas em picos.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+# Tempo máximo (em segundos) de espera por uma conexão livre no pool.
+DB_POOL_TIMEOUT = 30
+# Conexões mais antigas que isso (em segundos) são recriadas; evita conexões derrubadas pelo servidor.
+DB_POOL_RECYCLE = 1800
+# Testa a conexão antes de usá-la (uma ida ao banco a mais por checkout).
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+# SQLite: tempo (em segundos) que uma escrita espera pelo lock do arquivo antes de falhar.
+SQLITE_BUSY_TIMEOUT = 15
+# SQLite: modo de sincronização em disco. NORMAL com WAL só perde as últimas transações numa queda de energia.
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+# Cria as tabelas que faltarem na inicialização. Desative quando o schema for gerenciado por migrações.
+DB_CREATE_TABLES = os.environ.get("DB_CREATE_TABLES", "true").lower() == "true"
 
 # Timeout padrão para requisições à IA (em segundos)
 AI_REQUEST_TIMEOUT = 30
+
+# Extração de PDF em paralelo
+# Número de processos usados para extrair páginas de um PDF.
+PDF_EXTRACTION_WORKERS = int(os.environ.get("PDF_EXTRACTION_WORKERS", max(1, min(4, os.cpu_count() or 1))))
+# Limite de páginas por documento; PDFs maiores são recusados.
+PDF_MAX_PAGES = int(os.environ.get("PDF_MAX_PAGES", 800))
+# Mínimo de páginas por tarefa enviada ao pool, para não pagar o custo de abrir o PDF por poucas páginas.
+PDF_MIN_PAGES_PER_TASK = 8
+# Extração em streaming (/summarize-pdf/): intervalos de PDF_MIN_PAGES_PER_TASK páginas
+# enviados ao pool, com no máximo este número de intervalos extraídos à frente do consumo.
+PDF_STREAM_MAX_PENDING_TASKS = PDF_EXTRACTION_WORKERS * 2
+
+# Normalização do texto extraído (antes do fatiamento)
+# Remove cabeçalhos/rodapés repetidos, junta palavras hifenizadas na quebra de linha
+# e colapsa espaços. Com "false", as páginas são apenas concatenadas, como antes.
+TEXT_NORMALIZATION_ENABLED = os.environ.get("TEXT_NORMALIZATION_ENABLED", "true").lower() == "true"
+# Páginas iniciais usadas para detectar cabeçalhos e rodapés. No streaming, o texto
+# só começa a ser fatiado depois que essas páginas foram extraídas.
+NORMALIZE_SAMPLE_PAGES = 12
+# Linhas do topo e da base de cada página examinadas como possível cabeçalho/rodapé.
+NORMALIZE_EDGE_LINES = 2
+# Fração mínima das páginas da amostra em que a linha precisa se repetir (e mínimo absoluto de páginas).
+NORMALIZE_REPEAT_FRACTION = 0.5
+NORMALIZE_MIN_REPEATS = 3
+
+# Upload de PDFs
+# Tamanho dos blocos lidos do corpo da requisição e gravados no arquivo temporário.
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+# Tamanho máximo aceito para um upload (em bytes).
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 200 * 1024 * 1024))
+# Diretório dos arquivos temporários de upload (None usa o diretório temporário do sistema).
+UPLOAD_SPOOL_DIR = os.environ.get("UPLOAD_SPOOL_DIR") or None
+
+# Cache de extração de PDFs
+# Tamanho máximo (em bytes de texto) ocupado pelo cache de extração no banco.
+EXTRACTION_CACHE_MAX_BYTES = int(os.environ.get("EXTRACTION_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+# Geração de resumos concorrentes
+# Usa um lock no banco para que workers diferentes não gerem o mesmo resumo ao mesmo tempo.
+SUMMARY_DB_LOCK_ENABLED = os.environ.get("SUMMARY_DB_LOCK_ENABLED", "false").lower() == "true"
+# Validade do lock (em segundos); deve cobrir a duração de uma geração completa.
+SUMMARY_LOCK_TTL = 300
+# Intervalo (em segundos) entre consultas ao cache enquanto outro worker gera o resumo.
+SUMMARY_LOCK_POLL_INTERVAL = 1.0
+
+# Agendador global de chamadas à IA
+# Número máximo de chamadas simultâneas à IA neste processo.
+AI_MAX_IN_FLIGHT = int(os.environ.get("AI_MAX_IN_FLIGHT", 16))
+# Limites da cota da API (requisições e tokens por minuto).
+AI_REQUESTS_PER_MINUTE = int(os.environ.get("AI_REQUESTS_PER_MINUTE", 300))
+AI_TOKENS_PER_MINUTE = int(os.environ.get("AI_TOKENS_PER_MINUTE", 1_000_000))
+# Tokens de saída reservados por chamada ao estimar o consumo da cota.
+AI_EXPECTED_OUTPUT_TOKENS = 1024
+# Tempo máximo (em segundos) que uma chamada pode esperar na fila antes de falhar com 503.
+AI_QUEUE_TIMEOUT = 60
+
+# Resiliência das chamadas à IA
+# Timeout adaptativo: AI_TIMEOUT_P99_MULTIPLIER vezes o p99 observado para o tipo de chamada
+# (endpoint e fase), entre AI_TIMEOUT_MIN e AI_REQUEST_TIMEOUT. Até haver AI_LATENCY_MIN_SAMPLES
+# amostras, vale AI_REQUEST_TIMEOUT. A distribuição usa as últimas AI_LATENCY_WINDOW chamadas.
+AI_TIMEOUT_MIN = 5
+AI_TIMEOUT_P99_MULTIPLIER = 2.0
+AI_LATENCY_WINDOW = 200
+AI_LATENCY_MIN_SAMPLES = 20
+# Requisição duplicada (hedge) quando a chamada passa do p95 do seu tipo; a que responder primeiro vale.
+AI_HEDGE_ENABLED = os.environ.get("AI_HEDGE_ENABLED", "true").lower() == "true"
+AI_HEDGE_QUANTILE = 0.95
+# Tentativas por chamada (a primeira incluída) para falhas transitórias (timeout, 429, 5xx, rede),
+# com espera aleatória entre 0 e min(AI_RETRY_BACKOFF_MAX, AI_RETRY_BACKOFF_BASE * 2^n) segundos.
+# Valores menores que 1 viram 1: sem ao menos uma tentativa não haveria erro para reportar.
+AI_MAX_ATTEMPTS = max(1, int(os.environ.get("AI_MAX_ATTEMPTS", 3)))
+AI_RETRY_BACKOFF_BASE = 0.5
+AI_RETRY_BACKOFF_MAX = 8.0
+# Orçamento global de novas tentativas e hedges: cada chamada acrescenta AI_RETRY_BUDGET_RATIO
+# ao saldo (limitado a AI_RETRY_BUDGET_MAX) e cada nova tentativa ou hedge consome 1.
+# Em uma pane, as retentativas ficam limitadas a ~10% do tráfego em vez de multiplicá-lo.
+AI_RETRY_BUDGET_RATIO = 0.1
+AI_RETRY_BUDGET_MAX = 20
+# Circuit breaker: após AI_CIRCUIT_FAILURE_THRESHOLD falhas transitórias seguidas, as chamadas
+# falham imediatamente por AI_CIRCUIT_OPEN_SECONDS; depois, uma chamada de teste decide se reabre.
+AI_CIRCUIT_FAILURE_THRESHOLD = 5
+AI_CIRCUIT_OPEN_SECONDS = 30
+
+# Cliente HTTP da API Gemini
+# URL base da API; aponte para o servidor falso (tools/fake_gemini.py) em testes locais.
+GEMINI_API_BASE_URL = os.environ.get("GEMINI_API_BASE_URL", "https://generativelanguage.googleapis.com")
+# Conexões keep-alive mantidas no pool do cliente HTTP.
+GEMINI_MAX_CONNECTIONS = AI_MAX_IN_FLIGHT
+GEMINI_KEEPALIVE_EXPIRY = 60
+
+# Sumarização MapReduce hierárquica
+# Chamadas simultâneas por requisição nas fases MAP e REDUCE (o agendador global também limita).
+SUMMARY_MAX_CONCURRENCY = 8
+# Tamanho máximo (em caracteres) dos resumos parciais combinados em uma única chamada REDUCE.
+# Cerca de 8 mil tokens, bem dentro do contexto do modelo.
+REDUCE_MAX_INPUT_CHARS = 32000
+# Fase MAP em lotes: vários chunks por chamada à IA, com resposta em JSON.
+MAP_BATCH_ENABLED = os.environ.get("MAP_BATCH_ENABLED", "true").lower() == "true"
+# Tokens de entrada (estimados) dos chunks de um lote e número máximo de chunks por lote,
+# que limita também o tamanho da resposta.
+MAP_BATCH_TOKEN_BUDGET = int(os.environ.get("MAP_BATCH_TOKEN_BUDGET", 6000))
+MAP_BATCH_MAX_CHUNKS = 12
+# Fração máxima dos chunks de um documento cuja fase MAP pode falhar (após as novas tentativas)
+# sem abortar o resumo. Um resumo com chunks faltando não é gravado no cache de resumos; como os
+# resumos de chunk concluídos já estão no cache por chunk, a próxima requisição refaz só o que faltou.
+MAP_MAX_FAILED_FRACTION = float(os.environ.get("MAP_MAX_FAILED_FRACTION", 0.1))
+# Chunks prontos aguardando a fase MAP no pipeline de streaming; quando a fila enche,
+# a extração de páginas pausa até a IA consumir os chunks.
+PIPELINE_CHUNK_BUFFER = 64
+
+# Fila de jobs de geração em segundo plano
+# Número de jobs executados simultaneamente por processo.
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+# Intervalo (em segundos) entre consultas à fila quando não há jobs locais.
+JOB_POLL_INTERVAL = 1.0
+# Posse de um job em execução (em segundos): sem renovação nesse prazo, o job é considerado
+# abandonado (ex: worker reiniciado) e outro worker o retoma.
+JOB_LEASE_SECONDS = 120
+# Intervalo (em segundos) entre as renovações da posse enquanto o job executa.
+JOB_HEARTBEAT_INTERVAL = JOB_LEASE_SECONDS / 4
+# Número máximo de vezes que um job abandonado é retomado antes de ser marcado como falho.
+JOB_MAX_ATTEMPTS = 3
+
+# Geradores que recebem o texto inteiro em um único prompt (quiz, flashcards, plano de estudos, perguntas)
+# Tamanho máximo (em caracteres) do texto, enviado ou carregado pelo document_handle; acima
+# disso a requisição é recusada com 413. Cerca de 50 mil tokens.
+GENERATOR_MAX_INPUT_CHARS = int(os.environ.get("GENERATOR_MAX_INPUT_CHARS", 200_000))
+
+# Cache de respostas dos geradores (quiz, flashcards, plano de estudos, perguntas)
+# Validade (em segundos) de uma resposta em cache.
+GENERATION_CACHE_TTL = int(os.environ.get("GENERATION_CACHE_TTL", 7 * 24 * 3600))
+# Respostas mantidas em memória (LRU) por processo.
+GENERATION_CACHE_MEMORY_ENTRIES = 512
+# Número máximo de respostas armazenadas no banco; as menos acessadas são despejadas.
+GENERATION_CACHE_MAX_ROWS = int(os.environ.get("GENERATION_CACHE_MAX_ROWS", 50000))
+# Intervalo mínimo (em segundos) entre atualizações do último acesso de uma resposta, para que
+# os acertos no banco não virem uma escrita (e um commit) cada. Basta para o despejo LRU.
+GENERATION_CACHE_TOUCH_INTERVAL = 3600
+# O despejo de entradas expiradas ou excedentes roda a cada tantas gravações de cada processo;
+# entre um despejo e outro, o banco pode passar de GENERATION_CACHE_MAX_ROWS por até esse número.
+GENERATION_CACHE_EVICT_EVERY = 100
+
+# Cache de resumos em memória (camada na frente da tabela SummaryCache)
+# Memória máxima (em bytes) ocupada pelos resumos em cache em cada processo.
+SUMMARY_MEMORY_CACHE_BYTES = int(os.environ.get("SUMMARY_MEMORY_CACHE_BYTES", 64 * 1024 * 1024))
+SUMMARY_MEMORY_CACHE_MAX_ENTRIES = 100_000
+# Por quanto tempo (em segundos) uma busca sem resultado evita novas consultas ao banco.
+SUMMARY_NEGATIVE_CACHE_TTL = 5.0
+# Propaga entre workers (via banco) a chegada de novos resumos, limpando caches negativos.
+# Desligada, o cache negativo também fica desligado (ver summary_cache._negative).
+SUMMARY_CACHE_INVALIDATION_ENABLED = os.environ.get("SUMMARY_CACHE_INVALIDATION_ENABLED", "false").lower() == "true"
+# Intervalo (em segundos) entre consultas ao feed de invalidação.
+SUMMARY_CACHE_INVALIDATION_INTERVAL = 2.0
@@ -0,0 +1,48 @@
+# hashing.py
+# Identificadores de documentos baseados em conteúdo
+#
+# Esquema de IDs (estável; os caches dependem dele):
+#
+# - document_id de um texto fatiado: SHA-256, em hexadecimal minúsculo, da
+#   sequência dos bytes UTF-8 de cada chunk, na ordem, sem separadores.
+#   É exatamente sha256("".join(chunks).encode("utf-8")), mas calculado de
+#   forma incremental, sem montar o texto concatenado. Como os chunks se
+#   sobrepõem, o ID depende também dos parâmetros de chunking.
+# - ID de um PDF enviado: SHA-256, em hexadecimal minúsculo, dos bytes brutos
+#   do arquivo, calculado durante o upload (ver services/upload_spool.py).
+#   Serve de base para a chave do cache de extração.
+# - Hash de um chunk (cache da fase MAP): SHA-256 dos bytes UTF-8 do chunk.
+
+import hashlib
+from typing import BinaryIO, Iterable
+
+# Tamanho dos blocos lidos ao calcular o hash de um arquivo.
+_FILE_BLOCK_SIZE = 1024 * 1024
+
+
+def new_document_hasher():
+    """
+    Hash de document_id para chunks que chegam aos poucos (ex: pipeline de
+    extração em streaming): chame update(chunk.encode("utf-8")) em cada chunk.
+    """
+    return hashlib.sha256()
+
+
+def hash_chunks(chunks: Iterable[str]) -> str:
+    """Calcula o document_id alimentando o hash chunk a chunk, sem concatenar o texto."""
+    hasher = new_document_hasher()
+    for chunk in chunks:
+        hasher.update(chunk.encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_file(file: BinaryIO, block_size: int = _FILE_BLOCK_SIZE) -> str:
+    """Calcula o ID de um arquivo (ex: PDF) lendo-o em blocos."""
+    hasher = hashlib.sha256()
+    for block in iter(lambda: file.read(block_size), b""):
+        hasher.update(block)
+    return hasher.hexdigest()
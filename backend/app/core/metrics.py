@@ -0,0 +1,194 @@
+# metrics.py
+# Métricas de desempenho (contadores e histogramas) no formato de texto do Prometheus
+
+import math
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Limites (em segundos) dos histogramas de latência: de 1 ms a 2 minutos.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """
+    Contador monotônico por combinação de rótulos.
+
+    Os rótulos são passados como valores posicionais e guardados como tupla;
+    a formatação em texto só acontece em render(), na coleta.
+    """
+
+    type_name = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, values)} {_format_value(value)}"
+            for values, value in sorted(self._values.items(), key=lambda item: tuple(map(str, item[0])))
+        ]
+
+
+class Histogram:
+    """Histograma de latências com limites fixos, por combinação de rótulos."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Rótulos -> [contagem por faixa (a última é +Inf), soma].
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *label_values) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    @contextmanager
+    def time(self, *label_values) -> Iterator[None]:
+        """Mede a duração do bloco (relógio monotônico), inclusive quando ele levanta exceção."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def render(self) -> List[str]:
+        lines = []
+        for values, (counts, total) in sorted(self._series.items(), key=lambda item: tuple(map(str, item[0]))):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Valor instantâneo lido de uma função no momento da coleta."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], Dict[LabelValues, float]], labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._read = read
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, values)} {_format_value(value)}"
+            for values, value in sorted(self._read().items(), key=lambda item: tuple(map(str, item[0])))
+        ]
+
+
+_registry: List = []
+
+
+def _register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def counter(name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+    return _register(Counter(name, help_text, labels))
+
+
+def histogram(name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram(name, help_text, labels, buckets))
+
+
+def gauge(name: str, help_text: str, read: Callable[[], Dict[LabelValues, float]], labels: Sequence[str] = ()) -> Gauge:
+    return _register(Gauge(name, help_text, read, labels))
+
+
+def render() -> str:
+    """Todas as métricas no formato de texto do Prometheus (versão 0.0.4)."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.type_name}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Métricas da aplicação ---
+
+REQUEST_SECONDS = histogram(
+    "app_request_duration_seconds", "Duração das requisições HTTP por rota.", ("method", "route")
+)
+REQUESTS = counter("app_requests_total", "Requisições HTTP por rota e status.", ("method", "route", "status"))
+
+PDF_EXTRACTION_SECONDS = histogram(
+    "pdf_extraction_duration_seconds", "Extração do texto de um PDF (modo: completo ou streaming).", ("mode",)
+)
+CHUNKING_SECONDS = histogram("chunking_duration_seconds", "Fatiamento do texto de um documento.", ("chunker",))
+TEXT_NORMALIZATION_TOKENS = counter(
+    "text_normalization_tokens_total",
+    "Tokens estimados do texto extraído antes (raw) e depois (normalized) da normalização.", ("stage",)
+)
+
+CACHE_LOOKUP_SECONDS = histogram(
+    "cache_lookup_duration_seconds", "Consultas aos caches no banco.", ("cache",)
+)
+CACHE_REQUESTS = counter(
+    "cache_requests_total", "Consultas aos caches por resultado (hits por camada e misses).", ("cache", "result")
+)
+
+AI_QUEUE_WAIT_SECONDS = histogram(
+    "ai_queue_wait_seconds", "Espera na fila do agendador antes de uma chamada à IA.", ("endpoint",)
+)
+AI_CALL_SECONDS = histogram(
+    "ai_call_duration_seconds", "Duração das chamadas à IA, sem a espera na fila.", ("endpoint", "phase")
+)
+AI_ERRORS = counter(
+    "ai_errors_total", "Falhas de chamadas à IA (timeout, unavailable, rejected, queue_timeout, circuit_open).",
+    ("endpoint", "kind")
+)
+AI_RETRIES = counter(
+    "ai_retries_total", "Chamadas extras à IA: novas tentativas (retry) e requisições duplicadas (hedge).",
+    ("endpoint", "kind")
+)
+
+JSON_VALIDATION_SECONDS = histogram(
+    "json_validation_duration_seconds", "Validação das respostas JSON da IA.", ("endpoint",)
+)
+JSON_VALIDATION_ERRORS = counter(
+    "json_validation_errors_total", "Respostas JSON da IA que não passaram na validação.", ("endpoint",)
+)
@@ -1,3 +1,3 @@
 
 # Inicialização do pacote database
-from .database import get_db, init_db
+from .database import Base, get_db, init_db, close_db
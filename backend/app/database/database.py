@@ -1,11 +1,125 @@
 # database.py
 # Inicialização e configuração do banco de dados
 
+import logging
+from typing import Tuple
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker, declarative_base
+
+from ..core.config import (
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING, SQLITE_BUSY_TIMEOUT, SQLITE_SYNCHRONOUS, DB_CREATE_TABLES
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize_url(url: str) -> str:
+    """Aceita URLs postgres:// e postgresql:// (ex: fornecidas pelo provedor) usando o driver assíncrono."""
+    for prefix in ("postgres://", "postgresql://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+def _create_engine(url: str):
+    url = make_url(_normalize_url(url))
+    if url.get_backend_name() != "sqlite":
+        # PostgreSQL (vários nós): pool por processo, com conexões testadas e recicladas.
+        # A sessão usa UTC para que func.now() no servidor coincida com datetime.utcnow() nos repositórios.
+        return create_async_engine(
+            url,
+            connect_args={"server_settings": {"timezone": "UTC"}} if url.get_driver_name() == "asyncpg" else {},
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
+
+    # SQLite (nó único): um único arquivo, então o pool só reaproveita conexões abertas.
+    # Bancos em memória usam o pool estático padrão do SQLAlchemy, sem opções de tamanho.
+    in_memory = url.database in (None, "", ":memory:")
+    pool_options = {} if in_memory else {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    sqlite_engine = create_async_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT},
+        **pool_options,
+    )
+
+    @event.listens_for(sqlite_engine.sync_engine, "connect")
+    def _configure_sqlite(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL: leitores não bloqueiam a escrita (e vice-versa), e cada commit custa um fsync a menos.
+        if not in_memory:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT * 1000)}")
+        cursor.close()
+
+    return sqlite_engine
+
+
+engine = _create_engine(DATABASE_URL)
+# Sem expirar os objetos no commit: em sessões assíncronas, reler um atributo expirado
+# exigiria I/O implícito (ex: a entrada do cache de extração após registrar o acesso).
+AsyncSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=engine, class_=AsyncSession, expire_on_commit=False
+)
+
+Base = declarative_base()
+
+async def get_db():
+    """Dependência do FastAPI para injetar uma sessão de banco de dados assíncrona."""
+    async with AsyncSessionLocal() as session:
+        yield session
+
+def _missing_schema(sync_conn) -> Tuple[list, list]:
+    """Tabelas do metadata ausentes no banco e índices ausentes nas tabelas que já existem."""
+    inspector = inspect(sync_conn)
+    existing = set(inspector.get_table_names())
+    tables = [name for name in Base.metadata.tables if name not in existing]
+    indexes = []
+    for name, table in Base.metadata.tables.items():
+        if name in existing:
+            existing_indexes = {index["name"] for index in inspector.get_indexes(name)}
+            indexes.extend(index for index in table.indexes if index.name not in existing_indexes)
+    return tables, indexes
+
 async def init_db():
-    # Implemente a inicialização do banco de dados
-    pass
+    """
+    Inicializa o banco de dados e cria as tabelas que ainda não existem, além
+    dos índices acrescentados depois que uma tabela foi criada.
+
+    Com o schema já criado, faz apenas uma consulta ao catálogo, sem emitir DDL
+    (que no SQLite bloqueia o arquivo e no PostgreSQL disputa locks entre nós).
+    """
+    # Importa os modelos para registrá-los no metadata antes do create_all.
+    from . import models  # noqa: F401
+    if not DB_CREATE_TABLES:
+        return
+    async with engine.connect() as conn:
+        missing_tables, missing_indexes = await conn.run_sync(_missing_schema)
+    if missing_tables:
+        logger.info(f"Criando tabelas ausentes: {', '.join(missing_tables)}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    for index in missing_indexes:
+        logger.info(f"Criando índice ausente: {index.name}")
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(index.create, checkfirst=True)
+        except Exception as e:
+            # Ex: linhas duplicadas anteriores a um índice único. A aplicação segue sem ele.
+            logger.error(f"Não foi possível criar o índice {index.name}: {e}")
 
-# Adicione funções conforme necessário
-def get_db():
-    # Implemente a lógica real conforme necessário
-    pass
+async def close_db():
+    """Fecha as conexões do pool. Chamado no shutdown da aplicação."""
+    await engine.dispose()
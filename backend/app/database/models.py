@@ -0,0 +1,144 @@
+# models.py
+# Modelos SQLAlchemy do cache
+
+from sqlalchemy import (
+    Column, Integer, String, Text, DateTime, Index, UniqueConstraint, func, text
+)
+from .database import Base
+
+class SummaryCache(Base):
+    """
+    Modelo SQLAlchemy para armazenar resumos gerados em cache.
+    """
+    __tablename__ = "summary_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(String, nullable=False, index=True)
+    student_level = Column(String, nullable=False, index=True)
+    summary_text = Column(Text, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+    # Garante que a combinação de um documento e um nível de estudante seja única.
+    __table_args__ = (
+        UniqueConstraint('document_id', 'student_level', name='_document_level_uc'),
+    )
+
+class ExtractionCache(Base):
+    """
+    Texto extraído de um PDF e os limites dos seus chunks e páginas.
+
+    A chave combina o SHA-256 dos bytes do PDF com os parâmetros de chunking,
+    de modo que uploads repetidos do mesmo arquivo não precisem ser reprocessados.
+    """
+    __tablename__ = "extraction_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String, nullable=False, unique=True, index=True)
+    pdf_sha256 = Column(String, nullable=False, index=True)
+    full_text = Column(Text, nullable=False)
+    # Lista JSON de pares [início, fim) com os offsets de cada chunk em full_text.
+    chunk_offsets = Column(Text, nullable=False)
+    # Lista JSON com o offset de início de cada página em full_text.
+    page_offsets = Column(Text, nullable=True)
+    size_bytes = Column(Integer, nullable=False)
+    hit_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, server_default=func.now())
+    last_accessed_at = Column(DateTime, server_default=func.now(), index=True)
+
+class GenerationLock(Base):
+    """
+    Lock de geração compartilhado entre workers.
+
+    Enquanto um worker gera o conteúdo de uma chave, os demais aguardam o
+    resultado no cache em vez de repetir as chamadas à IA. Locks expirados
+    (ex: worker que morreu) podem ser tomados por outro worker.
+    """
+    __tablename__ = "generation_lock"
+
+    id = Column(Integer, primary_key=True, index=True)
+    lock_key = Column(String, nullable=False, unique=True, index=True)
+    owner = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+class ChunkSummaryCache(Base):
+    """
+    Resumo parcial (fase MAP) de um chunk, indexado pelo hash do seu conteúdo.
+
+    O resumo de um chunk não depende do nível do aluno nem do documento, então
+    é reaproveitado entre níveis e entre documentos que compartilham trechos.
+    """
+    __tablename__ = "chunk_summary_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    chunk_hash = Column(String, nullable=False, index=True)
+    prompt_version = Column(String, nullable=False)
+    summary_text = Column(Text, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('chunk_hash', 'prompt_version', name='_chunk_prompt_uc'),
+    )
+
+# Estados de um GenerationJob.
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+class GenerationJob(Base):
+    """
+    Job de geração executado em segundo plano.
+
+    O payload e o resultado são armazenados como JSON. Jobs com o mesmo tipo
+    e o mesmo hash de entrada são deduplicados enquanto não falharem: o índice
+    único parcial impede que envios concorrentes criem jobs duplicados.
+    """
+    __tablename__ = "generation_job"
+    __table_args__ = (
+        Index(
+            "uq_generation_job_active_input", "kind", "input_hash", unique=True,
+            sqlite_where=text(f"status != '{JOB_FAILED}'"), postgresql_where=text(f"status != '{JOB_FAILED}'")
+        ),
+    )
+
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)
+    input_hash = Column(String, nullable=False, index=True)
+    payload = Column(Text, nullable=False)
+    status = Column(String, nullable=False, index=True, default=JOB_QUEUED)
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    # Validade da posse de um job em execução; depois disso outro worker pode retomá-lo.
+    locked_until = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, server_default=func.now(), index=True)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class GenerationCache(Base):
+    """
+    Resposta validada de um gerador (quiz, flashcards, plano de estudos, perguntas),
+    serializada em JSON e indexada por endpoint, hash da entrada e versão do prompt/modelo.
+    """
+    __tablename__ = "generation_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String, nullable=False, unique=True, index=True)
+    endpoint = Column(String, nullable=False, index=True)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+    expires_at = Column(DateTime, nullable=False, index=True)
+    last_accessed_at = Column(DateTime, server_default=func.now(), index=True)
+
+class CacheInvalidation(Base):
+    """
+    Feed de invalidação dos caches em memória entre workers.
+
+    Cada worker lê periodicamente as entradas com id maior que o último visto
+    e descarta a chave correspondente dos seus caches locais.
+    """
+    __tablename__ = "cache_invalidation"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    cache_name = Column(String, nullable=False)
+    cache_key = Column(String, nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), index=True)
@@ -1,10 +1,14 @@
 
 import logging
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from .api import endpoints
-from .database import init_db
+from .core import metrics
+from .database import init_db, close_db
+from .services import pdf_extractor, ai_service, job_queue, summary_cache
 
 # Configura o logging para o nível INFO para visibilidade em produção
 logging.basicConfig(level=logging.INFO)
@@ -24,6 +28,18 @@ async def on_startup():
     logger.info("Iniciando a aplicação e preparando o banco de dados...")
     await init_db()
     logger.info("Banco de dados pronto.")
+    # Jobs deixados em execução por um processo anterior são retomados quando sua posse expira.
+    job_queue.worker_pool.start()
+    summary_cache.invalidation_listener.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Para os workers de jobs e libera o pool de extração de PDFs e as conexões com a API de IA e o banco."""
+    await job_queue.worker_pool.stop()
+    await summary_cache.invalidation_listener.stop()
+    pdf_extractor.shutdown_executor()
+    await ai_service.close_client()
+    await close_db()
 
 # Configuração do CORS (Cross-Origin Resource Sharing)
 # Essencial para permitir que o frontend (hospedado em outro domínio) se comunique com esta API.
@@ -37,6 +53,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Registra a latência e o status de cada requisição, agrupadas pelo template da rota."""
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # Template (ex: /api/v1/jobs/{job_id}) em vez do caminho, para não multiplicar as séries.
+        # Em respostas em streaming, o tempo medido vai até o envio dos cabeçalhos.
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, request.method, route_path)
+        metrics.REQUESTS.inc(request.method, route_path, status_code)
+
 # Inclui o roteador da API com um prefixo global /api/v1
 app.include_router(endpoints.router, prefix="/api/v1")
 
@@ -44,3 +77,8 @@ app.include_router(endpoints.router, prefix="/api/v1")
 async def read_root():
     """Verifica se a API está online e operacional."""
     return {"status": "ok", "message": "Bem-vindo à API do Assistente de Estudos IA"}
+
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    """Métricas de desempenho no formato de texto do Prometheus."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
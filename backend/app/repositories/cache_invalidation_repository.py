@@ -0,0 +1,31 @@
+# cache_invalidation_repository.py
+# Repositório para o feed de invalidação de caches entre workers
+
+from datetime import datetime, timedelta
+from typing import List, Tuple
+from sqlalchemy import delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..database.models import CacheInvalidation
+
+async def publish_invalidation(db: AsyncSession, cache_name: str, cache_key: str) -> None:
+    db.add(CacheInvalidation(cache_name=cache_name, cache_key=cache_key))
+    await db.commit()
+
+async def get_last_invalidation_id(db: AsyncSession) -> int:
+    return (await db.execute(select(func.coalesce(func.max(CacheInvalidation.id), 0)))).scalar_one()
+
+async def get_invalidations_since(db: AsyncSession, last_id: int) -> List[Tuple[int, str, str]]:
+    stmt = select(CacheInvalidation.id, CacheInvalidation.cache_name, CacheInvalidation.cache_key).where(
+        CacheInvalidation.id > last_id
+    ).order_by(CacheInvalidation.id.asc())
+    return [tuple(row) for row in (await db.execute(stmt)).all()]
+
+async def prune_invalidations(db: AsyncSession, max_age_seconds: float) -> None:
+    await db.execute(
+        delete(CacheInvalidation).where(
+            CacheInvalidation.created_at < datetime.utcnow() - timedelta(seconds=max_age_seconds)
+        )
+    )
+    await db.commit()
@@ -0,0 +1,58 @@
+# chunk_summary_cache_repository.py
+# Repositório para o cache de resumos parciais (fase MAP) por chunk
+
+from typing import Dict, Iterable
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..database.models import ChunkSummaryCache
+
+# Limita o número de parâmetros por consulta (o SQLite aceita poucos por padrão).
+_LOOKUP_BATCH_SIZE = 500
+
+async def get_cached_chunk_summaries(
+    db: AsyncSession, chunk_hashes: Iterable[str], prompt_version: str
+) -> Dict[str, str]:
+    """
+    Busca os resumos em cache para os hashes informados. Retorna {hash: resumo}.
+    """
+    hashes = list(dict.fromkeys(chunk_hashes))
+    found: Dict[str, str] = {}
+    for i in range(0, len(hashes), _LOOKUP_BATCH_SIZE):
+        stmt = select(ChunkSummaryCache.chunk_hash, ChunkSummaryCache.summary_text).where(
+            ChunkSummaryCache.chunk_hash.in_(hashes[i:i + _LOOKUP_BATCH_SIZE]),
+            ChunkSummaryCache.prompt_version == prompt_version
+        )
+        result = await db.execute(stmt)
+        found.update({chunk_hash: summary_text for chunk_hash, summary_text in result.all()})
+    return found
+
+async def save_chunk_summaries(db: AsyncSession, summaries: Dict[str, str], prompt_version: str) -> None:
+    """
+    Salva resumos de chunks em lote. Entradas já salvas por outra requisição são ignoradas.
+    """
+    if not summaries:
+        return
+    db.add_all([
+        ChunkSummaryCache(chunk_hash=chunk_hash, prompt_version=prompt_version, summary_text=summary_text)
+        for chunk_hash, summary_text in summaries.items()
+    ])
+    try:
+        await db.commit()
+        return
+    except IntegrityError:
+        await db.rollback()
+
+    # Conflito com outra requisição: insere apenas o que ainda falta.
+    existing = await get_cached_chunk_summaries(db, summaries.keys(), prompt_version)
+    missing = {h: text for h, text in summaries.items() if h not in existing}
+    if missing:
+        db.add_all([
+            ChunkSummaryCache(chunk_hash=chunk_hash, prompt_version=prompt_version, summary_text=summary_text)
+            for chunk_hash, summary_text in missing.items()
+        ])
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
@@ -0,0 +1,128 @@
+# extraction_cache_repository.py
+# Repositório para o cache de extração de PDFs
+
+import json
+import logging
+from typing import List, Tuple
+from sqlalchemy import delete, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..core import metrics
+from ..core.config import EXTRACTION_CACHE_MAX_BYTES
+from ..database.models import ExtractionCache
+
+logger = logging.getLogger(__name__)
+
+# Contadores de acertos/falhas do cache neste processo.
+_stats = {"hits": 0, "misses": 0}
+
+def get_extraction_cache_stats() -> dict:
+    """Retorna os contadores de hit/miss do cache de extração deste processo."""
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        "hits": _stats["hits"],
+        "misses": _stats["misses"],
+        "hit_ratio": _stats["hits"] / lookups if lookups else 0.0,
+    }
+
+async def get_cached_extraction(db: AsyncSession, cache_key: str) -> ExtractionCache | None:
+    """
+    Busca uma extração em cache e registra o acesso (usado pela política de despejo).
+    """
+    with metrics.CACHE_LOOKUP_SECONDS.time("extraction"):
+        result = await db.execute(select(ExtractionCache).where(ExtractionCache.cache_key == cache_key))
+    entry = result.scalars().first()
+    if entry is None:
+        _stats["misses"] += 1
+        metrics.CACHE_REQUESTS.inc("extraction", "miss")
+        return None
+
+    _stats["hits"] += 1
+    metrics.CACHE_REQUESTS.inc("extraction", "hit")
+    await db.execute(
+        update(ExtractionCache)
+        .where(ExtractionCache.id == entry.id)
+        .values(hit_count=ExtractionCache.hit_count + 1, last_accessed_at=func.now())
+    )
+    await db.commit()
+    return entry
+
+async def get_document(db: AsyncSession, cache_key: str) -> ExtractionCache | None:
+    """
+    Carrega um documento pelo handle (a chave do cache) para os geradores.
+    Renova o acesso, mas não conta nas estatísticas de hit/miss de upload.
+    """
+    result = await db.execute(select(ExtractionCache).where(ExtractionCache.cache_key == cache_key))
+    entry = result.scalars().first()
+    if entry is not None:
+        await db.execute(
+            update(ExtractionCache).where(ExtractionCache.id == entry.id).values(last_accessed_at=func.now())
+        )
+        await db.commit()
+    return entry
+
+def get_chunk_offsets(entry: ExtractionCache) -> List[Tuple[int, int]]:
+    return [tuple(pair) for pair in json.loads(entry.chunk_offsets)]
+
+def get_page_offsets(entry: ExtractionCache) -> List[int] | None:
+    """Offset de início de cada página em full_text, se a extração os registrou."""
+    return json.loads(entry.page_offsets) if entry.page_offsets else None
+
+async def save_extraction_to_cache(
+    db: AsyncSession,
+    cache_key: str,
+    pdf_sha256: str,
+    full_text: str,
+    chunk_offsets: List[Tuple[int, int]],
+    page_offsets: List[int] | None = None
+) -> bool:
+    """
+    Salva uma extração no cache e despeja as entradas menos acessadas se o
+    tamanho total ultrapassar EXTRACTION_CACHE_MAX_BYTES.
+    Retorna False se o texto é grande demais para ser armazenado.
+    """
+    size_bytes = len(full_text.encode("utf-8"))
+    if size_bytes > EXTRACTION_CACHE_MAX_BYTES:
+        logger.info(f"Extração de {size_bytes} bytes excede o limite do cache; não será armazenada.")
+        return False
+
+    db.add(ExtractionCache(
+        cache_key=cache_key,
+        pdf_sha256=pdf_sha256,
+        full_text=full_text,
+        chunk_offsets=json.dumps(chunk_offsets),
+        page_offsets=json.dumps(page_offsets) if page_offsets is not None else None,
+        size_bytes=size_bytes
+    ))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Outra requisição salvou a mesma extração primeiro.
+        await db.rollback()
+        return True
+
+    await _evict_to_budget(db)
+    return True
+
+async def _evict_to_budget(db: AsyncSession) -> None:
+    total_bytes = (await db.execute(select(func.coalesce(func.sum(ExtractionCache.size_bytes), 0)))).scalar_one()
+    if total_bytes <= EXTRACTION_CACHE_MAX_BYTES:
+        return
+
+    # Despeja as entradas acessadas há mais tempo (LRU) até caber no orçamento.
+    result = await db.execute(
+        select(ExtractionCache.id, ExtractionCache.size_bytes).order_by(ExtractionCache.last_accessed_at.asc())
+    )
+    evicted_ids = []
+    for entry_id, size_bytes in result.all():
+        if total_bytes <= EXTRACTION_CACHE_MAX_BYTES:
+            break
+        evicted_ids.append(entry_id)
+        total_bytes -= size_bytes
+
+    if evicted_ids:
+        await db.execute(delete(ExtractionCache).where(ExtractionCache.id.in_(evicted_ids)))
+        await db.commit()
+        logger.info(f"Cache de extração: {len(evicted_ids)} entradas despejadas.")
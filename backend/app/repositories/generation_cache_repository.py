@@ -0,0 +1,112 @@
+# generation_cache_repository.py
+# Repositório para o cache de respostas dos geradores
+
+import logging
+from datetime import datetime, timedelta
+from typing import List, Tuple
+from sqlalchemy import delete, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..core.config import (
+    GENERATION_CACHE_MAX_ROWS, GENERATION_CACHE_TOUCH_INTERVAL, GENERATION_CACHE_EVICT_EVERY
+)
+from ..database.models import GenerationCache
+
+logger = logging.getLogger(__name__)
+
+# Gravações deste processo desde o último despejo.
+_saves_since_evict = 0
+
+async def get_cached_generation(db: AsyncSession, cache_key: str) -> GenerationCache | None:
+    """
+    Busca uma resposta válida (não expirada). O acesso só é registrado se o
+    último tiver mais de GENERATION_CACHE_TOUCH_INTERVAL segundos, então a
+    maioria dos acertos é só uma leitura.
+    """
+    now = datetime.utcnow()
+    stmt = select(GenerationCache).where(
+        GenerationCache.cache_key == cache_key,
+        GenerationCache.expires_at > now
+    )
+    entry = (await db.execute(stmt)).scalars().first()
+    if entry is None:
+        return None
+    stale = now - timedelta(seconds=GENERATION_CACHE_TOUCH_INTERVAL)
+    if entry.last_accessed_at is None or entry.last_accessed_at < stale:
+        await db.execute(
+            update(GenerationCache).where(GenerationCache.id == entry.id).values(last_accessed_at=func.now())
+        )
+        await db.commit()
+    return entry
+
+async def save_generation_to_cache(
+    db: AsyncSession, cache_key: str, endpoint: str, payload: str, ttl_seconds: int
+) -> None:
+    """
+    Salva uma resposta no cache, substituindo uma entrada expirada com a mesma chave.
+    A cada GENERATION_CACHE_EVICT_EVERY gravações, despeja entradas expiradas ou excedentes.
+    """
+    global _saves_since_evict
+    now = datetime.utcnow()
+    await db.execute(delete(GenerationCache).where(GenerationCache.cache_key == cache_key))
+    db.add(GenerationCache(
+        cache_key=cache_key,
+        endpoint=endpoint,
+        payload=payload,
+        expires_at=now + timedelta(seconds=ttl_seconds)
+    ))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return
+    _saves_since_evict += 1
+    if _saves_since_evict >= GENERATION_CACHE_EVICT_EVERY:
+        _saves_since_evict = 0
+        await _evict(db, now)
+
+async def _evict(db: AsyncSession, now: datetime) -> None:
+    await db.execute(delete(GenerationCache).where(GenerationCache.expires_at <= now))
+    total_rows = (await db.execute(select(func.count(GenerationCache.id)))).scalar_one()
+    excess = total_rows - GENERATION_CACHE_MAX_ROWS
+    if excess > 0:
+        oldest = select(GenerationCache.id).order_by(GenerationCache.last_accessed_at.asc()).limit(excess)
+        await db.execute(delete(GenerationCache).where(GenerationCache.id.in_(oldest)))
+        logger.info(f"Cache de gerações: {excess} entradas despejadas.")
+    await db.commit()
+
+async def add_generations_bulk(
+    db: AsyncSession, rows: List[Tuple[str, str, str]], ttl_seconds: int
+) -> int:
+    """
+    Adiciona à sessão várias respostas (chave, endpoint, payload), substituindo
+    entradas expiradas e ignorando as válidas. Não faz commit: o chamador agrupa
+    o lote em uma transação. Retorna o número de respostas adicionadas.
+    """
+    if not rows:
+        return 0
+    now = datetime.utcnow()
+    keys = list({cache_key for cache_key, _, _ in rows})
+    await db.execute(
+        delete(GenerationCache).where(GenerationCache.cache_key.in_(keys), GenerationCache.expires_at <= now)
+    )
+    existing = set((await db.execute(
+        select(GenerationCache.cache_key).where(GenerationCache.cache_key.in_(keys))
+    )).scalars().all())
+    new_entries = {}
+    for cache_key, endpoint, payload in rows:
+        if cache_key not in existing:
+            new_entries[cache_key] = GenerationCache(
+                cache_key=cache_key,
+                endpoint=endpoint,
+                payload=payload,
+                expires_at=now + timedelta(seconds=ttl_seconds)
+            )
+    db.add_all(new_entries.values())
+    return len(new_entries)
+
+async def evict_generations(db: AsyncSession) -> None:
+    """Despeja entradas expiradas ou excedentes (ex: após uma carga em lote)."""
+    await _evict(db, datetime.utcnow())
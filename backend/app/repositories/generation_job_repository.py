@@ -0,0 +1,129 @@
+# generation_job_repository.py
+# Repositório para a fila persistente de jobs de geração
+
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..database.models import (
+    GenerationJob, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED
+)
+
+async def get_job(db: AsyncSession, job_id: str) -> GenerationJob | None:
+    result = await db.execute(select(GenerationJob).where(GenerationJob.id == job_id))
+    return result.scalars().first()
+
+async def find_active_job(db: AsyncSession, kind: str, input_hash: str) -> GenerationJob | None:
+    """
+    Busca um job com a mesma entrada que ainda não falhou (na fila, em execução ou concluído).
+    """
+    stmt = select(GenerationJob).where(
+        GenerationJob.kind == kind,
+        GenerationJob.input_hash == input_hash,
+        GenerationJob.status != JOB_FAILED
+    ).order_by(GenerationJob.created_at.desc())
+    result = await db.execute(stmt)
+    return result.scalars().first()
+
+async def create_job(db: AsyncSession, kind: str, input_hash: str, payload: str) -> GenerationJob:
+    job = GenerationJob(
+        id=uuid.uuid4().hex, kind=kind, input_hash=input_hash, payload=payload, status=JOB_QUEUED
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+async def claim_next_job(db: AsyncSession, lease_seconds: float) -> GenerationJob | None:
+    """
+    Reserva o job mais antigo da fila (ou um job em execução cuja posse expirou).
+
+    A reserva é um UPDATE condicional ao estado lido, então dois workers nunca
+    reservam o mesmo job.
+    """
+    for _ in range(5):
+        now = datetime.utcnow()
+        stmt = select(GenerationJob).where(or_(
+            GenerationJob.status == JOB_QUEUED,
+            and_(GenerationJob.status == JOB_RUNNING, GenerationJob.locked_until < now)
+        )).order_by(GenerationJob.created_at.asc()).limit(1)
+        job = (await db.execute(stmt)).scalars().first()
+        if job is None:
+            return None
+
+        result = await db.execute(
+            update(GenerationJob)
+            .where(
+                GenerationJob.id == job.id,
+                GenerationJob.status == job.status,
+                GenerationJob.attempts == job.attempts
+            )
+            .values(
+                status=JOB_RUNNING,
+                attempts=job.attempts + 1,
+                locked_until=now + timedelta(seconds=lease_seconds)
+            )
+        )
+        await db.commit()
+        if result.rowcount == 1:
+            await db.refresh(job)
+            return job
+    return None
+
+def _owned_by(job_id: str, attempts: int):
+    # A tentativa que reservou o job; depois de uma retomada por outro worker, não casa mais.
+    return and_(
+        GenerationJob.id == job_id,
+        GenerationJob.status == JOB_RUNNING,
+        GenerationJob.attempts == attempts
+    )
+
+async def renew_lease(db: AsyncSession, job_id: str, attempts: int, lease_seconds: float) -> bool:
+    """
+    Estende a posse de um job em execução. Retorna False se o job já não pertence
+    a esta tentativa (concluído, devolvido à fila ou retomado por outro worker).
+    """
+    result = await db.execute(
+        update(GenerationJob)
+        .where(_owned_by(job_id, attempts))
+        .values(locked_until=datetime.utcnow() + timedelta(seconds=lease_seconds))
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+async def complete_job(db: AsyncSession, job_id: str, attempts: int, result: str) -> bool:
+    """
+    Grava o resultado da tentativa `attempts`. Retorna False (sem alterar nada) se
+    o job já não pertence a ela, ex: a posse expirou e outro worker o retomou.
+    """
+    updated = await db.execute(
+        update(GenerationJob)
+        .where(_owned_by(job_id, attempts))
+        .values(status=JOB_SUCCEEDED, result=result, error=None, locked_until=None)
+    )
+    await db.commit()
+    return updated.rowcount == 1
+
+async def fail_job(db: AsyncSession, job_id: str, attempts: int, error: str) -> bool:
+    """Marca a tentativa `attempts` como falha. Retorna False se o job já não pertence a ela."""
+    updated = await db.execute(
+        update(GenerationJob)
+        .where(_owned_by(job_id, attempts))
+        .values(status=JOB_FAILED, error=error, locked_until=None)
+    )
+    await db.commit()
+    return updated.rowcount == 1
+
+async def requeue_job(db: AsyncSession, job_id: str, attempts: int) -> None:
+    """
+    Devolve à fila um job interrompido (ex: shutdown do worker). A tentativa
+    interrompida não conta para JOB_MAX_ATTEMPTS.
+    """
+    await db.execute(
+        update(GenerationJob)
+        .where(_owned_by(job_id, attempts))
+        .values(status=JOB_QUEUED, attempts=attempts - 1, locked_until=None)
+    )
+    await db.commit()
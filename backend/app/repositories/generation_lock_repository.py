@@ -0,0 +1,32 @@
+# generation_lock_repository.py
+# Repositório para locks de geração entre workers
+
+from datetime import datetime, timedelta
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database.models import GenerationLock
+
+async def try_acquire_lock(db: AsyncSession, lock_key: str, owner: str, ttl_seconds: float) -> bool:
+    """
+    Tenta obter o lock de uma chave. Retorna False se outro worker já o possui.
+    """
+    now = datetime.utcnow()
+    # Remove um lock expirado antes de tentar obtê-lo.
+    await db.execute(
+        delete(GenerationLock).where(GenerationLock.lock_key == lock_key, GenerationLock.expires_at < now)
+    )
+    db.add(GenerationLock(lock_key=lock_key, owner=owner, expires_at=now + timedelta(seconds=ttl_seconds)))
+    try:
+        await db.commit()
+        return True
+    except IntegrityError:
+        await db.rollback()
+        return False
+
+async def release_lock(db: AsyncSession, lock_key: str, owner: str) -> None:
+    await db.execute(
+        delete(GenerationLock).where(GenerationLock.lock_key == lock_key, GenerationLock.owner == owner)
+    )
+    await db.commit()
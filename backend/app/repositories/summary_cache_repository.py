@@ -1,4 +1,60 @@
 # summary_cache_repository.py
 # Repositório para cache de resumos
 
-# Implemente funções conforme necessário
+from typing import List, Tuple
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from ..database.models import SummaryCache
+
+async def get_cached_summary(db: AsyncSession, document_id: str, student_level: str) -> SummaryCache | None:
+    """
+    Busca um resumo em cache no banco de dados.
+    """
+    stmt = select(SummaryCache).where(
+        SummaryCache.document_id == document_id,
+        SummaryCache.student_level == student_level
+    )
+    result = await db.execute(stmt)
+    return result.scalars().first()
+
+async def save_summary_to_cache(db: AsyncSession, document_id: str, student_level: str, summary_text: str) -> SummaryCache:
+    """
+    Salva um novo resumo gerado no banco de dados de cache.
+    Se outro worker já salvou o mesmo (documento, nível), retorna a entrada existente.
+    """
+    new_cache_entry = SummaryCache(
+        document_id=document_id,
+        student_level=student_level,
+        summary_text=summary_text
+    )
+    db.add(new_cache_entry)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return await get_cached_summary(db, document_id, student_level)
+    await db.refresh(new_cache_entry)
+    return new_cache_entry
+
+async def add_summaries_bulk(db: AsyncSession, rows: List[Tuple[str, str, str]]) -> int:
+    """
+    Adiciona à sessão vários resumos (document_id, nível, texto), ignorando os que
+    já estão no banco. Não faz commit: o chamador agrupa o lote em uma transação.
+    Retorna o número de resumos adicionados.
+    """
+    if not rows:
+        return 0
+    document_ids = list({document_id for document_id, _, _ in rows})
+    stmt = select(SummaryCache.document_id, SummaryCache.student_level).where(
+        SummaryCache.document_id.in_(document_ids)
+    )
+    existing = {tuple(row) for row in (await db.execute(stmt)).all()}
+    new_entries = {}
+    for document_id, student_level, summary_text in rows:
+        if (document_id, student_level) not in existing:
+            new_entries[(document_id, student_level)] = SummaryCache(
+                document_id=document_id, student_level=student_level, summary_text=summary_text
+            )
+    db.add_all(new_entries.values())
+    return len(new_entries)
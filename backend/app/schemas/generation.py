@@ -11,7 +11,9 @@ class QuizQuestionSchema(BaseModel):
     explicacao: str
 
 class QuizRequest(BaseModel):
-    text: str
+    # Envie o texto ou o document_handle retornado por /upload-pdf/?compact=true.
+    text: str | None = None
+    document_handle: str | None = None
     studentLevel: str
 
 class QuizResponse(BaseModel):
@@ -23,7 +25,8 @@ class FlashcardSchema(BaseModel):
     verso: str
 
 class FlashcardRequest(BaseModel):
-    text: str
+    text: str | None = None
+    document_handle: str | None = None
     studentLevel: str
 
 class FlashcardResponse(BaseModel):
@@ -31,7 +34,8 @@ class FlashcardResponse(BaseModel):
 
 # --- Study Plan Schemas ---
 class StudyPlanRequest(BaseModel):
-    text: str
+    text: str | None = None
+    document_handle: str | None = None
     studentLevel: str
     days: int
 
@@ -45,7 +49,8 @@ class MultipleChoiceQuestionSchema(BaseModel):
     resposta_correta: Literal['A', 'B', 'C', 'D']
 
 class QuestionRequest(BaseModel):
-    text: str
+    text: str | None = None
+    document_handle: str | None = None
     count: int
     difficulty: str
 
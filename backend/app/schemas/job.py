@@ -0,0 +1,28 @@
+# job.py
+# Schemas para jobs de geração em segundo plano
+
+import json
+from datetime import datetime
+from pydantic import BaseModel
+from typing import Any, Dict
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    result: Dict[str, Any] | None = None
+    error: str | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+
+    @classmethod
+    def from_job(cls, job) -> "JobStatusResponse":
+        return cls(
+            job_id=job.id,
+            kind=job.kind,
+            status=job.status,
+            result=json.loads(job.result) if job.result else None,
+            error=job.error,
+            created_at=job.created_at,
+            updated_at=job.updated_at,
+        )
@@ -2,11 +2,30 @@
 # Schema para resumo
 
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List
 
 class SummaryRequest(BaseModel):
-    chunks: List[str]
+    # Envie os chunks ou o document_handle retornado por /upload-pdf/?compact=true.
+    chunks: List[str] | None = None
+    document_handle: str | None = None
     level: str
 
 class SummaryResponse(BaseModel):
     summary: str
+
+# Resposta da IA na fase MAP em lotes (um resumo por fragmento, identificado pelo id).
+class ChunkSummarySchema(BaseModel):
+    id: int
+    resumo: str
+
+class MapBatchResponse(BaseModel):
+    resumos: List[ChunkSummarySchema]
+
+class MultiLevelSummaryRequest(BaseModel):
+    chunks: List[str] | None = None
+    document_handle: str | None = None
+    levels: List[str]
+
+class MultiLevelSummaryResponse(BaseModel):
+    # Nível -> resumo, na ordem dos níveis pedidos.
+    summaries: Dict[str, str]
@@ -2,9 +2,20 @@
 # Schema para upload de PDF
 
 from pydantic import BaseModel
-from typing import List
+from typing import List, Tuple
 
 class PDFProcessResponse(BaseModel):
     filename: str
     total_chunks: int
-    chunks: List[str]
+    # Modo padrão: os chunks completos. Modo compacto: handle do documento
+    # armazenado no servidor, os offsets [início, fim) de cada chunk e o offset
+    # de início de cada página no texto.
+    chunks: List[str] | None = None
+    document_handle: str | None = None
+    chunk_offsets: List[Tuple[int, int]] | None = None
+    page_offsets: List[int] | None = None
+
+class ExtractionCacheStatsResponse(BaseModel):
+    hits: int
+    misses: int
+    hit_ratio: float
@@ -0,0 +1,228 @@
+# ai_resilience.py
+# Timeouts adaptativos, hedge, novas tentativas com orçamento e circuit breaker para as chamadas à IA
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+import httpx
+from fastapi import HTTPException, status
+
+from ..core import metrics
+from ..core.config import (
+    AI_REQUEST_TIMEOUT, AI_TIMEOUT_MIN, AI_TIMEOUT_P99_MULTIPLIER, AI_LATENCY_WINDOW, AI_LATENCY_MIN_SAMPLES,
+    AI_HEDGE_ENABLED, AI_HEDGE_QUANTILE, AI_RETRY_BACKOFF_BASE, AI_RETRY_BACKOFF_MAX,
+    AI_RETRY_BUDGET_RATIO, AI_RETRY_BUDGET_MAX, AI_CIRCUIT_FAILURE_THRESHOLD, AI_CIRCUIT_OPEN_SECONDS
+)
+from .gemini_client import GeminiAPIError
+
+logger = logging.getLogger(__name__)
+
+# Tipo de chamada: (endpoint, fase). Fases diferentes têm latências bem diferentes
+# (ex: um lote da fase MAP contra o REDUCE final).
+CallType = Tuple[str, str]
+
+# Status HTTP da API que indicam falha passageira.
+_TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class AICallError(Exception):
+    """Falha de uma tentativa de chamada à IA. `kind` é timeout, unavailable ou rejected."""
+
+    def __init__(self, kind: str, transient: bool) -> None:
+        super().__init__(kind)
+        self.kind = kind
+        self.transient = transient
+
+
+def classify(error: Exception) -> AICallError:
+    """Converte o erro de uma tentativa em AICallError, separando falhas passageiras das definitivas."""
+    if isinstance(error, AICallError):
+        return error
+    if isinstance(error, asyncio.TimeoutError):
+        return AICallError("timeout", transient=True)
+    if isinstance(error, httpx.TransportError):
+        return AICallError("unavailable", transient=True)
+    if isinstance(error, GeminiAPIError) and error.status_code in _TRANSIENT_STATUS:
+        return AICallError("unavailable", transient=True)
+    # Requisição inválida, chave ausente ou resposta sem conteúdo: repetir não adianta.
+    return AICallError("rejected", transient=False)
+
+
+def to_http_exception(error: AICallError) -> HTTPException:
+    if error.kind == "timeout":
+        return HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="A geração de conteúdo demorou demais para responder."
+        )
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="O serviço de IA está indisponível no momento."
+    )
+
+
+class LatencyTracker:
+    """Latências das últimas chamadas bem-sucedidas de cada tipo, para timeouts e hedges."""
+
+    def __init__(self, window: int = AI_LATENCY_WINDOW, min_samples: int = AI_LATENCY_MIN_SAMPLES) -> None:
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[CallType, Deque[float]] = {}
+
+    def observe(self, call_type: CallType, seconds: float) -> None:
+        samples = self._samples.get(call_type)
+        if samples is None:
+            samples = self._samples[call_type] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def quantile(self, call_type: CallType, q: float) -> float | None:
+        """Quantil `q` das latências observadas, ou None se ainda há poucas amostras."""
+        samples = self._samples.get(call_type)
+        if samples is None or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def timeout(self, call_type: CallType) -> float:
+        p99 = self.quantile(call_type, 0.99)
+        if p99 is None:
+            return AI_REQUEST_TIMEOUT
+        return min(AI_REQUEST_TIMEOUT, max(AI_TIMEOUT_MIN, p99 * AI_TIMEOUT_P99_MULTIPLIER))
+
+    def hedge_delay(self, call_type: CallType) -> float | None:
+        """Tempo após o qual vale enviar uma requisição duplicada, ou None para não enviar."""
+        if not AI_HEDGE_ENABLED:
+            return None
+        return self.quantile(call_type, AI_HEDGE_QUANTILE)
+
+    def stats(self) -> dict:
+        return {
+            f"{endpoint}:{phase}": {
+                "samples": len(samples),
+                "p50_seconds": self.quantile((endpoint, phase), 0.5),
+                "p95_seconds": self.quantile((endpoint, phase), 0.95),
+                "timeout_seconds": self.timeout((endpoint, phase)),
+            }
+            for (endpoint, phase), samples in sorted(self._samples.items())
+        }
+
+
+class RetryBudget:
+    """
+    Saldo de chamadas extras (novas tentativas e hedges) compartilhado pelo processo.
+    Cada chamada original deposita `ratio`; cada chamada extra saca 1.
+    """
+
+    def __init__(self, ratio: float = AI_RETRY_BUDGET_RATIO, max_balance: float = AI_RETRY_BUDGET_MAX) -> None:
+        self.ratio = ratio
+        self.max_balance = max_balance
+        self._balance = max_balance
+        self.exhausted = 0
+
+    def deposit(self) -> None:
+        self._balance = min(self.max_balance, self._balance + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self._balance >= 1:
+            self._balance -= 1
+            return True
+        self.exhausted += 1
+        return False
+
+    def stats(self) -> dict:
+        return {"balance": round(self._balance, 2), "exhausted": self.exhausted}
+
+
+def backoff_delay(attempt: int) -> float:
+    """Espera antes da tentativa `attempt` (1 = primeira nova tentativa), com jitter completo."""
+    return random.uniform(0, min(AI_RETRY_BACKOFF_MAX, AI_RETRY_BACKOFF_BASE * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Interrompe as chamadas enquanto a API está fora do ar.
+
+    Fechado: as chamadas passam. Após `failure_threshold` falhas passageiras
+    seguidas, abre: as chamadas falham na hora por `open_seconds`. Depois disso
+    (meio aberto), uma única chamada de teste passa; se funcionar o circuito
+    fecha, senão abre de novo.
+    """
+
+    def __init__(
+        self, failure_threshold: int = AI_CIRCUIT_FAILURE_THRESHOLD, open_seconds: float = AI_CIRCUIT_OPEN_SECONDS
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def before_call(self, endpoint: str) -> bool:
+        """
+        Levanta 503 se o circuito não permite a chamada agora. Retorna True se a
+        chamada é a de teste do circuito meio aberto: quem a fez deve chamar
+        `release_probe` ao terminar, com ou sem resultado.
+        """
+        if self.state == "open" and time.monotonic() - self._opened_at >= self.open_seconds:
+            self.state = "half_open"
+            self._probe_in_flight = False
+        if self.state == "closed":
+            return False
+        if self.state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        metrics.AI_ERRORS.inc(endpoint, "circuit_open")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="O serviço de IA está temporariamente indisponível. Tente novamente em instantes."
+        )
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info("Circuit breaker da IA fechado: a API voltou a responder.")
+        self.state = "closed"
+        self._failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state == "half_open" or (self.state == "closed" and self._failures >= self.failure_threshold):
+            logger.error(
+                f"Circuit breaker da IA aberto após {self._failures} falhas seguidas; "
+                f"chamadas falham imediatamente por {self.open_seconds}s."
+            )
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """
+        Fim da chamada de teste. Se ela não registrou sucesso nem falha (desistiu
+        na fila, foi cancelada ou falhou de forma definitiva), o circuito continua
+        meio aberto e a próxima chamada pode testar.
+        """
+        self._probe_in_flight = False
+
+
+latency_tracker = LatencyTracker()
+retry_budget = RetryBudget()
+circuit_breaker = CircuitBreaker()
+
+
+def stats() -> dict:
+    return {
+        "circuit_state": circuit_breaker.state,
+        "retry_budget": retry_budget.stats(),
+        "latency": latency_tracker.stats(),
+    }
+
+
+_CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+metrics.gauge(
+    "ai_circuit_state", "Estado do circuit breaker da IA (0 fechado, 1 meio aberto, 2 aberto).",
+    lambda: {(): _CIRCUIT_STATES[circuit_breaker.state]}
+)
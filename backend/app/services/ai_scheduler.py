@@ -0,0 +1,200 @@
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict
+
+from fastapi import HTTPException, status
+
+from ..core import metrics
+from ..core.config import (
+    AI_MAX_IN_FLIGHT, AI_REQUESTS_PER_MINUTE, AI_TOKENS_PER_MINUTE, AI_QUEUE_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Balde de fichas reabastecido continuamente a `rate_per_minute` fichas por minuto."""
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None) -> None:
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate_per_second)
+        self._updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Segundos até haver `amount` fichas disponíveis (0 se já houver)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self._tokens >= amount:
+            return 0.0
+        return (amount - self._tokens) / self.rate_per_second
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self._tokens -= min(amount, self.capacity)
+
+
+class _Waiter:
+    __slots__ = ("future", "tokens", "enqueued_at")
+
+    def __init__(self, future: asyncio.Future, tokens: int) -> None:
+        self.future = future
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+
+
+class AIScheduler:
+    """
+    Agendador de todas as chamadas à IA do processo.
+
+    Limita as chamadas simultâneas, respeita a cota de requisições e de tokens
+    por minuto (token bucket) e alterna entre as filas de cada endpoint
+    (round-robin), para que uma rajada de resumos não bloqueie quizzes e
+    flashcards.
+    """
+
+    def __init__(self, max_in_flight: int, requests_per_minute: int, tokens_per_minute: int) -> None:
+        self.max_in_flight = max_in_flight
+        self._request_bucket = TokenBucket(requests_per_minute)
+        self._token_bucket = TokenBucket(tokens_per_minute)
+        self._queues: Dict[str, Deque[_Waiter]] = {}
+        self._round_robin: Deque[str] = deque()
+        self._in_flight = 0
+        self._retry_handle: asyncio.TimerHandle | None = None
+        # Métricas por endpoint.
+        self._dispatched: Dict[str, int] = {}
+        self._wait_total: Dict[str, float] = {}
+        self._wait_max: Dict[str, float] = {}
+        self._rejected: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def slot(self, endpoint: str, estimated_tokens: int):
+        """Aguarda a vez da chamada e libera a vaga ao final."""
+        await self.acquire(endpoint, estimated_tokens)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, endpoint: str, estimated_tokens: int) -> None:
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(loop.create_future(), estimated_tokens)
+        queue = self._queues.setdefault(endpoint, deque())
+        if not queue:
+            self._round_robin.append(endpoint)
+        queue.append(waiter)
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=AI_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self._rejected[endpoint] = self._rejected.get(endpoint, 0) + 1
+            metrics.AI_ERRORS.inc(endpoint, "queue_timeout")
+            logger.error(f"Chamada à IA ({endpoint}) esperou mais de {AI_QUEUE_TIMEOUT}s na fila.")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="O serviço de IA está sobrecarregado no momento. Tente novamente em instantes."
+            )
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        if waiter.future.done() and not waiter.future.cancelled():
+            # A vaga foi concedida ao mesmo tempo em que o chamador desistiu.
+            self.release()
+        else:
+            waiter.future.cancel()
+
+    def release(self) -> None:
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._in_flight < self.max_in_flight and self._round_robin:
+            endpoint = self._round_robin[0]
+            queue = self._queues[endpoint]
+            # Descarta chamadores que desistiram enquanto esperavam.
+            while queue and queue[0].future.done():
+                queue.popleft()
+            if not queue:
+                self._round_robin.popleft()
+                continue
+
+            waiter = queue[0]
+            wait = max(self._request_bucket.wait_time(1), self._token_bucket.wait_time(waiter.tokens))
+            if wait > 0:
+                self._schedule_retry(wait)
+                return
+
+            queue.popleft()
+            self._round_robin.rotate(-1)
+            if not queue:
+                self._round_robin.remove(endpoint)
+            self._request_bucket.consume(1)
+            self._token_bucket.consume(waiter.tokens)
+            self._in_flight += 1
+            self._record_dispatch(endpoint, time.monotonic() - waiter.enqueued_at)
+            waiter.future.set_result(None)
+
+    def _schedule_retry(self, delay: float) -> None:
+        if self._retry_handle is not None and not self._retry_handle.cancelled():
+            return
+        loop = asyncio.get_running_loop()
+
+        def retry() -> None:
+            self._retry_handle = None
+            self._dispatch()
+
+        self._retry_handle = loop.call_later(delay, retry)
+
+    def _record_dispatch(self, endpoint: str, waited: float) -> None:
+        metrics.AI_QUEUE_WAIT_SECONDS.observe(waited, endpoint)
+        self._dispatched[endpoint] = self._dispatched.get(endpoint, 0) + 1
+        self._wait_total[endpoint] = self._wait_total.get(endpoint, 0.0) + waited
+        self._wait_max[endpoint] = max(self._wait_max.get(endpoint, 0.0), waited)
+
+    def stats(self) -> dict:
+        endpoints = set(self._queues) | set(self._dispatched) | set(self._rejected)
+        return {
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "endpoints": {
+                endpoint: {
+                    "queue_depth": sum(1 for w in self._queues.get(endpoint, ()) if not w.future.done()),
+                    "dispatched": self._dispatched.get(endpoint, 0),
+                    "rejected": self._rejected.get(endpoint, 0),
+                    "avg_wait_seconds": (
+                        self._wait_total.get(endpoint, 0.0) / self._dispatched[endpoint]
+                        if self._dispatched.get(endpoint) else 0.0
+                    ),
+                    "max_wait_seconds": self._wait_max.get(endpoint, 0.0),
+                }
+                for endpoint in sorted(endpoints)
+            },
+        }
+
+
+scheduler = AIScheduler(
+    max_in_flight=AI_MAX_IN_FLIGHT,
+    requests_per_minute=AI_REQUESTS_PER_MINUTE,
+    tokens_per_minute=AI_TOKENS_PER_MINUTE,
+)
+
+metrics.gauge("ai_scheduler_in_flight", "Chamadas à IA em andamento neste processo.", lambda: {(): scheduler._in_flight})
+metrics.gauge(
+    "ai_scheduler_queue_depth",
+    "Chamadas à IA aguardando na fila do agendador.",
+    lambda: {(endpoint,): values["queue_depth"] for endpoint, values in scheduler.stats()["endpoints"].items()},
+    ("endpoint",)
+)
@@ -0,0 +1,217 @@
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import List, Tuple
+
+from ..core.config import (
+    CHUNK_SIZE, CHUNK_OVERLAP, CHUNKER,
+    CHUNK_TOKEN_BUDGET, CHUNK_OVERLAP_TOKENS, CHUNK_CHARS_PER_TOKEN
+)
+
+Offsets = List[Tuple[int, int]]
+
+# Fim de parágrafo, quebra de linha ou fim de sentença seguido de espaço.
+# O limite é a posição logo após o separador, onde começa o próximo trecho.
+_BOUNDARY = re.compile(r"(?:[.!?…:;][\"'”)\]]*\s|\n)\s*")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimativa de tokens com uma razão fixa de CHUNK_CHARS_PER_TOKEN caracteres
+    por token. A razão deve ser medida nos materiais reais com tools/calibrate_tokens.py.
+    """
+    return int(len(text) / CHUNK_CHARS_PER_TOKEN + 0.5)
+
+
+def find_boundaries(text: str) -> array:
+    """Offsets de todos os limites de sentença/parágrafo do texto, em ordem, em uma única passada."""
+    return array("q", (match.end() for match in _BOUNDARY.finditer(text)))
+
+
+def fixed_chunk_offsets(text: str, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> Offsets:
+    """Janelas fixas de `size` caracteres com `overlap` de sobreposição (chunker original)."""
+    offsets = []
+    start_index = 0
+    while start_index < len(text):
+        offsets.append((start_index, min(start_index + size, len(text))))
+        start_index += size - overlap
+    return offsets
+
+
+def sentence_chunk_offsets(
+    text: str,
+    token_budget: int = CHUNK_TOKEN_BUDGET,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+) -> Offsets:
+    """
+    Agrupa sentenças inteiras em chunks de até `token_budget` tokens.
+
+    Os limites de sentença são calculados uma vez; cada chunk é então fechado
+    no último limite que cabe no orçamento (busca binária), e o próximo chunk
+    começa no primeiro limite dentro da janela de sobreposição. Sentenças
+    maiores que o orçamento (ou que não avançariam além do chunk anterior)
+    são cortadas no último espaço antes do limite.
+    Retorna apenas os offsets [início, fim), sem copiar o texto.
+    """
+    text_length = len(text)
+    if not text_length:
+        return []
+    max_chars = max(1, int(token_budget * CHUNK_CHARS_PER_TOKEN))
+    overlap_chars = int(overlap_tokens * CHUNK_CHARS_PER_TOKEN)
+    boundaries = find_boundaries(text)
+
+    offsets = []
+    start = 0
+    previous_end = 0
+    while start < text_length:
+        limit = start + max_chars
+        if limit >= text_length:
+            offsets.append((start, text_length))
+            break
+
+        # Último limite de sentença dentro do orçamento.
+        index = bisect_right(boundaries, limit) - 1
+        end = boundaries[index] if index >= 0 else 0
+        floor = max(start, previous_end)
+        if end <= floor:
+            # Sentença maior que o orçamento: corta no último espaço, ou no limite.
+            space = text.rfind(" ", floor, limit)
+            end = space + 1 if space >= floor else limit
+        offsets.append((start, end))
+        previous_end = end
+
+        # O próximo chunk começa no primeiro limite de sentença da janela de sobreposição.
+        next_start = end
+        if overlap_chars:
+            index = bisect_left(boundaries, end - overlap_chars)
+            if index < len(boundaries) and start < boundaries[index] < end:
+                next_start = boundaries[index]
+        start = next_start
+    return offsets
+
+
+def chunk_offsets(text: str) -> Offsets:
+    """Offsets dos chunks segundo o chunker configurado (CHUNKER)."""
+    if CHUNKER == "fixed":
+        return fixed_chunk_offsets(text)
+    return sentence_chunk_offsets(text)
+
+
+def chunking_signature() -> str:
+    """Identifica o chunker e seus parâmetros; faz parte das chaves de cache que dependem dos chunks."""
+    if CHUNKER == "fixed":
+        return f"fixed:{CHUNK_SIZE}:{CHUNK_OVERLAP}"
+    return f"sentence:{CHUNK_TOKEN_BUDGET}:{CHUNK_OVERLAP_TOKENS}:{CHUNK_CHARS_PER_TOKEN}"
+
+
+class StreamingChunker:
+    """
+    Fatia um texto que chega em partes (ex: página a página).
+
+    Produz exatamente os mesmos chunks que chunk_offsets() sobre o texto
+    completo, mas mantém em memória apenas o trecho ainda não fatiado. Um
+    chunk só é emitido quando o texto recebido já decide onde ele termina.
+    """
+
+    def __init__(self):
+        self._fixed = CHUNKER == "fixed"
+        if self._fixed:
+            self._max_chars = CHUNK_SIZE
+            self._step = CHUNK_SIZE - CHUNK_OVERLAP
+        else:
+            self._max_chars = max(1, int(CHUNK_TOKEN_BUDGET * CHUNK_CHARS_PER_TOKEN))
+            self._overlap_chars = int(CHUNK_OVERLAP_TOKENS * CHUNK_CHARS_PER_TOKEN)
+        # Texto recebido a partir do offset absoluto self._base.
+        self._buffer = ""
+        self._base = 0
+        self._start = 0
+        self._previous_end = 0
+        # Limites de sentença confirmados (offsets absolutos) e onde retomar a busca.
+        self._boundaries: List[int] = []
+        self._scan_pos = 0
+
+    def feed(self, text: str) -> List[str]:
+        """Acrescenta um trecho do texto e retorna os chunks que ficaram completos."""
+        if not text:
+            return []
+        self._buffer += text
+        return self._drain(final=False)
+
+    def finish(self) -> List[str]:
+        """Sinaliza o fim do texto e retorna os chunks restantes."""
+        return self._drain(final=True)
+
+    def _drain(self, final: bool) -> List[str]:
+        if self._fixed:
+            offsets = self._fixed_offsets(final)
+        else:
+            self._scan(final)
+            offsets = self._sentence_offsets(final)
+        chunks = [self._buffer[start - self._base:end - self._base] for start, end in offsets]
+        self._trim()
+        return chunks
+
+    def _fixed_offsets(self, final: bool) -> Offsets:
+        text_length = self._base + len(self._buffer)
+        offsets = []
+        while self._start < text_length:
+            end = self._start + self._max_chars
+            if end > text_length:
+                if not final:
+                    break
+                end = text_length
+            offsets.append((self._start, end))
+            self._start += self._step
+        return offsets
+
+    def _scan(self, final: bool) -> None:
+        # A busca é retomada no fim do último limite confirmado, como faria finditer
+        # sobre o texto completo. Um limite que termina no fim do trecho recebido
+        # ainda pode se estender (espaços na próxima parte) e só é confirmado depois.
+        text_length = self._base + len(self._buffer)
+        for match in _BOUNDARY.finditer(self._buffer, self._scan_pos - self._base):
+            boundary = self._base + match.end()
+            if boundary >= text_length and not final:
+                break
+            self._boundaries.append(boundary)
+            self._scan_pos = boundary
+
+    def _sentence_offsets(self, final: bool) -> Offsets:
+        # Mesmo algoritmo de sentence_chunk_offsets, aplicado só enquanto o texto recebido basta.
+        text_length = self._base + len(self._buffer)
+        boundaries = self._boundaries
+        offsets = []
+        while self._start < text_length:
+            start = self._start
+            limit = start + self._max_chars
+            if limit >= text_length:
+                if final:
+                    offsets.append((start, text_length))
+                    self._start = text_length
+                break
+
+            index = bisect_right(boundaries, limit) - 1
+            end = boundaries[index] if index >= 0 else 0
+            floor = max(start, self._previous_end)
+            if end <= floor:
+                space = self._buffer.rfind(" ", floor - self._base, limit - self._base)
+                end = self._base + space + 1 if space >= floor - self._base else limit
+            offsets.append((start, end))
+            self._previous_end = end
+
+            next_start = end
+            if self._overlap_chars:
+                index = bisect_left(boundaries, end - self._overlap_chars)
+                if index < len(boundaries) and start < boundaries[index] < end:
+                    next_start = boundaries[index]
+            self._start = next_start
+        return offsets
+
+    def _trim(self) -> None:
+        # Descarta o texto já fatiado e os limites que não podem mais ser usados.
+        keep_from = self._start if self._fixed else min(self._start, self._scan_pos)
+        if keep_from > self._base:
+            self._buffer = self._buffer[keep_from - self._base:]
+            self._base = keep_from
+        if not self._fixed:
+            del self._boundaries[:bisect_left(self._boundaries, self._start - self._overlap_chars)]
@@ -0,0 +1,54 @@
+
+from typing import List
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import GENERATOR_MAX_INPUT_CHARS
+from ..repositories import extraction_cache_repository
+from .text_processor import chunks_from_offsets
+
+# Os documentos enviados ficam no cache de extração; o handle é a chave da entrada.
+_EXPIRED_DETAIL = "Documento não encontrado ou expirado. Envie o PDF novamente."
+
+
+async def _load(db: AsyncSession, document_handle: str):
+    entry = await extraction_cache_repository.get_document(db, document_handle)
+    if entry is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=_EXPIRED_DETAIL)
+    return entry
+
+
+async def resolve_chunks(
+    db: AsyncSession, chunks: List[str] | None, document_handle: str | None, empty_detail: str
+) -> List[str]:
+    """Retorna os chunks enviados na requisição ou, se houver handle, os do documento armazenado."""
+    if chunks:
+        return chunks
+    if document_handle:
+        entry = await _load(db, document_handle)
+        return chunks_from_offsets(entry.full_text, extraction_cache_repository.get_chunk_offsets(entry))
+    raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=empty_detail)
+
+
+async def resolve_text(db: AsyncSession, text: str | None, document_handle: str | None) -> str:
+    """
+    Retorna o texto enviado na requisição ou, se houver handle, o texto completo do documento.
+    O texto vai inteiro em um único prompt, então é recusado (413) acima de GENERATOR_MAX_INPUT_CHARS.
+    """
+    if not text and document_handle:
+        text = (await _load(db, document_handle)).full_text
+    if not text:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Informe o texto ou o document_handle de um PDF enviado."
+        )
+    if len(text) > GENERATOR_MAX_INPUT_CHARS:
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail=(
+                f"O texto tem {len(text)} caracteres, acima do limite de {GENERATOR_MAX_INPUT_CHARS} "
+                "para este gerador. Envie um trecho menor do documento."
+            )
+        )
+    return text
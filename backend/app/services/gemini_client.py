@@ -0,0 +1,132 @@
+
+import json
+import logging
+from typing import Any, AsyncIterator, Dict
+
+import httpx
+
+from ..core.config import (
+    AI_REQUEST_TIMEOUT, GEMINI_API_BASE_URL, GEMINI_MAX_CONNECTIONS, GEMINI_KEEPALIVE_EXPIRY
+)
+
+logger = logging.getLogger(__name__)
+
+
+class GeminiAPIError(Exception):
+    """Erro retornado pela API Gemini (status HTTP >= 400 ou resposta sem conteúdo)."""
+
+    def __init__(self, message: str, status_code: int | None = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class GeminiClient:
+    """
+    Cliente assíncrono da API REST do Gemini.
+
+    Usa um único httpx.AsyncClient com pool de conexões keep-alive, então cada
+    chamada em andamento custa uma corrotina e não uma thread, e cancelar a
+    chamada (ex: timeout) fecha a requisição de fato.
+    """
+
+    def __init__(self, api_key: str | None, base_url: str = GEMINI_API_BASE_URL) -> None:
+        self._api_key = api_key
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(AI_REQUEST_TIMEOUT, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=GEMINI_MAX_CONNECTIONS,
+                max_keepalive_connections=GEMINI_MAX_CONNECTIONS,
+                keepalive_expiry=GEMINI_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+    @staticmethod
+    def build_request_body(
+        prompt: str, system_instruction: str | None = None, response_mime_type: str | None = None
+    ) -> Dict[str, Any]:
+        body: Dict[str, Any] = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if system_instruction:
+            body["systemInstruction"] = {"parts": [{"text": system_instruction}]}
+        if response_mime_type:
+            body["generationConfig"] = {"responseMimeType": response_mime_type}
+        return body
+
+    def _headers(self) -> Dict[str, str]:
+        if not self._api_key:
+            raise GeminiAPIError("A variável de ambiente GEMINI_API_KEY não foi definida.")
+        return {"x-goog-api-key": self._api_key}
+
+    @staticmethod
+    def extract_text(payload: Dict[str, Any]) -> str:
+        try:
+            parts = payload["candidates"][0]["content"]["parts"]
+        except (KeyError, IndexError, TypeError):
+            raise GeminiAPIError("Resposta da API Gemini sem conteúdo.")
+        return "".join(part.get("text", "") for part in parts)
+
+    async def generate_content(
+        self,
+        model: str,
+        prompt: str,
+        system_instruction: str | None = None,
+        response_mime_type: str | None = None,
+    ) -> str:
+        response = await self._http.post(
+            f"/v1beta/models/{model}:generateContent",
+            headers=self._headers(),
+            json=self.build_request_body(prompt, system_instruction, response_mime_type),
+        )
+        if response.status_code >= 400:
+            raise GeminiAPIError(
+                f"API Gemini retornou {response.status_code}: {response.text[:500]}",
+                status_code=response.status_code,
+            )
+        return self.extract_text(response.json())
+
+    async def count_tokens(self, model: str, text: str) -> int:
+        """Número de tokens do texto no tokenizador do modelo (endpoint countTokens, sem geração)."""
+        response = await self._http.post(
+            f"/v1beta/models/{model}:countTokens",
+            headers=self._headers(),
+            json={"contents": [{"role": "user", "parts": [{"text": text}]}]},
+        )
+        if response.status_code >= 400:
+            raise GeminiAPIError(
+                f"API Gemini retornou {response.status_code}: {response.text[:500]}",
+                status_code=response.status_code,
+            )
+        try:
+            return int(response.json()["totalTokens"])
+        except (KeyError, TypeError, ValueError):
+            raise GeminiAPIError("Resposta do countTokens da API Gemini sem totalTokens.")
+
+    async def stream_generate_content(
+        self,
+        model: str,
+        prompt: str,
+        system_instruction: str | None = None,
+    ) -> AsyncIterator[str]:
+        """Gera o conteúdo em streaming (SSE), produzindo os trechos de texto à medida que chegam."""
+        async with self._http.stream(
+            "POST",
+            f"/v1beta/models/{model}:streamGenerateContent",
+            params={"alt": "sse"},
+            headers=self._headers(),
+            json=self.build_request_body(prompt, system_instruction),
+        ) as response:
+            if response.status_code >= 400:
+                body = (await response.aread()).decode("utf-8", errors="replace")
+                raise GeminiAPIError(
+                    f"API Gemini retornou {response.status_code}: {body[:500]}",
+                    status_code=response.status_code,
+                )
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                text = self.extract_text(json.loads(line[len("data:"):]))
+                if text:
+                    yield text
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
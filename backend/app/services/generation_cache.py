@@ -0,0 +1,92 @@
+
+import hashlib
+import json
+import logging
+import re
+from typing import Any, Awaitable, Callable, Dict, Generic, Type, TypeVar
+
+from pydantic import BaseModel
+
+from ..core import metrics
+from ..core.config import GENERATION_CACHE_TTL, GENERATION_CACHE_MEMORY_ENTRIES
+from ..database.database import AsyncSessionLocal
+from ..repositories import generation_cache_repository
+from .lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=BaseModel)
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Respostas validadas em memória, compartilhadas por todos os geradores do processo.
+_memory: LRUCache[BaseModel] = LRUCache(GENERATION_CACHE_MEMORY_ENTRIES, ttl_seconds=GENERATION_CACHE_TTL)
+
+
+def _normalize(value: Any) -> Any:
+    """
+    Normaliza a entrada para que variações de espaços gerem a mesma chave. A caixa é
+    mantida: o texto vai ao modelo como está, e "DNA" e "dna" podem gerar respostas diferentes.
+    """
+    if isinstance(value, str):
+        return _WHITESPACE.sub(" ", value).strip()
+    return value
+
+
+class GenerationCache(Generic[M]):
+    """
+    Cache tipado das respostas de um gerador.
+
+    A chave combina o endpoint, a versão do prompt/modelo e o hash da entrada
+    normalizada. A primeira camada guarda o objeto Pydantic já validado em
+    memória (LRU com TTL), então um acerto não chama a IA nem revalida o JSON;
+    a segunda camada persiste o JSON no banco, compartilhado entre workers.
+    """
+
+    def __init__(self, endpoint: str, response_model: Type[M], version: str) -> None:
+        self.endpoint = endpoint
+        self.response_model = response_model
+        self.version = version
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+        self._metric_name = f"generation_{endpoint}"
+
+    def make_key(self, params: Dict[str, Any]) -> str:
+        normalized = json.dumps(
+            {name: _normalize(value) for name, value in params.items()},
+            sort_keys=True, ensure_ascii=False
+        )
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        return f"{self.endpoint}:{self.version}:{digest}"
+
+    async def get_or_generate(self, params: Dict[str, Any], generate: Callable[[], Awaitable[M]]) -> M:
+        cache_key = self.make_key(params)
+
+        cached = _memory.get(cache_key)
+        if cached is not None:
+            self.stats["memory_hits"] += 1
+            metrics.CACHE_REQUESTS.inc(self._metric_name, "memory_hit")
+            return cached
+
+        async with AsyncSessionLocal() as db:
+            with metrics.CACHE_LOOKUP_SECONDS.time(self._metric_name):
+                entry = await generation_cache_repository.get_cached_generation(db, cache_key)
+            if entry is not None:
+                self.stats["db_hits"] += 1
+                metrics.CACHE_REQUESTS.inc(self._metric_name, "db_hit")
+                value = self.response_model.model_validate_json(entry.payload)
+                _memory.set(cache_key, value)
+                return value
+
+        self.stats["misses"] += 1
+        metrics.CACHE_REQUESTS.inc(self._metric_name, "miss")
+        value = await generate()
+        _memory.set(cache_key, value)
+        try:
+            async with AsyncSessionLocal() as db:
+                await generation_cache_repository.save_generation_to_cache(
+                    db, cache_key, self.endpoint, value.model_dump_json(), GENERATION_CACHE_TTL
+                )
+        except Exception as e:
+            # O resultado já foi gerado; uma falha ao persistir não deve derrubar a requisição.
+            logger.warning(f"Falha ao salvar resposta de {self.endpoint} no cache: {e}")
+        return value
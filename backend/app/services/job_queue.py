@@ -0,0 +1,219 @@
+
+import asyncio
+import hashlib
+import logging
+from typing import Awaitable, Callable, Dict, List, Tuple, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import (
+    JOB_WORKERS, JOB_POLL_INTERVAL, JOB_LEASE_SECONDS, JOB_HEARTBEAT_INTERVAL, JOB_MAX_ATTEMPTS
+)
+from ..database.database import AsyncSessionLocal
+from ..database.models import GenerationJob
+from ..repositories import generation_job_repository
+from ..schemas.summary import (
+    SummaryRequest, SummaryResponse, MultiLevelSummaryRequest, MultiLevelSummaryResponse
+)
+from ..schemas.generation import (
+    QuizRequest, FlashcardRequest, StudyPlanRequest, StudyPlanResponse, QuestionRequest
+)
+from . import ai_service, text_processor, document_store
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[AsyncSession, BaseModel], Awaitable[BaseModel]]
+
+
+async def _run_summary(db: AsyncSession, payload: SummaryRequest) -> SummaryResponse:
+    chunks = await document_store.resolve_chunks(
+        db, payload.chunks, payload.document_handle, "Não há conteúdo para gerar um resumo."
+    )
+    # Um resumo incompleto não é salvo no job: ele seria reaproveitado por todos os envios seguintes.
+    summary = await text_processor.generate_summary_with_cache(
+        db=db, chunks=chunks, level=payload.level, allow_partial=False
+    )
+    return SummaryResponse(summary=summary)
+
+async def _run_summaries(db: AsyncSession, payload: MultiLevelSummaryRequest) -> MultiLevelSummaryResponse:
+    chunks = await document_store.resolve_chunks(
+        db, payload.chunks, payload.document_handle, "Não há conteúdo para gerar um resumo."
+    )
+    summaries = await text_processor.generate_summaries_with_cache(
+        db=db, chunks=chunks, levels=payload.levels, allow_partial=False
+    )
+    return MultiLevelSummaryResponse(summaries=summaries)
+
+async def _run_quiz(db: AsyncSession, payload: QuizRequest) -> BaseModel:
+    text = await document_store.resolve_text(db, payload.text, payload.document_handle)
+    return await ai_service.generate_quiz_from_text(text, payload.studentLevel)
+
+async def _run_flashcards(db: AsyncSession, payload: FlashcardRequest) -> BaseModel:
+    text = await document_store.resolve_text(db, payload.text, payload.document_handle)
+    return await ai_service.generate_flashcards_from_text(text, payload.studentLevel)
+
+async def _run_study_plan(db: AsyncSession, payload: StudyPlanRequest) -> StudyPlanResponse:
+    text = await document_store.resolve_text(db, payload.text, payload.document_handle)
+    plan = await ai_service.generate_study_plan_from_text(text, payload.studentLevel, payload.days)
+    return StudyPlanResponse(plan=plan)
+
+async def _run_questions(db: AsyncSession, payload: QuestionRequest) -> BaseModel:
+    text = await document_store.resolve_text(db, payload.text, payload.document_handle)
+    return await ai_service.generate_questions_from_text(text, payload.count, payload.difficulty)
+
+
+# Tipo de job -> (schema da requisição, função que executa o job).
+JOB_HANDLERS: Dict[str, Tuple[Type[BaseModel], JobHandler]] = {
+    "summary": (SummaryRequest, _run_summary),
+    "summaries": (MultiLevelSummaryRequest, _run_summaries),
+    "quiz": (QuizRequest, _run_quiz),
+    "flashcards": (FlashcardRequest, _run_flashcards),
+    "study_plan": (StudyPlanRequest, _run_study_plan),
+    "questions": (QuestionRequest, _run_questions),
+}
+
+# Acorda os workers deste processo quando um job é enviado.
+_job_available = asyncio.Event()
+
+
+def _hash_input(kind: str, payload_json: str) -> str:
+    return hashlib.sha256(f"{kind}\n{payload_json}".encode("utf-8")).hexdigest()
+
+
+async def submit_job(db: AsyncSession, kind: str, payload: BaseModel) -> GenerationJob:
+    """
+    Enfileira um job e retorna imediatamente. Se já existe um job com a mesma
+    entrada que não falhou, ele é reaproveitado.
+    """
+    payload_json = payload.model_dump_json()
+    input_hash = _hash_input(kind, payload_json)
+    existing = await generation_job_repository.find_active_job(db, kind, input_hash)
+    if existing:
+        logger.info(f"Job {existing.id} ({kind}) reaproveitado para entrada idêntica.")
+        return existing
+
+    try:
+        job = await generation_job_repository.create_job(db, kind, input_hash, payload_json)
+    except IntegrityError:
+        # Um envio concorrente idêntico criou o job primeiro (índice único dos jobs ativos).
+        await db.rollback()
+        existing = await generation_job_repository.find_active_job(db, kind, input_hash)
+        if existing is None:
+            raise
+        logger.info(f"Job {existing.id} ({kind}) reaproveitado para envio concorrente idêntico.")
+        return existing
+    logger.info(f"Job {job.id} ({kind}) enfileirado.")
+    _job_available.set()
+    return job
+
+
+async def _requeue(job: GenerationJob) -> None:
+    async with AsyncSessionLocal() as db:
+        await generation_job_repository.requeue_job(db, job.id, job.attempts)
+
+
+async def _fail(db: AsyncSession, job: GenerationJob, error: str) -> None:
+    if not await generation_job_repository.fail_job(db, job.id, job.attempts, error):
+        logger.warning(f"Falha do job {job.id} ({job.kind}) descartada: outro worker retomou o job.")
+
+
+async def _keep_lease(job: GenerationJob) -> None:
+    """Renova a posse do job enquanto ele executa, para que outro worker não o retome."""
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+        try:
+            async with AsyncSessionLocal() as db:
+                renewed = await generation_job_repository.renew_lease(db, job.id, job.attempts, JOB_LEASE_SECONDS)
+        except Exception as e:
+            # Falha passageira do banco: tenta de novo no próximo intervalo, antes de a posse expirar.
+            logger.warning(f"Falha ao renovar a posse do job {job.id}: {e}")
+            continue
+        if not renewed:
+            logger.warning(f"Job {job.id} ({job.kind}) não pertence mais a este worker; posse não renovada.")
+            return
+
+
+async def _execute(job: GenerationJob) -> None:
+    heartbeat = asyncio.create_task(_keep_lease(job))
+    try:
+        await _run_job(job)
+    finally:
+        heartbeat.cancel()
+
+
+async def _run_job(job: GenerationJob) -> None:
+    request_model, handler = JOB_HANDLERS[job.kind]
+    async with AsyncSessionLocal() as db:
+        if job.attempts > JOB_MAX_ATTEMPTS:
+            await _fail(db, job, "O job excedeu o número máximo de tentativas.")
+            return
+        try:
+            payload = request_model.model_validate_json(job.payload)
+            result = await handler(db, payload)
+            # Só a tentativa dona do job grava o resultado: se a posse expirou e outro worker
+            # o retomou, este resultado é descartado.
+            if await generation_job_repository.complete_job(db, job.id, job.attempts, result.model_dump_json()):
+                logger.info(f"Job {job.id} ({job.kind}) concluído.")
+            else:
+                logger.warning(f"Resultado do job {job.id} ({job.kind}) descartado: outro worker retomou o job.")
+        except asyncio.CancelledError:
+            # Shutdown do worker: devolve o job à fila para outro processo (ou o próximo start) retomá-lo.
+            logger.info(f"Job {job.id} ({job.kind}) interrompido; devolvendo à fila.")
+            await asyncio.shield(_requeue(job))
+            raise
+        except HTTPException as e:
+            logger.error(f"Job {job.id} ({job.kind}) falhou: {e.detail}")
+            await db.rollback()
+            await _fail(db, job, str(e.detail))
+        except Exception as e:
+            logger.error(f"Erro inesperado no job {job.id} ({job.kind}): {e}", exc_info=True)
+            await db.rollback()
+            await _fail(db, job, "Ocorreu um erro interno ao executar o job.")
+
+
+async def _worker_loop(worker_id: int) -> None:
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                job = await generation_job_repository.claim_next_job(db, JOB_LEASE_SECONDS)
+            if job is None:
+                # Sem jobs: espera um envio local ou consulta o banco de novo (jobs de outros processos).
+                _job_available.clear()
+                try:
+                    await asyncio.wait_for(_job_available.wait(), timeout=JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            logger.info(f"Worker {worker_id} executando job {job.id} ({job.kind}), tentativa {job.attempts}.")
+            await _execute(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Erro no worker de jobs {worker_id}: {e}", exc_info=True)
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+
+class JobWorkerPool:
+    """Conjunto fixo de workers que consomem a fila persistente de jobs."""
+
+    def __init__(self, size: int = JOB_WORKERS) -> None:
+        self.size = size
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        logger.info(f"Iniciando {self.size} workers de jobs.")
+        self._tasks = [asyncio.create_task(_worker_loop(i)) for i in range(self.size)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+worker_pool = JobWorkerPool()
@@ -0,0 +1,69 @@
+
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, TypeVar
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    """
+    Cache em memória com política LRU e validade opcional (TTL) por entrada.
+
+    O tamanho é limitado pelo número de entradas e, opcionalmente, pela soma
+    de `sizeof(valor)` em bytes. Não é thread-safe; destinado ao uso dentro
+    de um único event loop.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float | None = None,
+        max_bytes: int | None = None,
+        sizeof: Callable[[V], int] | None = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof or (lambda value: 0)
+        self._entries: "OrderedDict[Hashable, tuple[V, float, int]]" = OrderedDict()
+        self.total_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> V | None:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        value, expires_at, _ = item
+        if expires_at and expires_at <= time.monotonic():
+            self.pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        size = self._sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            # Um valor maior que o cache inteiro apenas despejaria todo o resto.
+            self.pop(key)
+            return
+        self.pop(key)
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else 0.0
+        self._entries[key] = (value, expires_at, size)
+        self.total_bytes += size
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self.total_bytes > self.max_bytes
+        ):
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+
+    def pop(self, key: Hashable) -> None:
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self.total_bytes -= item[2]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.total_bytes = 0
@@ -0,0 +1,145 @@
+
+import asyncio
+import logging
+import sys
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import (
+    SUMMARY_MEMORY_CACHE_BYTES, SUMMARY_MEMORY_CACHE_MAX_ENTRIES, SUMMARY_NEGATIVE_CACHE_TTL,
+    SUMMARY_CACHE_INVALIDATION_ENABLED, SUMMARY_CACHE_INVALIDATION_INTERVAL
+)
+from ..core import metrics
+from ..database.database import AsyncSessionLocal
+from ..repositories import summary_cache_repository, cache_invalidation_repository
+from .lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAME = "summary"
+
+# Camada 1: resumos em memória, limitada pelo tamanho dos textos em bytes.
+_memory: LRUCache[str] = LRUCache(
+    SUMMARY_MEMORY_CACHE_MAX_ENTRIES, max_bytes=SUMMARY_MEMORY_CACHE_BYTES, sizeof=sys.getsizeof
+)
+# Chaves consultadas recentemente sem resultado no banco. Só é usado com a invalidação
+# entre workers ligada: sem ela, a falha guardada aqui esconderia por até
+# SUMMARY_NEGATIVE_CACHE_TTL um resumo salvo por outro worker, que seria gerado de novo.
+_negative: LRUCache[bool] = LRUCache(SUMMARY_MEMORY_CACHE_MAX_ENTRIES, ttl_seconds=SUMMARY_NEGATIVE_CACHE_TTL)
+
+_stats = {"memory_hits": 0, "negative_hits": 0, "db_hits": 0, "misses": 0}
+
+
+def _key(document_id: str, level: str) -> str:
+    return f"{document_id}:{level}"
+
+
+async def get_summary(db: AsyncSession, document_id: str, level: str) -> str | None:
+    """
+    Busca um resumo primeiro em memória e depois na tabela SummaryCache.
+    Com a invalidação entre workers ligada, uma falha recente para a mesma chave
+    dispensa a consulta ao banco.
+    """
+    key = _key(document_id, level)
+    summary_text = _memory.get(key)
+    if summary_text is not None:
+        _stats["memory_hits"] += 1
+        metrics.CACHE_REQUESTS.inc(CACHE_NAME, "memory_hit")
+        return summary_text
+    if SUMMARY_CACHE_INVALIDATION_ENABLED and _negative.get(key):
+        _stats["negative_hits"] += 1
+        metrics.CACHE_REQUESTS.inc(CACHE_NAME, "negative_hit")
+        return None
+
+    with metrics.CACHE_LOOKUP_SECONDS.time(CACHE_NAME):
+        cached_summary = await summary_cache_repository.get_cached_summary(
+            db=db, document_id=document_id, student_level=level
+        )
+    if cached_summary:
+        _stats["db_hits"] += 1
+        metrics.CACHE_REQUESTS.inc(CACHE_NAME, "db_hit")
+        _memory.set(key, cached_summary.summary_text)
+        return cached_summary.summary_text
+
+    _stats["misses"] += 1
+    metrics.CACHE_REQUESTS.inc(CACHE_NAME, "miss")
+    if SUMMARY_CACHE_INVALIDATION_ENABLED:
+        _negative.set(key, True)
+    return None
+
+
+async def save_summary(db: AsyncSession, document_id: str, level: str, summary_text: str) -> str:
+    """Grava o resumo no banco e na memória (write-through) e avisa os demais workers."""
+    entry = await summary_cache_repository.save_summary_to_cache(
+        db=db, document_id=document_id, student_level=level, summary_text=summary_text
+    )
+    # Em caso de conflito, o texto salvo primeiro por outro worker prevalece.
+    stored_text = entry.summary_text if entry else summary_text
+    key = _key(document_id, level)
+    _negative.pop(key)
+    _memory.set(key, stored_text)
+    if SUMMARY_CACHE_INVALIDATION_ENABLED:
+        try:
+            await cache_invalidation_repository.publish_invalidation(db, CACHE_NAME, key)
+        except Exception as e:
+            logger.warning(f"Falha ao publicar invalidação de {key}: {e}")
+    return stored_text
+
+
+def invalidate_local(key: str) -> None:
+    _memory.pop(key)
+    _negative.pop(key)
+
+
+def get_summary_cache_stats() -> dict:
+    lookups = sum(_stats.values())
+    db_lookups = _stats["db_hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "memory_hit_ratio": _stats["memory_hits"] / lookups if lookups else 0.0,
+        "db_hit_ratio": _stats["db_hits"] / db_lookups if db_lookups else 0.0,
+        "overall_hit_ratio": (_stats["memory_hits"] + _stats["db_hits"]) / lookups if lookups else 0.0,
+        "memory_entries": len(_memory),
+        "memory_bytes": _memory.total_bytes,
+    }
+
+
+class InvalidationListener:
+    """Consome o feed de invalidação do banco e limpa os caches em memória deste worker."""
+
+    # Entradas do feed mais antigas que isso são apagadas.
+    RETENTION_SECONDS = 3600
+
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if SUMMARY_CACHE_INVALIDATION_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        async with AsyncSessionLocal() as db:
+            last_id = await cache_invalidation_repository.get_last_invalidation_id(db)
+        polls = 0
+        while True:
+            await asyncio.sleep(SUMMARY_CACHE_INVALIDATION_INTERVAL)
+            try:
+                async with AsyncSessionLocal() as db:
+                    for entry_id, cache_name, cache_key in await cache_invalidation_repository.get_invalidations_since(db, last_id):
+                        last_id = entry_id
+                        if cache_name == CACHE_NAME:
+                            invalidate_local(cache_key)
+                    polls += 1
+                    if polls % 100 == 0:
+                        await cache_invalidation_repository.prune_invalidations(db, self.RETENTION_SECONDS)
+            except Exception as e:
+                logger.warning(f"Falha ao consultar o feed de invalidação de cache: {e}")
+
+
+invalidation_listener = InvalidationListener()
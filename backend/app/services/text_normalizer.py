@@ -0,0 +1,230 @@
+# text_normalizer.py
+# Normalização do texto extraído de PDFs antes do fatiamento: remove cabeçalhos e
+# rodapés repetidos, junta palavras hifenizadas na quebra de linha e colapsa espaços
+
+import logging
+import math
+import re
+from collections import Counter
+from typing import List, Set
+
+from ..core import metrics
+from ..core.config import (
+    TEXT_NORMALIZATION_ENABLED, NORMALIZE_SAMPLE_PAGES, NORMALIZE_EDGE_LINES,
+    NORMALIZE_REPEAT_FRACTION, NORMALIZE_MIN_REPEATS, CHUNK_CHARS_PER_TOKEN
+)
+
+logger = logging.getLogger(__name__)
+
+# Versão das regras de normalização. Altere ao mudá-las para invalidar o cache de extração.
+NORMALIZER_VERSION = "norm-v2"
+
+# Separador entre páginas no texto normalizado: uma quebra de parágrafo.
+PAGE_SEPARATOR = "\n\n"
+
+_SPACES = re.compile(r"[ \t\f\v\u00a0]+")
+_DIGITS = re.compile(r"\d+")
+# Hífen no fim da linha depois de uma letra; o grupo captura a palavra que continua na linha seguinte.
+_HYPHEN_BREAK = re.compile(r"(?<=[^\W\d_])-\n(?=([^\W\d_]+))")
+# Palavras inteiras (não seguidas de hífen na quebra de linha ou de página), para o vocabulário do documento.
+_WORD = re.compile(r"\b[^\W\d_]+\b(?!-(?:\n|$))")
+# Palavras compostas escritas com hífen no meio da linha ("guarda-chuva", "pode-se").
+_COMPOUND = re.compile(r"\b[^\W\d_]+(?:-[^\W\d_]+)+\b")
+# Pronomes oblíquos, tratados como palavras conhecidas: "pode-\nse" é um composto se "pode" é.
+_CLITICS = {"a", "as", "o", "os", "la", "las", "lo", "los", "na", "nas", "no", "nos",
+            "me", "te", "se", "lhe", "lhes", "vos"}
+# Prefixos sempre seguidos de hífen, que não são sílabas comuns de outras palavras.
+_HYPHEN_PREFIXES = {"além", "aquém", "bem", "recém", "vice"}
+
+
+def normalization_signature() -> str:
+    """Identifica as regras de normalização e seus parâmetros; faz parte da chave do cache de extração."""
+    if not TEXT_NORMALIZATION_ENABLED:
+        return "raw"
+    return (
+        f"{NORMALIZER_VERSION}:{NORMALIZE_SAMPLE_PAGES}:{NORMALIZE_EDGE_LINES}:"
+        f"{NORMALIZE_REPEAT_FRACTION}:{NORMALIZE_MIN_REPEATS}"
+    )
+
+
+def _estimate_tokens(chars: int) -> int:
+    # Mesma estimativa de chunker.estimate_tokens, a partir do número de caracteres.
+    return int(chars / CHUNK_CHARS_PER_TOKEN + 0.5)
+
+
+def _line_signature(line: str) -> str:
+    # Números variam entre páginas ("Página 3 de 40", "Capítulo 2"): são ignorados na comparação.
+    return _DIGITS.sub("#", line.lower())
+
+
+class PageNormalizer:
+    """
+    Normaliza o texto de um PDF página a página.
+
+    `feed` recebe o texto de cada página, em ordem, e retorna o trecho normalizado
+    que já pode ser fatiado; `finish` retorna o restante. A concatenação dos trechos
+    é o texto normalizado, idêntico para a extração completa e para o streaming.
+
+    Os cabeçalhos e rodapés são detectados nas primeiras NORMALIZE_SAMPLE_PAGES
+    páginas (que ficam retidas até a detecção): linhas do topo ou da base que se
+    repetem, ignorando números, em boa parte das páginas. A última linha de cada
+    página também fica retida até a próxima, para juntar palavras hifenizadas
+    na virada de página. As palavras já vistas no documento decidem se o hífen
+    da quebra de linha é removido ou faz parte de uma palavra composta.
+
+    `page_offsets` guarda o offset de início de cada página no texto normalizado.
+    """
+
+    def __init__(self, enabled: bool = TEXT_NORMALIZATION_ENABLED) -> None:
+        self.enabled = enabled
+        self.page_offsets: List[int] = []
+        self.raw_chars = 0
+        self.removed_lines = 0
+        self.joined_words = 0
+        self._emitted = 0
+        self._pending: str | None = None
+        self._sample: List[str] | None = [] if enabled else None
+        self._repeated: Set[str] = set()
+        self._vocabulary: Set[str] = set()
+        self._compounds: Set[str] = set()
+
+    def feed(self, page_text: str) -> str:
+        """Acrescenta o texto de uma página e retorna o trecho normalizado que ficou pronto."""
+        self.raw_chars += len(page_text)
+        if not self.enabled:
+            self.page_offsets.append(self._emitted)
+            self._emitted += len(page_text)
+            return page_text
+        if self._sample is not None:
+            self._sample.append(page_text)
+            if len(self._sample) < NORMALIZE_SAMPLE_PAGES:
+                return ""
+            return self._flush_sample()
+        return self._add_page(page_text)
+
+    def finish(self) -> str:
+        """Sinaliza o fim do documento, retorna o trecho restante e registra a economia obtida."""
+        ready = self._flush_sample() if self._sample is not None else ""
+        if self._pending is not None:
+            ready += self._pending
+            self._emitted += len(self._pending)
+            self._pending = None
+        self._report()
+        return ready
+
+    def _flush_sample(self) -> str:
+        sample, self._sample = self._sample, None
+        self._repeated = self._detect_repeated(sample)
+        return "".join(self._add_page(page_text) for page_text in sample)
+
+    def _detect_repeated(self, pages: List[str]) -> Set[str]:
+        counts: Counter = Counter()
+        for page_text in pages:
+            lines = [line for line in self._clean_lines(page_text) if line]
+            edges = lines[:NORMALIZE_EDGE_LINES] + lines[-NORMALIZE_EDGE_LINES:]
+            counts.update({_line_signature(line) for line in edges})
+        threshold = max(NORMALIZE_MIN_REPEATS, math.ceil(NORMALIZE_REPEAT_FRACTION * len(pages)))
+        return {signature for signature, count in counts.items() if count >= threshold}
+
+    @staticmethod
+    def _clean_lines(page_text: str) -> List[str]:
+        return [_SPACES.sub(" ", line).strip() for line in page_text.splitlines()]
+
+    def _normalize_page(self, page_text: str) -> str:
+        lines = self._clean_lines(page_text)
+        if self._repeated:
+            content = [i for i, line in enumerate(lines) if line]
+            edges = set(content[:NORMALIZE_EDGE_LINES] + content[-NORMALIZE_EDGE_LINES:])
+            for i in edges:
+                if _line_signature(lines[i]) in self._repeated:
+                    lines[i] = ""
+                    self.removed_lines += 1
+        # Sem linhas em branco nas pontas da página nem consecutivas no meio.
+        kept: List[str] = []
+        for line in lines:
+            if line or (kept and kept[-1]):
+                kept.append(line)
+        while kept and not kept[-1]:
+            kept.pop()
+        text = "\n".join(kept)
+        self._vocabulary.update(word.lower() for word in _WORD.findall(text))
+        self._compounds.update(compound.lower() for compound in _COMPOUND.findall(text))
+        return _HYPHEN_BREAK.sub(self._join_hyphenated, text)
+
+    def _join_hyphenated(self, match: re.Match) -> str:
+        """
+        Desfaz a quebra de linha em uma palavra hifenizada, com base nas palavras
+        já vistas no documento. O hífen é removido se a palavra unida é conhecida,
+        ou se a continuação é minúscula e as partes não formam um composto
+        conhecido: "alu-\nno" vira "aluno" e "pesso-\na", "pessoa". É mantido
+        nos compostos: já escritos com hífen no documento, com um prefixo de
+        _HYPHEN_PREFIXES ou formados por duas palavras inteiras ("guarda-\nchuva",
+        "pode-\nse"). Com a continuação maiúscula e nada conhecido, o trecho fica como está.
+        """
+        string, start = match.string, match.start()
+        while start > 0 and string[start - 1].isalpha():
+            start -= 1
+        head, tail = string[start:match.start()].lower(), match.group(1).lower()
+        if head + tail in self._vocabulary:
+            self.joined_words += 1
+            return ""
+        if not match.group(1)[0].islower():
+            return match.group(0)
+        if (
+            f"{head}-{tail}" in self._compounds
+            or head in _HYPHEN_PREFIXES
+            or (head in self._vocabulary and (tail in self._vocabulary or tail in _CLITICS))
+        ):
+            return "-"
+        self.joined_words += 1
+        return ""
+
+    def _add_page(self, page_text: str) -> str:
+        text = self._normalize_page(page_text)
+        if not text:
+            self.page_offsets.append(self._emitted + len(self._pending or ""))
+            return ""
+        if self._pending is None:
+            self.page_offsets.append(self._emitted)
+            combined = text
+        else:
+            # Palavra hifenizada na virada de página: junta a última linha retida com a nova página.
+            match = _HYPHEN_BREAK.match(self._pending + "\n" + text, len(self._pending) - 1)
+            joint = self._join_hyphenated(match) if match else None
+            if joint is not None and joint != match.group(0):
+                self.page_offsets.append(self._emitted + len(self._pending) - 1 + len(joint))
+                combined = self._pending[:-1] + joint + text
+            else:
+                self.page_offsets.append(self._emitted + len(self._pending) + len(PAGE_SEPARATOR))
+                combined = self._pending + PAGE_SEPARATOR + text
+        # Retém a última linha até a próxima página.
+        cut = combined.rfind("\n") + 1
+        self._pending = combined[cut:]
+        self._emitted += cut
+        return combined[:cut]
+
+    def stats(self) -> dict:
+        """Tamanho do texto antes e depois da normalização, em caracteres e tokens estimados."""
+        raw_tokens = _estimate_tokens(self.raw_chars)
+        normalized_tokens = _estimate_tokens(self._emitted)
+        return {
+            "pages": len(self.page_offsets),
+            "raw_chars": self.raw_chars,
+            "normalized_chars": self._emitted,
+            "raw_tokens": raw_tokens,
+            "normalized_tokens": normalized_tokens,
+            "saved_fraction": 1 - normalized_tokens / raw_tokens if raw_tokens else 0.0,
+            "removed_lines": self.removed_lines,
+            "joined_words": self.joined_words,
+        }
+
+    def _report(self) -> None:
+        stats = self.stats()
+        metrics.TEXT_NORMALIZATION_TOKENS.inc("raw", amount=stats["raw_tokens"])
+        metrics.TEXT_NORMALIZATION_TOKENS.inc("normalized", amount=stats["normalized_tokens"])
+        if self.enabled:
+            logger.info(
+                f"Texto normalizado: {stats['raw_tokens']} -> {stats['normalized_tokens']} tokens estimados "
+                f"({stats['saved_fraction']:.1%} a menos); {self.removed_lines} linhas de cabeçalho/rodapé "
+                f"removidas e {self.joined_words} palavras hifenizadas unidas em {stats['pages']} páginas."
+            )
@@ -2,101 +2,518 @@
 import pdfplumber
 import logging
 import asyncio
-import hashlib
+import json
+import os
 import time
-from typing import List, IO
+import uuid
+from typing import AsyncIterator, Awaitable, Callable, Dict, IO, Iterable, List, Tuple, TypeVar, Union
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 
-from ..core.config import CHUNK_SIZE, CHUNK_OVERLAP
-from .ai_service import call_google_ai_for_summary
-from ..repositories import summary_cache_repository
+from ..core import metrics
+from ..core.config import (
+    SUMMARY_MAX_CONCURRENCY, REDUCE_MAX_INPUT_CHARS, PIPELINE_CHUNK_BUFFER,
+    MAP_BATCH_ENABLED, MAP_BATCH_TOKEN_BUDGET, MAP_BATCH_MAX_CHUNKS, MAP_MAX_FAILED_FRACTION,
+    SUMMARY_DB_LOCK_ENABLED, SUMMARY_LOCK_TTL, SUMMARY_LOCK_POLL_INTERVAL
+)
+from ..core.hashing import hash_chunks, hash_text, new_document_hasher
+from .ai_service import (
+    call_google_ai_for_summary, call_google_ai_for_summary_batch, stream_google_ai_for_summary, validate_json
+)
+from ..schemas.summary import MapBatchResponse
+from . import chunker, pdf_extractor, summary_cache, text_normalizer
+from .single_flight import SingleFlight
+from ..database.database import AsyncSessionLocal
+from ..repositories import (
+    summary_cache_repository, generation_lock_repository, chunk_summary_cache_repository
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-MAX_CHUNKS_FOR_SUMMARY = 10
+# Versão dos prompts de _summarize_chunk e _summarize_batch. Altere ao mudar um deles para invalidar o cache por chunk.
+MAP_PROMPT_VERSION = "map-v1"
+
+# Gerações de resumo em andamento neste processo, por (document_id, level).
+_summary_flight = SingleFlight()
+# Fases MAP (e níveis intermediários do REDUCE) em andamento, por document_id.
+# Não dependem do nível: gerações concorrentes de níveis diferentes compartilham uma só.
+_partials_flight = SingleFlight()
+# Quem acompanha o progresso de cada fase MAP compartilhada, por document_id.
+_map_progress: Dict[str, "_MapProgress"] = {}
+# Identifica este worker como dono dos locks de geração no banco.
+_LOCK_OWNER = f"{os.getpid()}-{uuid.uuid4().hex}"
+
+# Separador entre resumos parciais nos prompts de REDUCE.
+SUMMARY_SEPARATOR = "\n\n---\n\n"
+
+T = TypeVar("T")
 
 def extract_text_from_pdf(pdf_file_stream: IO[bytes]) -> str:
     try:
         with pdfplumber.open(pdf_file_stream) as pdf:
-            full_text = "".join(page.extract_text() or "" for page in pdf.pages)
+            pages = [page.extract_text() or "" for page in pdf.pages]
+        full_text, _ = normalize_pages(pages)
         logger.info(f"Texto extraído com sucesso. Total de {len(full_text)} caracteres.")
         return full_text
     except Exception as e:
         logger.error(f"Erro ao extrair texto do PDF: {e}")
         raise ValueError("Não foi possível processar o arquivo PDF.")
 
+def normalize_pages(pages: List[str]) -> Tuple[str, List[int]]:
+    """Texto normalizado das páginas e o offset de início de cada página nele."""
+    normalizer = text_normalizer.PageNormalizer()
+    full_text = "".join([normalizer.feed(page_text) for page_text in pages] + [normalizer.finish()])
+    return full_text, normalizer.page_offsets
+
+async def extract_document_async(pdf_source: pdf_extractor.PdfSource) -> Tuple[str, List[int]]:
+    """
+    Extrai as páginas em um pool de processos e normaliza o texto.
+    Retorna o texto e o offset de início de cada página nele.
+    """
+    pages = await pdf_extractor.extract_pages(pdf_source)
+    full_text, page_offsets = normalize_pages(pages)
+    logger.info(f"Texto extraído com sucesso. Total de {len(full_text)} caracteres em {len(pages)} páginas.")
+    return full_text, page_offsets
+
+async def extract_text_from_pdf_async(pdf_source: pdf_extractor.PdfSource) -> str:
+    """Versão assíncrona de extract_text_from_pdf que extrai as páginas em um pool de processos."""
+    full_text, _ = await extract_document_async(pdf_source)
+    return full_text
+
+def chunk_offsets(text: str) -> List[Tuple[int, int]]:
+    """Calcula os intervalos [início, fim) de cada chunk, sem copiar o texto."""
+    with metrics.CHUNKING_SECONDS.time(chunker.CHUNKER):
+        return chunker.chunk_offsets(text)
+
+def chunks_from_offsets(text: str, offsets: List[Tuple[int, int]]) -> List[str]:
+    return [text[start:end] for start, end in offsets]
+
 def chunk_text(text: str) -> List[str]:
     if not text:
         return []
-    final_chunks = []
-    start_index = 0
-    while start_index < len(text):
-        end_index = start_index + CHUNK_SIZE
-        chunk = text[start_index:end_index]
-        final_chunks.append(chunk)
-        start_index += CHUNK_SIZE - CHUNK_OVERLAP
+    final_chunks = chunks_from_offsets(text, chunk_offsets(text))
     logger.info(f"Texto fatiado em {len(final_chunks)} chunks.")
     return final_chunks
 
+def create_extraction_key(pdf_sha256: str) -> str:
+    """Chave do cache de extração: hash do PDF mais a normalização, o chunker e seus parâmetros."""
+    return f"{pdf_sha256}:{text_normalizer.normalization_signature()}:{chunker.chunking_signature()}"
+
 async def _summarize_chunk(chunk: str) -> str:
     prompt = f"Resuma o seguinte fragmento de texto de forma concisa em português do Brasil, extraindo os pontos mais importantes:\n---\n{chunk}"
-    return await call_google_ai_for_summary(prompt)
-
-async def summarize_text_map_reduce(chunks: List[str], level: str) -> str:
-    logger.info(f"Iniciando sumarização MapReduce para {len(chunks)} chunks.")
-    
-    if len(chunks) > MAX_CHUNKS_FOR_SUMMARY:
-        logger.warning(f"Número de chunks ({len(chunks)}) excede o limite de {MAX_CHUNKS_FOR_SUMMARY}. Apenas os primeiros {MAX_CHUNKS_FOR_SUMMARY} serão usados.")
-    
-    limited_chunks = chunks[:MAX_CHUNKS_FOR_SUMMARY]
-    
-    map_start_time = time.time()
-    logger.info("Iniciando fase MAP...")
-    tasks = [_summarize_chunk(chunk) for chunk in limited_chunks]
-    chunk_summaries = await asyncio.gather(*tasks)
-    map_duration = time.time() - map_start_time
-    logger.info(f"Fase MAP concluída em {map_duration:.2f} segundos.")
+    return await call_google_ai_for_summary(prompt, phase="map")
+
+async def _summarize_batch(chunks: List[str]) -> List[str]:
+    """
+    Resume vários chunks em uma única chamada, com resposta em JSON. Os chunks sem
+    resumo válido na resposta (ou todos, se ela não puder ser lida) são resumidos
+    individualmente com _summarize_chunk.
+    """
+    fragments = json.dumps([{"id": i, "texto": chunk} for i, chunk in enumerate(chunks)], ensure_ascii=False)
+    prompt = f"Resuma cada um dos fragmentos de texto abaixo, separadamente, de forma concisa em português do Brasil, extraindo os pontos mais importantes. Não misture o conteúdo de fragmentos diferentes. Responda em JSON no formato {{\"resumos\": [{{\"id\": <id do fragmento>, \"resumo\": \"<resumo>\"}}]}}, com um item para cada fragmento.\nFragmentos:\n{fragments}"
+    summaries: List[str | None] = [None] * len(chunks)
+    try:
+        response = validate_json(MapBatchResponse, await call_google_ai_for_summary_batch(prompt), "summary_batch")
+        for item in response.resumos:
+            if 0 <= item.id < len(chunks) and item.resumo.strip():
+                summaries[item.id] = item.resumo
+    except ValidationError as e:
+        logger.warning(f"Resposta da fase MAP em lote inválida: {e}")
+
+    missing = [i for i, summary in enumerate(summaries) if summary is None]
+    if missing:
+        logger.warning(f"Fase MAP em lote: {len(missing)} de {len(chunks)} resumos ausentes; resumindo individualmente.")
+        fallback = await asyncio.gather(*(_summarize_chunk(chunks[i]) for i in missing))
+        for i, summary in zip(missing, fallback):
+            summaries[i] = summary
+    return summaries
+
+def _pack_chunks(items: List[Tuple[str, str]]) -> List[List[Tuple[str, str]]]:
+    """
+    Agrupa pares (hash, chunk) consecutivos em lotes para a fase MAP, com até
+    MAP_BATCH_TOKEN_BUDGET tokens estimados e MAP_BATCH_MAX_CHUNKS chunks cada.
+    Sem MAP_BATCH_ENABLED, cada chunk forma um lote.
+    """
+    if not MAP_BATCH_ENABLED:
+        return [[item] for item in items]
+    packs: List[List[Tuple[str, str]]] = []
+    current: List[Tuple[str, str]] = []
+    current_tokens = 0
+    for item in items:
+        tokens = chunker.estimate_tokens(item[1])
+        if current and (current_tokens + tokens > MAP_BATCH_TOKEN_BUDGET or len(current) >= MAP_BATCH_MAX_CHUNKS):
+            packs.append(current)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+async def _summarize_pack(pack: List[Tuple[str, str]]) -> List[str]:
+    chunks = [chunk for _, chunk in pack]
+    if len(chunks) == 1:
+        return [await _summarize_chunk(chunks[0])]
+    return await _summarize_batch(chunks)
+
+async def _map_chunks(
+    chunks: List[str],
+    db: AsyncSession | None = None,
+    on_progress: Callable[[int, int], None] | None = None
+) -> List[str | None]:
+    """
+    Fase MAP: resume cada chunk, reaproveitando o cache de resumos por chunk.
+
+    Apenas chunks nunca vistos (para a versão atual do prompt) chamam a IA, e
+    chunks repetidos dentro do documento são resumidos uma única vez. Os chunks
+    pendentes são enviados em lotes (ver _pack_chunks), e os resumos de cada lote
+    são salvos no cache assim que ele termina.
+    `on_progress(concluídos, total)` é chamado a cada lote concluído.
+
+    Um lote que falha não interrompe os demais: seus chunks ficam como None,
+    desde que as perdas não passem de MAP_MAX_FAILED_FRACTION (ver _check_map_losses).
+    """
+    chunk_hashes = [hash_text(chunk) for chunk in chunks]
+    summaries = {}
+    if db is not None:
+        summaries = await _lookup_chunk_summaries(db, chunk_hashes)
+
+    pending = {}
+    for chunk_hash, chunk in zip(chunk_hashes, chunks):
+        if chunk_hash not in summaries:
+            pending.setdefault(chunk_hash, chunk)
+    logger.info(f"Fase MAP: {len(chunks) - len(pending)} chunks em cache, {len(pending)} a resumir.")
+
+    total = len(summaries) + len(pending)
+    completed = len(summaries)
+    if on_progress:
+        on_progress(completed, total)
+
+    # A sessão não admite operações concorrentes: os lotes salvam um de cada vez.
+    save_lock = asyncio.Lock()
+
+    async def summarize_and_report(pack: List[Tuple[str, str]]) -> None:
+        nonlocal completed
+        generated = dict(zip((chunk_hash for chunk_hash, _ in pack), await _summarize_pack(pack)))
+        summaries.update(generated)
+        if db is not None:
+            await _save_chunk_summaries(db, save_lock, generated)
+        completed += len(pack)
+        if on_progress:
+            on_progress(completed, total)
 
-    combined_summaries = "\n\n---\n\n".join(chunk_summaries)
+    if pending:
+        packs = _pack_chunks(list(pending.items()))
+        if len(packs) < len(pending):
+            logger.info(f"Fase MAP: {len(pending)} chunks agrupados em {len(packs)} chamadas.")
+        results = await _gather_bounded((summarize_and_report(pack) for pack in packs), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            failed = sum(1 for chunk_hash in chunk_hashes if chunk_hash not in summaries)
+            _check_map_losses(failed, len(chunk_hashes), errors)
 
+    return [summaries.get(chunk_hash) for chunk_hash in chunk_hashes]
+
+async def _save_chunk_summaries(db: AsyncSession, lock: asyncio.Lock, generated: Dict[str, str]) -> None:
+    """Salva os resumos de um lote no cache por chunk. Uma falha no banco não descarta os resumos."""
+    async with lock:
+        try:
+            await chunk_summary_cache_repository.save_chunk_summaries(db, generated, MAP_PROMPT_VERSION)
+        except Exception as e:
+            logger.warning(f"Falha ao salvar {len(generated)} resumos de chunk no cache: {e}")
+            await db.rollback()
+
+def _check_map_losses(failed: int, total: int, errors: List[BaseException]) -> None:
+    """
+    Decide se a fase MAP pode seguir sem os chunks que falharam. Levanta o
+    primeiro erro se eles passam de MAP_MAX_FAILED_FRACTION do documento (ou são todos).
+    """
+    for error in errors:
+        logger.warning(f"Fase MAP: lote falhou: {getattr(error, 'detail', error)!r}")
+    if not failed:
+        return
+    if failed == total or failed > MAP_MAX_FAILED_FRACTION * total:
+        logger.error(f"Fase MAP: {failed} de {total} chunks sem resumo, acima do limite de perdas. Abortando.")
+        raise errors[0]
+    logger.warning(f"Fase MAP: {failed} de {total} chunks sem resumo; o resumo seguirá sem eles.")
+
+def _drop_missing(chunk_summaries: List[str | None]) -> Tuple[List[str], int]:
+    """Separa os resumos disponíveis do número de chunks que ficaram sem resumo."""
+    available = [summary for summary in chunk_summaries if summary is not None]
+    return available, len(chunk_summaries) - len(available)
+
+async def _lookup_chunk_summaries(db: AsyncSession, chunk_hashes: List[str]) -> Dict[str, str]:
+    """Consulta o cache de resumos por chunk, registrando acertos e faltas nas métricas."""
+    unique = len(set(chunk_hashes))
+    if not unique:
+        return {}
+    with metrics.CACHE_LOOKUP_SECONDS.time("chunk_summary"):
+        cached = await chunk_summary_cache_repository.get_cached_chunk_summaries(
+            db, chunk_hashes, MAP_PROMPT_VERSION
+        )
+    metrics.CACHE_REQUESTS.inc("chunk_summary", "hit", amount=len(cached))
+    metrics.CACHE_REQUESTS.inc("chunk_summary", "miss", amount=unique - len(cached))
+    return cached
+
+async def _gather_bounded(
+    coros: Iterable[Awaitable[T]], limit: int = SUMMARY_MAX_CONCURRENCY, return_exceptions: bool = False
+) -> List[T]:
+    """asyncio.gather com no máximo `limit` corrotinas em execução, preservando a ordem."""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coro: Awaitable[T]) -> T:
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(coro) for coro in coros), return_exceptions=return_exceptions)
+
+def _group_for_reduce(summaries: List[str], max_chars: int) -> List[List[str]]:
+    """
+    Agrupa resumos consecutivos em lotes de até `max_chars` caracteres.
+    Cada lote tem pelo menos dois resumos, garantindo que cada nível da árvore
+    reduza o número de resumos pela metade ou mais.
+    """
+    groups: List[List[str]] = []
+    current: List[str] = []
+    current_chars = 0
+    for summary in summaries:
+        extra = len(summary) + len(SUMMARY_SEPARATOR)
+        if len(current) >= 2 and current_chars + extra > max_chars:
+            groups.append(current)
+            current, current_chars = [], 0
+        current.append(summary)
+        current_chars += extra
+    if current:
+        if len(current) == 1 and groups:
+            groups[-1].append(current[0])
+        else:
+            groups.append(current)
+    return groups
+
+async def _reduce_group(summaries: List[str]) -> str:
+    combined_summaries = SUMMARY_SEPARATOR.join(summaries)
+    prompt = f"Combine os seguintes resumos parciais em um único resumo intermediário, conciso e fiel ao conteúdo, em português do Brasil, preservando todos os pontos importantes.\n\nResumos:\n---\n{combined_summaries}"
+    return await call_google_ai_for_summary(prompt, phase="reduce")
+
+async def _reduce_tree(summaries: List[str]) -> List[str]:
+    """
+    Reduz os resumos parciais em níveis até que todos caibam em uma única chamada REDUCE.
+    Os grupos de cada nível são reduzidos em paralelo, então o tempo total cresce
+    com a profundidade da árvore (logarítmica no número de chunks).
+    """
+    depth = 0
+    while len(summaries) > 1 and len(SUMMARY_SEPARATOR.join(summaries)) > REDUCE_MAX_INPUT_CHARS:
+        depth += 1
+        groups = _group_for_reduce(summaries, REDUCE_MAX_INPUT_CHARS)
+        level_start_time = time.time()
+        summaries = await _gather_bounded(_reduce_group(group) for group in groups)
+        logger.info(f"REDUCE intermediário nível {depth}: {len(groups)} grupos em {time.time() - level_start_time:.2f} segundos.")
+    return summaries
+
+def _build_final_reduce_prompt(partial_summaries: List[str], level: str) -> str:
+    combined_summaries = SUMMARY_SEPARATOR.join(partial_summaries)
+    return f"Combine os seguintes resumos parciais em um único resumo final, coeso e bem-estruturado em português do Brasil. Adapte a linguagem para um estudante de nível '{level}'. Organize com cabeçalhos e listas em markdown.\n\nResumos:\n---\n{combined_summaries}"
+
+async def _reduce_to_final(chunk_summaries: List[str], level: str) -> str:
     reduce_start_time = time.time()
     logger.info("Iniciando fase REDUCE...")
-    reduce_prompt = f"Combine os seguintes resumos parciais em um único resumo final, coeso e bem-estruturado em português do Brasil. Adapte a linguagem para um estudante de nível '{level}'. Organize com cabeçalhos e listas em markdown.\n\nResumos:\n---\n{combined_summaries}"
-    final_summary = await call_google_ai_for_summary(reduce_prompt)
+    partial_summaries = await _reduce_tree(chunk_summaries)
+    reduce_prompt = _build_final_reduce_prompt(partial_summaries, level)
+    final_summary = await call_google_ai_for_summary(reduce_prompt, phase="final")
     reduce_duration = time.time() - reduce_start_time
     logger.info(f"Fase REDUCE concluída em {reduce_duration:.2f} segundos.")
-    
-    logger.info("Sumarização MapReduce concluída com sucesso.")
     return final_summary
 
-def _create_document_id(chunks: List[str]) -> str:
-    full_text = "".join(chunks)
-    return hashlib.sha256(full_text.encode('utf-8')).hexdigest()
+async def _partial_summaries(
+    chunks: List[str],
+    db: AsyncSession | None = None,
+    on_progress: Callable[[int, int], None] | None = None
+) -> Tuple[List[str], int]:
+    """
+    Fase MAP e níveis intermediários do REDUCE: tudo o que não depende do nível do aluno.
+    Retorna (resumos parciais, número de chunks que ficaram sem resumo).
+    """
+    map_start_time = time.time()
+    chunk_summaries, missing = _drop_missing(await _map_chunks(chunks, db, on_progress))
+    logger.info(f"Fase MAP concluída em {time.time() - map_start_time:.2f} segundos.")
+    return await _reduce_tree(chunk_summaries), missing
 
-async def generate_summary_with_cache(db: AsyncSession, chunks: List[str], level: str) -> str:
-    document_id = _create_document_id(chunks)
-    logger.info(f"Verificando cache para document_id: {document_id}, level: {level}")
+class _MapProgress:
+    """Repassa o progresso de uma fase MAP compartilhada a todas as requisições que a aguardam."""
+
+    def __init__(self) -> None:
+        self.listeners: List[Callable[[int, int], None]] = []
+        self.last: Tuple[int, int] | None = None
 
-    cached_summary = await summary_cache_repository.get_cached_summary(
-        db=db, document_id=document_id, student_level=level
-    )
+    def report(self, completed: int, total: int) -> None:
+        self.last = (completed, total)
+        for listener in list(self.listeners):
+            listener(completed, total)
 
-    if cached_summary:
-        logger.info(f"Cache HIT para document_id: {document_id}")
-        return cached_summary.summary_text
+async def _shared_partial_summaries(
+    document_id: str, chunks: List[str], on_progress: Callable[[int, int], None] | None = None
+) -> Tuple[List[str], int]:
+    """
+    _partial_summaries compartilhada entre as gerações concorrentes do mesmo documento.
+    `on_progress` recebe o progresso da fase MAP, inclusive se ela foi iniciada por outra requisição.
+    """
+    progress = _map_progress.setdefault(document_id, _MapProgress())
+    if on_progress is not None:
+        progress.listeners.append(on_progress)
+        if progress.last is not None:
+            on_progress(*progress.last)
 
-    logger.info(f"Cache MISS para document_id: {document_id}. Gerando novo resumo.")
+    async def run() -> Tuple[List[str], int]:
+        try:
+            async with AsyncSessionLocal() as db:
+                return await _partial_summaries(chunks, db, progress.report)
+        finally:
+            if _map_progress.get(document_id) is progress:
+                del _map_progress[document_id]
     try:
-        final_summary = await summarize_text_map_reduce(chunks=chunks, level=level)
+        return await _partials_flight.do(document_id, run)
+    finally:
+        if on_progress is not None:
+            progress.listeners.remove(on_progress)
 
-        await summary_cache_repository.save_summary_to_cache(
-            db=db, document_id=document_id, student_level=level, summary_text=final_summary
+async def summarize_levels(chunks: List[str], levels: List[str], db: AsyncSession | None = None) -> Dict[str, str]:
+    """
+    Resume o mesmo documento para vários níveis de aluno. A fase MAP e os níveis
+    intermediários do REDUCE não dependem do nível e rodam uma única vez; só o
+    REDUCE final é feito por nível, em paralelo. Não consulta nem grava o cache
+    de resumos (o chamador decide como persistir), por isso falha se algum chunk
+    ficou sem resumo em vez de devolver um resumo incompleto.
+    """
+    logger.info(f"Iniciando sumarização MapReduce para {len(chunks)} chunks e {len(levels)} níveis.")
+    partial_summaries, missing = await _partial_summaries(chunks, db)
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"{missing} trechos do documento não puderam ser resumidos. Tente novamente."
         )
-        logger.info(f"Novo resumo salvo no cache para document_id: {document_id}")
+    final_summaries = await asyncio.gather(*(
+        call_google_ai_for_summary(_build_final_reduce_prompt(partial_summaries, level), phase="final")
+        for level in levels
+    ))
+    return dict(zip(levels, final_summaries))
 
-        return final_summary
+def _create_document_id(chunks: List[str]) -> str:
+    # Hash incremental: o resultado é igual ao de "".join(chunks), sem copiar o documento.
+    return hash_chunks(chunks)
+
+async def _wait_for_cached_summary(db: AsyncSession, document_id: str, level: str) -> str | None:
+    """Aguarda outro worker publicar o resumo no cache, até a validade do lock."""
+    deadline = time.monotonic() + SUMMARY_LOCK_TTL
+    while time.monotonic() < deadline:
+        await asyncio.sleep(SUMMARY_LOCK_POLL_INTERVAL)
+        # Encerra a transação de leitura para enxergar commits de outros workers.
+        await db.rollback()
+        cached_summary = await summary_cache_repository.get_cached_summary(
+            db=db, document_id=document_id, student_level=level
+        )
+        if cached_summary:
+            return cached_summary.summary_text
+    return None
+
+async def _generate_and_cache_summary(document_id: str, chunks: List[str], level: str) -> Tuple[str, int]:
+    """
+    Gera o resumo e o salva no cache. Executado uma única vez por (document_id, level)
+    neste processo, com sessão própria para não depender da requisição que o iniciou.
+    Retorna (resumo, número de chunks que ficaram sem resumo); o incompleto não é salvo.
+    """
+    async with AsyncSessionLocal() as db:
+        lock_key = f"summary:{document_id}:{level}"
+        lock_acquired = False
+        if SUMMARY_DB_LOCK_ENABLED:
+            lock_acquired = await generation_lock_repository.try_acquire_lock(
+                db, lock_key, _LOCK_OWNER, SUMMARY_LOCK_TTL
+            )
+            if not lock_acquired:
+                logger.info(f"Outro worker está gerando o resumo de {document_id}. Aguardando o cache.")
+                cached_text = await _wait_for_cached_summary(db, document_id, level)
+                if cached_text is not None:
+                    return cached_text, 0
+                logger.warning(f"Lock de {document_id} expirou sem resultado. Gerando localmente.")
+            else:
+                # Outro worker pode ter concluído a geração logo antes de liberarmos o lock.
+                cached_summary = await summary_cache_repository.get_cached_summary(
+                    db=db, document_id=document_id, student_level=level
+                )
+                if cached_summary:
+                    await _release_summary_lock(db, lock_key)
+                    return cached_summary.summary_text, 0
+
+        try:
+            partial_summaries, missing = await _shared_partial_summaries(document_id, chunks)
+            final_summary = await call_google_ai_for_summary(
+                _build_final_reduce_prompt(partial_summaries, level), phase="final"
+            )
+            if missing:
+                # Resumo incompleto: entregue, mas não salvo, para que a próxima requisição o complete.
+                logger.warning(f"Resumo de {document_id} gerado sem {missing} chunks; não será salvo no cache.")
+                return final_summary, missing
+            final_summary = await summary_cache.save_summary(db, document_id, level, final_summary)
+            logger.info(f"Novo resumo salvo no cache para document_id: {document_id}")
+            return final_summary, 0
+        finally:
+            if lock_acquired:
+                await _release_summary_lock(db, lock_key)
+
+async def _release_summary_lock(db: AsyncSession, lock_key: str) -> None:
+    try:
+        await db.rollback()
+        await generation_lock_repository.release_lock(db, lock_key, _LOCK_OWNER)
+    except Exception as e:
+        # O lock expira sozinho; uma falha aqui não deve mascarar o resultado.
+        logger.warning(f"Falha ao liberar o lock {lock_key}: {e}")
+
+async def generate_summary_with_cache(
+    db: AsyncSession, chunks: List[str], level: str, allow_partial: bool = True
+) -> str:
+    return (await generate_summaries_with_cache(db, chunks, [level], allow_partial))[level]
+
+async def generate_summaries_with_cache(
+    db: AsyncSession, chunks: List[str], levels: List[str], allow_partial: bool = True
+) -> Dict[str, str]:
+    """
+    Resume o documento para um ou mais níveis, consultando o cache de cada nível.
+
+    Os níveis ausentes do cache são gerados em paralelo e compartilham a fase MAP
+    (ver _shared_partial_summaries): para N chunks e L níveis, são N + L chamadas à
+    IA em vez de L x (N + 1), mais as do REDUCE intermediário, feitas uma vez só.
+
+    Se algum chunk ficou sem resumo, o resumo incompleto é devolvido (sem ir para o
+    cache); com `allow_partial=False` levanta 503, para quem persiste o resultado
+    (os jobs) não guardá-lo como definitivo.
+    """
+    document_id = _create_document_id(chunks)
+    levels = list(dict.fromkeys(levels))
+    logger.info(f"Verificando cache para document_id: {document_id}, níveis: {levels}")
+
+    summaries: Dict[str, str] = {}
+    missing = []
+    for level in levels:
+        # Se a geração já está em andamento neste processo, o cache certamente não tem o resumo.
+        if not _summary_flight.is_in_flight((document_id, level)):
+            cached_text = await summary_cache.get_summary(db, document_id, level)
+            if cached_text is not None:
+                logger.info(f"Cache HIT para document_id: {document_id}, level: {level}")
+                summaries[level] = cached_text
+                continue
+            logger.info(f"Cache MISS para document_id: {document_id}, level: {level}. Gerando novo resumo.")
+        missing.append(level)
+
+    try:
+        # Requisições concorrentes para o mesmo (documento, nível) compartilham uma única geração.
+        generated = await asyncio.gather(*(
+            _summary_flight.do(
+                (document_id, level),
+                lambda level=level: _generate_and_cache_summary(document_id, chunks, level)
+            )
+            for level in missing
+        ))
     except HTTPException as e:
         # Re-raise if it's an HTTP exception from the AI service (like timeout)
         raise e
@@ -106,3 +523,226 @@ async def generate_summary_with_cache(db: AsyncSession, chunks: List[str], level
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Ocorreu um erro interno inesperado ao gerar o resumo."
         )
+    for level, (summary, missing_chunks) in zip(missing, generated):
+        if missing_chunks and not allow_partial:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"{missing_chunks} trechos do documento não puderam ser resumidos. Tente novamente."
+            )
+        summaries[level] = summary
+    return {level: summaries[level] for level in levels}
+
+async def stream_summary_with_cache(chunks: List[str], level: str) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    Versão em streaming de generate_summary_with_cache.
+
+    Produz eventos (nome, dados): `progress` a cada chunk resumido na fase MAP,
+    `token` com cada trecho do REDUCE final à medida que o modelo o gera, e
+    `done` com o resumo completo, que também é salvo no cache. Usa sessão
+    própria, pois o gerador continua rodando depois que o endpoint retorna.
+    """
+    document_id = _create_document_id(chunks)
+    async with AsyncSessionLocal() as db:
+        if _summary_flight.is_in_flight((document_id, level)):
+            # Outra requisição já está gerando este resumo: apenas aguarda o resultado.
+            final_summary, _ = await _summary_flight.do(
+                (document_id, level),
+                lambda: _generate_and_cache_summary(document_id, chunks, level)
+            )
+            yield "done", {"summary": final_summary, "cached": False}
+            return
+
+        cached_text = await summary_cache.get_summary(db, document_id, level)
+        if cached_text is not None:
+            logger.info(f"Cache HIT (streaming) para document_id: {document_id}")
+            yield "done", {"summary": cached_text, "cached": True}
+            return
+
+        logger.info(f"Cache MISS (streaming) para document_id: {document_id}. Gerando novo resumo.")
+        events: asyncio.Queue = asyncio.Queue()
+
+        def on_progress(completed: int, total: int) -> None:
+            events.put_nowait(("progress", {"phase": "map", "completed": completed, "total": total}))
+
+        # A fase MAP é compartilhada com as outras gerações do mesmo documento (streaming ou não).
+        partials_task = asyncio.ensure_future(_shared_partial_summaries(document_id, chunks, on_progress))
+        try:
+            while not partials_task.done() or not events.empty():
+                next_event = asyncio.ensure_future(events.get())
+                done, _ = await asyncio.wait({next_event, partials_task}, return_when=asyncio.FIRST_COMPLETED)
+                if next_event in done:
+                    yield next_event.result()
+                else:
+                    next_event.cancel()
+            partial_summaries, missing = partials_task.result()
+        finally:
+            partials_task.cancel()
+
+        yield "progress", {"phase": "reduce", "completed": 0, "total": 1}
+        pieces = []
+        async for piece in stream_google_ai_for_summary(_build_final_reduce_prompt(partial_summaries, level)):
+            pieces.append(piece)
+            yield "token", {"text": piece}
+        final_summary = "".join(pieces)
+
+        if missing:
+            logger.warning(f"Resumo (streaming) de {document_id} gerado sem {missing} chunks; não será salvo no cache.")
+        else:
+            final_summary = await summary_cache.save_summary(db, document_id, level, final_summary)
+            logger.info(f"Novo resumo (streaming) salvo no cache para document_id: {document_id}")
+        yield "done", {"summary": final_summary, "cached": False}
+
+
+# --- Pipeline em streaming: páginas -> texto -> chunks -> MAP ---
+
+async def iter_pdf_chunks(pdf_source: pdf_extractor.PdfSource) -> AsyncIterator[str]:
+    """
+    Produz os chunks de um PDF à medida que as páginas são extraídas, sem montar o
+    texto completo. Os chunks são idênticos aos de chunk_text(extract_text_from_pdf_async()).
+    """
+    normalizer = text_normalizer.PageNormalizer()
+    streaming_chunker = chunker.StreamingChunker()
+    async for page_text in pdf_extractor.iter_pages(pdf_source):
+        for chunk in streaming_chunker.feed(normalizer.feed(page_text)):
+            yield chunk
+    for chunk in streaming_chunker.feed(normalizer.finish()):
+        yield chunk
+    for chunk in streaming_chunker.finish():
+        yield chunk
+
+async def _produce_chunks(pdf_source: pdf_extractor.PdfSource, queue: asyncio.Queue) -> None:
+    """Coloca os chunks do PDF na fila, seguidos de None (fim) ou da exceção que interrompeu a extração."""
+    try:
+        async for chunk in iter_pdf_chunks(pdf_source):
+            await queue.put(chunk)
+    except Exception as e:
+        await queue.put(e)
+    else:
+        await queue.put(None)
+
+async def _map_chunk_queue(queue: asyncio.Queue, db: AsyncSession) -> Tuple[str, List[str | None]]:
+    """
+    Fase MAP sobre chunks que chegam por uma fila. Retorna (document_id, resumos).
+
+    Os chunks são resumidos assim que chegam (agrupados em lotes com os que já
+    estão na fila), com no máximo SUMMARY_MAX_CONCURRENCY chamadas em andamento;
+    enquanto todas as vagas estão ocupadas, a fila não é consumida e a extração
+    pausa. Os chunks já disponíveis são consultados no cache por chunk em lote, e
+    os resumos de cada lote são salvos assim que ele termina. Como em _map_chunks,
+    os chunks de lotes que falharam ficam como None, dentro do limite de perdas.
+    """
+    hasher = new_document_hasher()
+    semaphore = asyncio.Semaphore(SUMMARY_MAX_CONCURRENCY)
+    order: List[str] = []
+    # Hash -> resumo em cache, ou (tarefa do lote, posição do chunk no lote).
+    by_hash: Dict[str, Union[str, Tuple[asyncio.Task, int]]] = {}
+    tasks: List[asyncio.Task] = []
+    generated = 0
+    # A sessão é compartilhada pelas consultas do laço abaixo e pelos lotes que salvam seus resumos.
+    db_lock = asyncio.Lock()
+
+    async def summarize(pack: List[Tuple[str, str]]) -> List[str]:
+        nonlocal generated
+        try:
+            pack_summaries = await _summarize_pack(pack)
+        finally:
+            semaphore.release()
+        await _save_chunk_summaries(db, db_lock, dict(zip((chunk_hash for chunk_hash, _ in pack), pack_summaries)))
+        generated += len(pack)
+        return pack_summaries
+
+    finished = False
+    try:
+        while not finished:
+            batch = [await queue.get()]
+            while not queue.empty() and len(batch) < PIPELINE_CHUNK_BUFFER:
+                batch.append(queue.get_nowait())
+            if isinstance(batch[-1], Exception):
+                raise batch[-1]
+            if batch[-1] is None:
+                finished = True
+                batch.pop()
+
+            hashes = [hash_text(chunk) for chunk in batch]
+            async with db_lock:
+                cached = await _lookup_chunk_summaries(db, [h for h in hashes if h not in by_hash])
+            new_chunks: Dict[str, str] = {}
+            for chunk_hash, chunk in zip(hashes, batch):
+                hasher.update(chunk.encode("utf-8"))
+                order.append(chunk_hash)
+                if chunk_hash in by_hash:
+                    continue
+                if chunk_hash in cached:
+                    by_hash[chunk_hash] = cached[chunk_hash]
+                else:
+                    new_chunks.setdefault(chunk_hash, chunk)
+            for pack in _pack_chunks(list(new_chunks.items())):
+                await semaphore.acquire()
+                task = asyncio.ensure_future(summarize(pack))
+                tasks.append(task)
+                for index, (chunk_hash, _) in enumerate(pack):
+                    by_hash[chunk_hash] = (task, index)
+
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    summaries: List[str | None] = []
+    for chunk_hash in order:
+        entry = by_hash[chunk_hash]
+        if isinstance(entry, str):
+            summaries.append(entry)
+        elif entry[0].exception() is None:
+            summaries.append(entry[0].result()[entry[1]])
+        else:
+            summaries.append(None)
+    logger.info(f"Fase MAP (streaming): {len(order)} chunks, {generated} resumidos pela IA em {len(tasks)} lotes.")
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        _check_map_losses(summaries.count(None), len(summaries), errors)
+    return hasher.hexdigest(), summaries
+
+async def summarize_pdf_streaming(pdf_source: pdf_extractor.PdfSource, level: str) -> str:
+    """
+    Resume um PDF sobrepondo a extração das páginas (CPU, pool de processos) às
+    chamadas da fase MAP (rede): o primeiro chunk é resumido logo que as primeiras
+    páginas ficam prontas. O texto completo nunca é montado em memória.
+
+    O document_id só é conhecido ao fim da extração; o cache por chunk evita chamadas
+    repetidas na fase MAP e o cache de resumos evita o REDUCE.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_CHUNK_BUFFER)
+    start_time = time.time()
+    async with AsyncSessionLocal() as db:
+        producer = asyncio.ensure_future(_produce_chunks(pdf_source, queue))
+        try:
+            document_id, chunk_summaries = await _map_chunk_queue(queue, db)
+        finally:
+            producer.cancel()
+        chunk_summaries, missing = _drop_missing(chunk_summaries)
+        if not chunk_summaries and not missing:
+            raise ValueError("O PDF parece estar vazio ou não contém texto extraível.")
+        logger.info(
+            f"Extração e fase MAP (streaming) concluídas em {time.time() - start_time:.2f} segundos "
+            f"para document_id: {document_id}"
+        )
+
+        cached_text = await summary_cache.get_summary(db, document_id, level)
+        if cached_text is not None:
+            logger.info(f"Cache HIT para document_id: {document_id}")
+            return cached_text
+
+        if missing:
+            # Resumo incompleto: não é salvo (nem compartilhado), para que a próxima requisição o complete.
+            logger.warning(f"Resumo de {document_id} gerado sem {missing} chunks; não será salvo no cache.")
+            return await _reduce_to_final(chunk_summaries, level)
+
+        async def reduce_and_cache() -> Tuple[str, int]:
+            # Mesmo formato de _generate_and_cache_summary, com quem compartilha a chave.
+            async with AsyncSessionLocal() as reduce_db:
+                final_summary = await _reduce_to_final(chunk_summaries, level)
+                return await summary_cache.save_summary(reduce_db, document_id, level, final_summary), 0
+
+        final_summary, _ = await _summary_flight.do((document_id, level), reduce_and_cache)
+        return final_summary
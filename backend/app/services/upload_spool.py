@@ -0,0 +1,123 @@
+
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+from typing import IO, AsyncIterator, Tuple
+
+from fastapi import HTTPException, UploadFile, status
+
+from ..core.config import UPLOAD_BLOCK_SIZE, MAX_UPLOAD_BYTES, UPLOAD_SPOOL_DIR
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SpooledUpload:
+    """
+    Upload gravado em disco, com o hash SHA-256 calculado durante a leitura.
+
+    Uploads multipart já foram gravados pelo Starlette em um arquivo temporário
+    anônimo; a cópia com caminho (exigida pelo pool de extração) só é feita por
+    `ensure_path`, quando o PDF precisa mesmo ser extraído.
+    """
+    sha256: str
+    size: int
+    path: str | None = None
+    _source_file: IO[bytes] | None = field(default=None, repr=False)
+
+    async def ensure_path(self) -> str:
+        """Caminho do upload em disco, gravando a cópia do arquivo do Starlette se preciso."""
+        if self.path is None:
+            self.path = await asyncio.to_thread(_copy_to_temp_file, self._source_file)
+        return self.path
+
+    def cleanup(self) -> None:
+        if self.path is None:
+            return
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _check_size(size: int) -> None:
+    if size > MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail=f"O arquivo excede o tamanho máximo de {MAX_UPLOAD_BYTES // (1024 * 1024)} MB."
+        )
+
+
+def _write_block(spool_file: IO[bytes], hasher, block: bytes) -> None:
+    hasher.update(block)
+    spool_file.write(block)
+
+
+def _hash_file(source: IO[bytes], block_size: int) -> Tuple[str, int]:
+    source.seek(0)
+    hasher = hashlib.sha256()
+    size = 0
+    while block := source.read(block_size):
+        size += len(block)
+        _check_size(size)
+        hasher.update(block)
+    return hasher.hexdigest(), size
+
+
+def _copy_to_temp_file(source: IO[bytes]) -> str:
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=".pdf", dir=UPLOAD_SPOOL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as spool_file:
+            source.seek(0)
+            shutil.copyfileobj(source, spool_file, UPLOAD_BLOCK_SIZE)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+async def spool_upload_file(file: UploadFile, block_size: int = UPLOAD_BLOCK_SIZE) -> SpooledUpload:
+    """
+    Calcula o SHA-256 de um UploadFile lendo o arquivo temporário que o Starlette
+    já gravou, sem copiá-lo. A leitura roda em uma thread, fora do event loop.
+    """
+    sha256, size = await asyncio.to_thread(_hash_file, file.file, block_size)
+    logger.info(f"Upload recebido: {size} bytes, sha256={sha256}")
+    return SpooledUpload(sha256=sha256, size=size, _source_file=file.file)
+
+
+async def spool_stream(chunks: AsyncIterator[bytes], block_size: int = UPLOAD_BLOCK_SIZE) -> SpooledUpload:
+    """
+    Grava um fluxo de bytes em um arquivo temporário, calculando o SHA-256 em paralelo.
+
+    Os pedaços recebidos (de tamanho escolhido pelo cliente) são reagrupados em
+    blocos de `block_size` bytes; apenas um bloco fica em memória por vez, então o
+    pico de memória por upload não depende do tamanho do arquivo. O hash e a
+    gravação de cada bloco rodam em uma thread, fora do event loop. O chamador
+    deve chamar `cleanup()`.
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    buffer = bytearray()
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=".pdf", dir=UPLOAD_SPOOL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as spool_file:
+            async for chunk in chunks:
+                size += len(chunk)
+                _check_size(size)
+                buffer += chunk
+                while len(buffer) >= block_size:
+                    block = bytes(buffer[:block_size])
+                    del buffer[:block_size]
+                    await asyncio.to_thread(_write_block, spool_file, hasher, block)
+            if buffer:
+                await asyncio.to_thread(_write_block, spool_file, hasher, bytes(buffer))
+    except BaseException:
+        os.unlink(path)
+        raise
+    logger.info(f"Upload gravado em disco: {size} bytes, sha256={hasher.hexdigest()}")
+    return SpooledUpload(sha256=hasher.hexdigest(), size=size, path=path)
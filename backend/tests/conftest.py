@@ -0,0 +1,29 @@
+# conftest.py
+# Configuração comum dos testes do backend
+
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+# Banco SQLite próprio dos testes, definido antes de importar app.database.
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(prefix='tests-'), 'test.db')}"
+)
+
+
+@pytest.fixture
+def run_with_db():
+    """Executa uma corrotina em um event loop novo, com as tabelas criadas e o pool fechado ao final."""
+    from app.database import init_db, close_db
+
+    def run(main):
+        async def wrapper():
+            await init_db()
+            try:
+                return await main()
+            finally:
+                await close_db()
+        return asyncio.run(wrapper())
+    return run
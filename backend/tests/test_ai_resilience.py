@@ -0,0 +1,160 @@
+# test_ai_resilience.py
+# Testes do circuit breaker e do hedge das chamadas à IA
+
+import asyncio
+import contextlib
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import ai_resilience, ai_scheduler, ai_service
+
+
+@pytest.fixture
+def half_open(monkeypatch):
+    """Circuit breaker novo, já meio aberto: a próxima chamada é a de teste."""
+    breaker = ai_resilience.CircuitBreaker(failure_threshold=1, open_seconds=0)
+    breaker.record_failure()
+    monkeypatch.setattr(ai_resilience, "circuit_breaker", breaker)
+    monkeypatch.setattr(ai_resilience, "retry_budget", ai_resilience.RetryBudget())
+    monkeypatch.setattr(ai_resilience, "latency_tracker", ai_resilience.LatencyTracker())
+    return breaker
+
+
+def _fake_slot(monkeypatch, acquire):
+    @contextlib.asynccontextmanager
+    async def slot(endpoint, estimated_tokens):
+        await acquire()
+        yield
+
+    monkeypatch.setattr(ai_scheduler.scheduler, "slot", slot)
+
+
+def _fake_generate(monkeypatch, delays):
+    """generate_content que responde após o próximo atraso de `delays`; registra as chamadas."""
+    calls = []
+
+    async def generate_content(**kwargs):
+        delay = delays[len(calls)]
+        calls.append(delay)
+        await asyncio.sleep(delay)
+        return f"resposta-{delay}"
+
+    monkeypatch.setattr(ai_service.client, "generate_content", generate_content)
+    return calls
+
+
+def test_only_one_probe_while_half_open(half_open):
+    assert half_open.before_call("summary") is True
+    with pytest.raises(HTTPException) as exc:
+        half_open.before_call("summary")
+    assert exc.value.status_code == 503
+    half_open.release_probe()
+    assert half_open.before_call("summary") is True
+
+
+def test_probe_queue_timeout_releases_probe(half_open, monkeypatch):
+    async def acquire():
+        raise HTTPException(status_code=503, detail="fila cheia")
+
+    _fake_slot(monkeypatch, acquire)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(ai_service._call_ai_with_timeout("prompt", endpoint="summary"))
+    assert exc.value.status_code == 503
+    assert half_open.state == "half_open"
+    assert half_open.before_call("summary") is True
+
+
+def test_probe_cancelled_in_queue_releases_probe(half_open, monkeypatch):
+    async def acquire():
+        await asyncio.Event().wait()
+
+    _fake_slot(monkeypatch, acquire)
+
+    async def run():
+        task = asyncio.ensure_future(ai_service._call_ai_with_timeout("prompt", endpoint="summary"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert half_open.before_call("summary") is True
+
+
+def test_stream_probe_queue_timeout_releases_probe(half_open, monkeypatch):
+    async def acquire():
+        raise HTTPException(status_code=503, detail="fila cheia")
+
+    _fake_slot(monkeypatch, acquire)
+
+    async def run():
+        async for _ in ai_service.stream_google_ai_for_summary("prompt"):
+            pass
+
+    with pytest.raises(HTTPException):
+        asyncio.run(run())
+    assert half_open.before_call("summary") is True
+
+
+def _warm_tracker(monkeypatch, seconds):
+    monkeypatch.setattr(ai_resilience, "AI_HEDGE_ENABLED", True)
+    tracker = ai_resilience.LatencyTracker(min_samples=1)
+    tracker.observe(("summary", "generate"), seconds)
+    monkeypatch.setattr(ai_resilience, "latency_tracker", tracker)
+    monkeypatch.setattr(ai_resilience, "circuit_breaker", ai_resilience.CircuitBreaker())
+    monkeypatch.setattr(ai_resilience, "retry_budget", ai_resilience.RetryBudget())
+    return tracker
+
+
+def test_no_hedge_while_primary_is_queued(monkeypatch):
+    tracker = _warm_tracker(monkeypatch, 0.01)
+    _fake_generate(monkeypatch, [0.0, 0.0])
+    queued = []
+
+    async def acquire():
+        queued.append(1)
+        # Fila bem mais longa que o prazo do hedge.
+        await asyncio.sleep(0.1)
+
+    _fake_slot(monkeypatch, acquire)
+
+    assert asyncio.run(ai_service._call_ai_with_timeout("prompt", endpoint="summary")) == "resposta-0.0"
+    assert len(queued) == 1
+    assert len(tracker._samples[("summary", "generate")]) == 2
+
+
+def test_hedge_win_records_latency_once(monkeypatch):
+    tracker = _warm_tracker(monkeypatch, 0.01)
+    calls = _fake_generate(monkeypatch, [1.0, 0.0])
+
+    async def acquire():
+        return None
+
+    _fake_slot(monkeypatch, acquire)
+
+    assert asyncio.run(ai_service._call_ai_with_timeout("prompt", endpoint="summary")) == "resposta-0.0"
+    assert len(calls) == 2
+    samples = tracker._samples[("summary", "generate")]
+    assert len(samples) == 2
+    # A amostra é o tempo que a chamada original já levava, não o da duplicada somado ao prazo do hedge.
+    assert 0.01 <= samples[-1] < 1.0
+
+
+def test_no_hedge_unless_breaker_is_closed(half_open, monkeypatch):
+    monkeypatch.setattr(ai_resilience, "AI_HEDGE_ENABLED", True)
+    tracker = ai_resilience.LatencyTracker(min_samples=1)
+    tracker.observe(("summary", "generate"), 0.01)
+    monkeypatch.setattr(ai_resilience, "latency_tracker", tracker)
+    calls = _fake_generate(monkeypatch, [0.1, 0.0])
+
+    async def acquire():
+        return None
+
+    _fake_slot(monkeypatch, acquire)
+
+    # A chamada de teste do circuito meio aberto demora mais que o prazo do hedge, sem duplicata.
+    assert asyncio.run(ai_service._call_ai_with_timeout("prompt", endpoint="summary")) == "resposta-0.1"
+    assert calls == [0.1]
+    assert half_open.state == "closed"
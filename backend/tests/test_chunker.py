@@ -0,0 +1,92 @@
+# test_chunker.py
+# Testes do chunker por sentenças com orçamento de tokens
+
+import random
+
+import pytest
+
+from app.services import chunker
+
+WORDS = ["a", "célula", "energia", "derivada", "função", "história", "revolução", "x" * 60, "DNA", "3,14"]
+PUNCTUATION = [".", ".", "?", "!", ";", ":", "…", ".\"", ")."]
+
+
+def _random_text(rng: random.Random, sentences: int) -> str:
+    parts = []
+    for _ in range(sentences):
+        if rng.random() < 0.05:
+            # Sentença sem espaços, maior que o orçamento: precisa ser cortada no limite.
+            parts.append("y" * rng.randint(1200, 2500))
+            continue
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 80)))
+        parts.append(sentence.capitalize() + rng.choice(PUNCTUATION))
+        parts.append(rng.choice([" ", " ", "  ", "\n", "\n\n", "\n \n"]))
+    return "".join(parts)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_sentence_chunks_cover_text_within_budget(seed):
+    rng = random.Random(seed)
+    text = _random_text(rng, rng.randint(1, 300))
+    budget, overlap = rng.choice([(50, 10), (250, 40), (400, 0)])
+    max_chars = int(budget * chunker.CHUNK_CHARS_PER_TOKEN)
+    offsets = chunker.sentence_chunk_offsets(text, budget, overlap)
+
+    assert offsets[0][0] == 0 and offsets[-1][1] == len(text)
+    boundaries = set(chunker.find_boundaries(text))
+    previous_start, previous_end = -1, 0
+    for start, end in offsets:
+        assert 0 < end - start <= max_chars
+        # Sem buracos, sempre avançando e com sobreposição apenas sobre o chunk anterior.
+        assert previous_start < start <= previous_end < end
+        if overlap == 0:
+            assert start == previous_end
+        # Fecha num limite de sentença, num espaço (sentença longa) ou no limite de caracteres.
+        assert end == len(text) or end in boundaries or text[end - 1] == " " or end - start == max_chars
+        previous_start, previous_end = start, end
+
+
+def test_short_text_is_a_single_chunk():
+    assert chunker.sentence_chunk_offsets("Uma frase curta. Outra.") == [(0, 23)]
+    assert chunker.sentence_chunk_offsets("") == []
+
+
+def test_chunks_end_on_sentence_boundaries():
+    text = " ".join(f"Frase número {i} sobre o tema." for i in range(200))
+    for start, end in chunker.sentence_chunk_offsets(text, token_budget=60, overlap_tokens=0):
+        assert text[start:end].rstrip().endswith(".")
+
+
+def _random_pieces(rng: random.Random, text: str):
+    """Divide o texto em partes de tamanhos aleatórios, incluindo partes vazias e de um caractere."""
+    pieces, position = [], 0
+    while position < len(text):
+        size = rng.choice([0, 1, 2, rng.randint(1, 50), rng.randint(50, 3000)])
+        pieces.append(text[position:position + size])
+        position += size
+    return pieces
+
+
+@pytest.mark.parametrize("mode", ["sentence", "fixed"])
+@pytest.mark.parametrize("seed", range(30))
+def test_streaming_chunker_matches_chunk_offsets(monkeypatch, mode, seed):
+    monkeypatch.setattr(chunker, "CHUNKER", mode)
+    rng = random.Random(seed)
+    text = _random_text(rng, rng.randint(0, 400))
+    expected = [text[start:end] for start, end in chunker.chunk_offsets(text)]
+
+    streaming = chunker.StreamingChunker()
+    produced = []
+    for piece in _random_pieces(rng, text):
+        produced.extend(streaming.feed(piece))
+    produced.extend(streaming.finish())
+    assert produced == expected
+
+
+def test_streaming_chunker_holds_back_only_undecided_text():
+    text = " ".join(f"Frase número {i} sobre o tema." for i in range(500))
+    streaming = chunker.StreamingChunker()
+    emitted = streaming.feed(text)
+    # Quase todo o texto já decide seus chunks antes do fim; só o último fica retido.
+    assert len(emitted) >= len(chunker.chunk_offsets(text)) - 2
+    assert emitted + streaming.finish() == [text[start:end] for start, end in chunker.chunk_offsets(text)]
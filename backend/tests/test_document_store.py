@@ -0,0 +1,35 @@
+# test_document_store.py
+# Testes da resolução do conteúdo das requisições (texto/chunks enviados ou document_handle)
+
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from app.database.database import AsyncSessionLocal
+from app.repositories import extraction_cache_repository
+from app.services import document_store
+
+
+async def _store(text: str) -> str:
+    handle = uuid.uuid4().hex
+    async with AsyncSessionLocal() as db:
+        await extraction_cache_repository.save_extraction_to_cache(
+            db, handle, "sha", text, chunk_offsets=[(0, len(text))]
+        )
+    return handle
+
+
+def test_resolve_text_caps_documents_sent_in_one_prompt(monkeypatch, run_with_db):
+    monkeypatch.setattr(document_store, "GENERATOR_MAX_INPUT_CHARS", 100)
+
+    async def main():
+        small, large = await _store("a" * 100), await _store("a" * 101)
+        async with AsyncSessionLocal() as db:
+            assert await document_store.resolve_text(db, None, small) == "a" * 100
+            for text, handle in ((None, large), ("b" * 101, None)):
+                with pytest.raises(HTTPException) as error:
+                    await document_store.resolve_text(db, text, handle)
+                assert error.value.status_code == 413
+
+    run_with_db(main)
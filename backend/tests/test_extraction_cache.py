@@ -0,0 +1,30 @@
+# test_extraction_cache.py
+# Testes do cache de extração: offsets de chunks e páginas
+
+import json
+import uuid
+
+from app.database.database import AsyncSessionLocal
+from app.repositories import extraction_cache_repository
+
+
+def test_offsets_round_trip(run_with_db):
+    async def main():
+        key = uuid.uuid4().hex
+        async with AsyncSessionLocal() as db:
+            await extraction_cache_repository.save_extraction_to_cache(
+                db, key, "sha", "ab\n\ncd", chunk_offsets=[(0, 2), (4, 6)], page_offsets=[0, 4]
+            )
+            entry = await extraction_cache_repository.get_cached_extraction(db, key)
+            assert json.loads(entry.chunk_offsets) == [[0, 2], [4, 6]]
+            assert extraction_cache_repository.get_chunk_offsets(entry) == [(0, 2), (4, 6)]
+            assert extraction_cache_repository.get_page_offsets(entry) == [0, 4]
+
+            other = uuid.uuid4().hex
+            await extraction_cache_repository.save_extraction_to_cache(
+                db, other, "sha2", "ab", chunk_offsets=[(0, 2)]
+            )
+            entry = await extraction_cache_repository.get_cached_extraction(db, other)
+            assert extraction_cache_repository.get_page_offsets(entry) is None
+
+    run_with_db(main)
@@ -0,0 +1,88 @@
+# test_generation_cache.py
+# Testes do cache de respostas dos geradores: chave, registro de acesso e despejo
+
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select, update
+
+from app.database.database import AsyncSessionLocal
+from app.database.models import GenerationCache as GenerationCacheRow
+from app.repositories import generation_cache_repository as repository
+from app.schemas.generation import QuizResponse
+from app.services.generation_cache import GenerationCache
+
+
+def _cache(version: str = "v1") -> GenerationCache:
+    return GenerationCache("quiz", QuizResponse, version)
+
+
+def test_key_ignores_whitespace_variations():
+    cache = _cache()
+    assert cache.make_key({"text": "A  célula\n\té a unidade ", "studentLevel": "médio"}) == \
+        cache.make_key({"text": "A célula é a unidade", "studentLevel": "médio"})
+
+
+def test_key_preserves_case_and_depends_on_every_param():
+    cache = _cache()
+    base = cache.make_key({"text": "O DNA da célula", "studentLevel": "médio"})
+    assert base != cache.make_key({"text": "O dna da célula", "studentLevel": "médio"})
+    assert base != cache.make_key({"text": "O DNA da célula", "studentLevel": "graduação"})
+
+
+def test_key_changes_with_prompt_version():
+    params = {"text": "texto", "studentLevel": "médio"}
+    assert _cache("v1").make_key(params) != _cache("v2").make_key(params)
+
+
+
+async def _set_access_time(db, key: str, value: datetime) -> None:
+    await db.execute(update(GenerationCacheRow).where(GenerationCacheRow.cache_key == key).values(last_accessed_at=value))
+    await db.commit()
+
+
+async def _access_time(db, key: str) -> datetime:
+    await db.rollback()
+    return (await repository.get_cached_generation(db, key)).last_accessed_at
+
+
+def test_cache_hit_refreshes_access_time_only_after_interval(run_with_db):
+    key = uuid.uuid4().hex
+
+    async def main():
+        async with AsyncSessionLocal() as db:
+            await repository.save_generation_to_cache(db, key, "quiz", "{}", ttl_seconds=3600)
+            recent = datetime.utcnow().replace(microsecond=0) - timedelta(seconds=10)
+            await _set_access_time(db, key, recent)
+            # Acertos dentro do intervalo não escrevem no banco.
+            assert await _access_time(db, key) == recent
+            assert await _access_time(db, key) == recent
+
+            old = recent - timedelta(seconds=repository.GENERATION_CACHE_TOUCH_INTERVAL)
+            await _set_access_time(db, key, old)
+            await repository.get_cached_generation(db, key)
+        async with AsyncSessionLocal() as db:
+            assert await _access_time(db, key) > old
+
+    run_with_db(main)
+
+
+def test_eviction_runs_every_n_saves(monkeypatch, run_with_db):
+    monkeypatch.setattr(repository, "GENERATION_CACHE_MAX_ROWS", 2)
+    monkeypatch.setattr(repository, "GENERATION_CACHE_EVICT_EVERY", 3)
+    monkeypatch.setattr(repository, "_saves_since_evict", 0)
+
+    async def rows(db) -> int:
+        return (await db.execute(select(func.count(GenerationCacheRow.id)))).scalar_one()
+
+    async def main():
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(GenerationCacheRow))
+            await db.commit()
+            counts = []
+            for i in range(6):
+                await repository.save_generation_to_cache(db, uuid.uuid4().hex, "quiz", "{}", ttl_seconds=3600)
+                counts.append(await rows(db))
+            return counts
+
+    assert run_with_db(main) == [1, 2, 2, 3, 4, 2]
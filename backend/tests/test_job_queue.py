@@ -0,0 +1,240 @@
+# test_job_queue.py
+# Testes da fila persistente de jobs: reserva, retomada, novas tentativas, posse e deduplicação
+
+import asyncio
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import delete
+
+from app.database.database import AsyncSessionLocal
+from app.database.models import GenerationJob, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED
+from app.repositories import generation_job_repository
+from app.schemas.summary import SummaryRequest, SummaryResponse
+from app.services import job_queue, text_processor
+
+
+class EchoRequest(BaseModel):
+    text: str
+    delay: float = 0.0
+
+
+class EchoResponse(BaseModel):
+    text: str
+
+
+async def _echo(db, payload: EchoRequest) -> EchoResponse:
+    await asyncio.sleep(payload.delay)
+    return EchoResponse(text=payload.text)
+
+
+def _register_echo(monkeypatch):
+    monkeypatch.setitem(job_queue.JOB_HANDLERS, "echo", (EchoRequest, _echo))
+
+
+async def _clear_jobs():
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(GenerationJob))
+        await db.commit()
+
+
+async def _get(job_id: str) -> GenerationJob:
+    async with AsyncSessionLocal() as db:
+        return await generation_job_repository.get_job(db, job_id)
+
+
+def test_claim_runs_job_and_dedups_identical_input(monkeypatch, run_with_db):
+    _register_echo(monkeypatch)
+
+    async def main():
+        await _clear_jobs()
+        async with AsyncSessionLocal() as db:
+            job = await job_queue.submit_job(db, "echo", EchoRequest(text="oi"))
+            again = await job_queue.submit_job(db, "echo", EchoRequest(text="oi"))
+            assert again.id == job.id
+            claimed = await generation_job_repository.claim_next_job(db, lease_seconds=60)
+            assert claimed.id == job.id and claimed.status == JOB_RUNNING and claimed.attempts == 1
+            # Em execução e dentro da posse: nenhum outro worker o reserva.
+            assert await generation_job_repository.claim_next_job(db, lease_seconds=60) is None
+        await job_queue._execute(claimed)
+        done = await _get(job.id)
+        assert done.status == JOB_SUCCEEDED
+        assert EchoResponse.model_validate_json(done.result).text == "oi"
+
+    run_with_db(main)
+
+
+def test_concurrent_identical_submits_create_one_job(monkeypatch, run_with_db):
+    _register_echo(monkeypatch)
+    find_active_job = generation_job_repository.find_active_job
+    submits = 5
+    checked = []
+
+    async def racing_find_active_job(db, kind, input_hash):
+        # Todos os envios consultam antes de qualquer um inserir: a corrida do check-then-insert.
+        if len(checked) < submits:
+            checked.append(input_hash)
+            while len(checked) < submits:
+                await asyncio.sleep(0.001)
+            return None
+        return await find_active_job(db, kind, input_hash)
+
+    monkeypatch.setattr(generation_job_repository, "find_active_job", racing_find_active_job)
+
+    async def submit():
+        async with AsyncSessionLocal() as db:
+            return await job_queue.submit_job(db, "echo", EchoRequest(text="concorrente"))
+
+    async def main():
+        await _clear_jobs()
+        jobs = await asyncio.gather(*(submit() for _ in range(submits)))
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                GenerationJob.__table__.select().where(GenerationJob.kind == "echo")
+            )).all()
+        return jobs, rows
+
+    jobs, rows = run_with_db(main)
+    assert len({job.id for job in jobs}) == 1
+    assert len(rows) == 1
+
+
+def test_expired_lease_is_reclaimed_and_retries_are_bounded(monkeypatch, run_with_db):
+    _register_echo(monkeypatch)
+
+    async def main():
+        await _clear_jobs()
+        async with AsyncSessionLocal() as db:
+            job = await job_queue.submit_job(db, "echo", EchoRequest(text="abandonado"))
+            attempts = []
+            # Um worker reserva o job e "morre" sem concluí-lo: a posse expira e outro o retoma.
+            for _ in range(job_queue.JOB_MAX_ATTEMPTS + 1):
+                claimed = await generation_job_repository.claim_next_job(db, lease_seconds=0)
+                attempts.append(claimed.attempts)
+                await asyncio.sleep(0.01)
+            assert attempts == list(range(1, job_queue.JOB_MAX_ATTEMPTS + 2))
+        await job_queue._execute(claimed)
+        failed = await _get(job.id)
+        assert failed.status == JOB_FAILED
+
+        # Depois da falha, um novo envio idêntico cria outro job.
+        async with AsyncSessionLocal() as db:
+            retried = await job_queue.submit_job(db, "echo", EchoRequest(text="abandonado"))
+        assert retried.id != job.id and retried.status == JOB_QUEUED
+
+    run_with_db(main)
+
+
+def test_worker_that_lost_its_lease_cannot_overwrite_the_job(monkeypatch, run_with_db):
+    _register_echo(monkeypatch)
+
+    async def main():
+        await _clear_jobs()
+        async with AsyncSessionLocal() as db:
+            job = await job_queue.submit_job(db, "echo", EchoRequest(text="disputado", delay=0.2))
+            stale = await generation_job_repository.claim_next_job(db, lease_seconds=0)
+        # Sem heartbeat, a posse do primeiro worker expira e outro worker retoma o job.
+        monkeypatch.setattr(job_queue, "JOB_HEARTBEAT_INTERVAL", 60)
+        first = asyncio.ensure_future(job_queue._execute(stale))
+        await asyncio.sleep(0.05)
+        async with AsyncSessionLocal() as db:
+            current = await generation_job_repository.claim_next_job(db, lease_seconds=60)
+        assert current.id == job.id and current.attempts == 2
+        await first
+        taken = await _get(job.id)
+        assert taken.status == JOB_RUNNING and taken.attempts == 2 and taken.result is None
+
+        async with AsyncSessionLocal() as db:
+            assert not await generation_job_repository.fail_job(db, job.id, stale.attempts, "tarde demais")
+        await job_queue._execute(current)
+        done = await _get(job.id)
+        assert done.status == JOB_SUCCEEDED and done.error is None
+
+    run_with_db(main)
+
+
+def test_interrupted_job_is_requeued_without_spending_an_attempt(monkeypatch, run_with_db):
+    _register_echo(monkeypatch)
+
+    async def main():
+        await _clear_jobs()
+        async with AsyncSessionLocal() as db:
+            job = await job_queue.submit_job(db, "echo", EchoRequest(text="desligando", delay=5))
+        for _ in range(job_queue.JOB_MAX_ATTEMPTS + 1):
+            async with AsyncSessionLocal() as db:
+                claimed = await generation_job_repository.claim_next_job(db, lease_seconds=60)
+            execution = asyncio.ensure_future(job_queue._execute(claimed))
+            await asyncio.sleep(0.02)
+            execution.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await execution
+            requeued = await _get(job.id)
+            assert requeued.status == JOB_QUEUED and requeued.attempts == 0
+
+    run_with_db(main)
+
+
+def test_heartbeat_keeps_long_job_from_being_reclaimed(monkeypatch, run_with_db):
+    _register_echo(monkeypatch)
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", 0.2)
+    monkeypatch.setattr(job_queue, "JOB_HEARTBEAT_INTERVAL", 0.05)
+
+    async def main():
+        await _clear_jobs()
+        async with AsyncSessionLocal() as db:
+            job = await job_queue.submit_job(db, "echo", EchoRequest(text="livro inteiro", delay=0.6))
+            claimed = await generation_job_repository.claim_next_job(db, lease_seconds=0.2)
+        execution = asyncio.ensure_future(job_queue._execute(claimed))
+        # Bem depois da posse inicial: sem a renovação, outro worker retomaria o job.
+        await asyncio.sleep(0.4)
+        async with AsyncSessionLocal() as db:
+            assert await generation_job_repository.claim_next_job(db, lease_seconds=0.2) is None
+        await execution
+        done = await _get(job.id)
+        assert done.status == JOB_SUCCEEDED and done.attempts == 1
+
+    run_with_db(main)
+
+
+def test_partial_summary_fails_job_and_resubmit_completes_it(monkeypatch, run_with_db):
+    monkeypatch.setattr(text_processor, "MAP_BATCH_ENABLED", False)
+    chunks = [f"trecho {i} {uuid.uuid4().hex}" for i in range(10)]
+    summarized = []
+    flaky = {chunks[3]}
+
+    async def summarize_pack(pack):
+        summarized.extend(chunk for _, chunk in pack)
+        if flaky & {chunk for _, chunk in pack}:
+            raise HTTPException(status_code=503, detail="IA indisponível")
+        return [f"resumo de {chunk}" for _, chunk in pack]
+
+    async def final_summary(prompt, phase="generate"):
+        return "resumo final"
+
+    monkeypatch.setattr(text_processor, "_summarize_pack", summarize_pack)
+    monkeypatch.setattr(text_processor, "call_google_ai_for_summary", final_summary)
+
+    async def submit_and_run() -> GenerationJob:
+        async with AsyncSessionLocal() as db:
+            job = await job_queue.submit_job(db, "summary", SummaryRequest(chunks=chunks, level="graduação"))
+            claimed = await generation_job_repository.claim_next_job(db, lease_seconds=60)
+        assert claimed.id == job.id
+        await job_queue._execute(claimed)
+        return await _get(job.id)
+
+    async def main():
+        await _clear_jobs()
+        partial = await submit_and_run()
+        # O resumo sem o chunk 3 não fica guardado no job para ser reaproveitado.
+        assert partial.status == JOB_FAILED and "1 trechos" in partial.error
+        flaky.clear()
+        summarized.clear()
+        complete = await submit_and_run()
+        assert complete.id != partial.id and complete.status == JOB_SUCCEEDED
+        assert SummaryResponse.model_validate_json(complete.result).summary == "resumo final"
+        # Os demais chunks vêm do cache de resumos por chunk: só o que faltava é resumido de novo.
+        assert summarized == [chunks[3]]
+
+    run_with_db(main)
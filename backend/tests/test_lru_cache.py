@@ -0,0 +1,54 @@
+# test_lru_cache.py
+# Testes do cache LRU em memória (limite de entradas, de bytes e TTL)
+
+import time
+
+from app.services.lru_cache import LRUCache
+
+
+def test_evicts_least_recently_used_entry():
+    cache: LRUCache[str] = LRUCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # "a" passa a ser o mais recente
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+
+
+def test_byte_budget_evicts_until_it_fits():
+    cache: LRUCache[str] = LRUCache(max_entries=100, max_bytes=10, sizeof=len)
+    cache.set("a", "xxxx")
+    cache.set("b", "yyyy")
+    cache.set("c", "zzzz")
+    assert cache.get("a") is None
+    assert len(cache) == 2 and cache.total_bytes == 8
+
+
+def test_value_larger_than_budget_is_not_stored_and_keeps_the_rest():
+    cache: LRUCache[str] = LRUCache(max_entries=100, max_bytes=10, sizeof=len)
+    cache.set("a", "xxxx")
+    cache.set("a", "x" * 11)
+    cache.set("b", "y" * 11)
+    assert cache.get("a") is None and cache.get("b") is None
+    assert cache.total_bytes == 0
+    cache.set("c", "zz")
+    assert cache.get("c") == "zz" and cache.total_bytes == 2
+
+
+def test_replacing_and_popping_keep_byte_total_consistent():
+    cache: LRUCache[str] = LRUCache(max_entries=100, max_bytes=100, sizeof=len)
+    cache.set("a", "xxxx")
+    cache.set("a", "xx")
+    assert cache.total_bytes == 2
+    cache.pop("a")
+    cache.pop("ausente")
+    assert cache.total_bytes == 0 and len(cache) == 0
+
+
+def test_expired_entries_are_dropped():
+    cache: LRUCache[str] = LRUCache(max_entries=10, ttl_seconds=0.01, max_bytes=100, sizeof=len)
+    cache.set("a", "xxxx")
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.total_bytes == 0
@@ -0,0 +1,75 @@
+# test_single_flight.py
+# Testes do agrupamento de chamadas concorrentes com a mesma chave
+
+import asyncio
+
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "resumo"
+
+    async def run():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("doc:medio", generate) for _ in range(5)))
+        assert flight.in_flight() == 0
+        return results
+
+    assert asyncio.run(run()) == ["resumo"] * 5
+    assert len(calls) == 1
+
+
+def test_different_keys_run_separately():
+    async def run():
+        flight = SingleFlight()
+        return await asyncio.gather(
+            flight.do("a", lambda: asyncio.sleep(0.01, result="a")),
+            flight.do("b", lambda: asyncio.sleep(0.01, result="b")),
+        )
+
+    assert asyncio.run(run()) == ["a", "b"]
+
+
+def test_error_reaches_every_waiter_and_key_is_released():
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("falha da IA")
+
+    async def run():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("k", failing) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert not flight.is_in_flight("k")
+        # Depois da falha, uma nova chamada executa de novo.
+        with pytest.raises(RuntimeError):
+            await flight.do("k", failing)
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_cancelling_one_waiter_does_not_cancel_the_shared_task():
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "pronto"
+
+    async def run():
+        flight = SingleFlight()
+        first = asyncio.ensure_future(flight.do("k", slow))
+        second = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "pronto"
+        assert first.cancelled()
+
+    asyncio.run(run())
@@ -0,0 +1,46 @@
+# test_summary_cache.py
+# Testes do cache de resumos em duas camadas (memória e banco) e do cache negativo
+
+import uuid
+
+import pytest
+
+from app.database.database import AsyncSessionLocal
+from app.repositories import summary_cache_repository
+from app.services import summary_cache
+
+
+async def _other_worker_saves(document_id: str, level: str, text: str) -> None:
+    # Grava direto no banco, sem passar pela memória deste processo.
+    async with AsyncSessionLocal() as db:
+        await summary_cache_repository.save_summary_to_cache(db, document_id, level, text)
+
+
+@pytest.mark.parametrize("invalidation, visible", [(False, True), (True, False)])
+def test_negative_cache_only_with_invalidation(monkeypatch, run_with_db, invalidation, visible):
+    monkeypatch.setattr(summary_cache, "SUMMARY_CACHE_INVALIDATION_ENABLED", invalidation)
+    document_id = uuid.uuid4().hex
+
+    async def main():
+        async with AsyncSessionLocal() as db:
+            assert await summary_cache.get_summary(db, document_id, "médio") is None
+            await _other_worker_saves(document_id, "médio", "resumo salvo em outro worker")
+            return await summary_cache.get_summary(db, document_id, "médio")
+
+    found = run_with_db(main)
+    # Sem invalidação, o resumo do outro worker é visto na hora; com ela, o cache negativo
+    # vale até a invalidação chegar pelo feed.
+    assert (found == "resumo salvo em outro worker") is visible
+
+
+def test_save_is_served_from_memory(run_with_db):
+    document_id = uuid.uuid4().hex
+
+    async def main():
+        async with AsyncSessionLocal() as db:
+            await summary_cache.save_summary(db, document_id, "médio", "resumo")
+            hits = summary_cache._stats["memory_hits"]
+            assert await summary_cache.get_summary(db, document_id, "médio") == "resumo"
+            assert summary_cache._stats["memory_hits"] == hits + 1
+
+    run_with_db(main)
@@ -0,0 +1,94 @@
+# test_text_normalizer.py
+# Testes da normalização do texto extraído: cabeçalhos/rodapés, hifenização e offsets das páginas
+
+import pytest
+
+from app.services.text_normalizer import PageNormalizer
+
+
+def _normalize(pages):
+    normalizer = PageNormalizer(enabled=True)
+    text = "".join([normalizer.feed(page) for page in pages] + [normalizer.finish()])
+    return text, normalizer
+
+
+def _book(bodies):
+    return [f"Manual do Aluno\n{body}\nPágina {i + 1} de {len(bodies)}" for i, body in enumerate(bodies)]
+
+
+_WORDS = "ensino estudo leitura prova exercício revisão capítulo tema resumo questão aula".split()
+
+
+def _body(i):
+    # Linhas diferentes em cada página, para não parecerem cabeçalho ou rodapé.
+    return "\n".join(f"{_WORDS[(i + j) % len(_WORDS)]} {_WORDS[(3 * i + j) % len(_WORDS)]} {i}.{j}" for j in range(4))
+
+
+def test_repeated_headers_and_footers_are_removed():
+    bodies = [_body(i) for i in range(6)]
+    text, normalizer = _normalize(_book(bodies))
+    assert "Manual do Aluno" not in text and "Página" not in text
+    assert text == "\n\n".join(bodies)
+    assert normalizer.removed_lines == 12
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("o alu-\nno chegou", "o aluno chegou"),
+    ("uma pesso-\na chegou", "uma pessoa chegou"),
+    ("uma pesso-\nas chegou", "uma pessoas chegou"),
+    ("ninguém pode faltar; pode-\nse entrar", "ninguém pode faltar; pode-se entrar"),
+    ("vou fazê-lo agora e fazê-\nlo bem", "vou fazê-lo agora e fazê-lo bem"),
+    ("o compu-\ntador", "o computador"),
+    ("Rio de-\nJaneiro", "Rio de-\nJaneiro"),
+])
+def test_hyphenated_line_breaks(raw, expected):
+    text, _ = _normalize([raw])
+    assert text == expected
+
+
+def test_hyphen_kept_only_for_words_seen_whole():
+    # "pode" nunca aparece sozinho antes da quebra: não há como saber que é uma palavra inteira.
+    text, _ = _normalize(["pode-\nse entrar"])
+    assert text == "podese entrar"
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("seja bem-\nvindo", "seja bem-vindo"),
+    ("o recém-\nchegado", "o recém-chegado"),
+    ("um guarda-chuva e outro guarda-\nchuva", "um guarda-chuva e outro guarda-chuva"),
+    ("a guarda da chuva e o guarda-\nchuva", "a guarda da chuva e o guarda-chuva"),
+    ("uma palavra em TÍTULO: PALA-\nVRA", "uma palavra em TÍTULO: PALAVRA"),
+    ("o bem e o mal; tam-\nbém", "o bem e o mal; também"),
+])
+def test_hyphenated_compounds(raw, expected):
+    text, _ = _normalize([raw])
+    assert text == expected
+
+
+def test_joined_words_counts_only_removed_hyphens():
+    _, normalizer = _normalize(["o alu-\nno e a pesso-\na, bem-\nvindos; pode ir e pode-\nse ver"])
+    assert normalizer.joined_words == 2
+
+
+def test_hyphenated_word_across_pages():
+    pages = ["primeira página com o alu-", "no estudando", "o que se pode ver", "pode-", "se ler"]
+    text, normalizer = _normalize(pages)
+    assert text == "primeira página com o aluno estudando\n\no que se pode ver\n\npode-se ler"
+    # Cada página começa no offset da sua primeira palavra (a continuação da palavra partida).
+    assert normalizer.page_offsets == [0, text.index("no estudando"), text.index("o que"),
+                                       text.index("pode-se"), text.index("se ler")]
+
+
+def test_streaming_output_matches_full_document():
+    hyphenated = "o alu-\nno e a pesso-\na; pode-se ler e pode-\nse escrever."
+    bodies = [f"{_body(i)}\n{hyphenated}\n{_body(i + 1)}" for i in range(20)]
+    pages = _book(bodies)
+    full, normalizer = _normalize(pages)
+    streamed = PageNormalizer(enabled=True)
+    pieces = [streamed.feed(page) for page in pages] + [streamed.finish()]
+    assert "".join(pieces) == full
+    assert streamed.page_offsets == normalizer.page_offsets
+    assert len(normalizer.page_offsets) == len(pages)
+    for offset, body in zip(normalizer.page_offsets, bodies):
+        assert full[offset:].startswith(body.split("\n")[0])
+    assert full.count("aluno e a pessoa; pode-se ler e pode-se escrever") == len(pages)
@@ -0,0 +1,70 @@
+# test_text_processor.py
+# Testes da pipeline de resumo (fase MAP compartilhada entre requisições)
+
+import asyncio
+import uuid
+
+from app.database.database import AsyncSessionLocal
+from app.services import text_processor
+
+
+def _fake_ai(monkeypatch, summarized: list):
+    async def summarize_pack(pack):
+        summarized.extend(chunk for _, chunk in pack)
+        await asyncio.sleep(0.05)
+        return [f"resumo de {chunk}" for _, chunk in pack]
+
+    async def final_summary(prompt, phase="generate"):
+        await asyncio.sleep(0.01)
+        return "resumo final"
+
+    async def stream_final_summary(prompt):
+        for piece in ("resumo ", "final"):
+            yield piece
+
+    monkeypatch.setattr(text_processor, "_summarize_pack", summarize_pack)
+    monkeypatch.setattr(text_processor, "call_google_ai_for_summary", final_summary)
+    monkeypatch.setattr(text_processor, "stream_google_ai_for_summary", stream_final_summary)
+
+
+def test_stream_and_regular_summary_share_the_map_phase(monkeypatch, run_with_db):
+    summarized = []
+    _fake_ai(monkeypatch, summarized)
+    chunks = [f"trecho {i} {uuid.uuid4().hex}" for i in range(6)]
+
+    async def stream():
+        return [event async for event in text_processor.stream_summary_with_cache(chunks, "ensino médio")]
+
+    async def regular():
+        async with AsyncSessionLocal() as db:
+            return await text_processor.generate_summary_with_cache(db, chunks, "graduação")
+
+    async def main():
+        return await asyncio.gather(stream(), regular())
+
+    events, summary = run_with_db(main)
+    assert summary == "resumo final"
+    assert sorted(summarized) == sorted(chunks)
+    assert events[-1] == ("done", {"summary": "resumo final", "cached": False})
+    assert any(name == "progress" and data["phase"] == "map" for name, data in events)
+    assert text_processor._map_progress == {}
+
+
+def test_late_stream_receives_progress_of_shared_map(monkeypatch, run_with_db):
+    summarized = []
+    _fake_ai(monkeypatch, summarized)
+    chunks = [f"trecho {i} {uuid.uuid4().hex}" for i in range(3)]
+
+    async def main():
+        regular = asyncio.ensure_future(text_processor._shared_partial_summaries(
+            text_processor._create_document_id(chunks), chunks
+        ))
+        await asyncio.sleep(0.01)
+        events = [event async for event in text_processor.stream_summary_with_cache(chunks, "ensino médio")]
+        await regular
+        return events
+
+    events = run_with_db(main)
+    map_events = [data for name, data in events if name == "progress" and data["phase"] == "map"]
+    assert map_events and map_events[-1]["completed"] == map_events[-1]["total"] == 3
+    assert len(summarized) == 3
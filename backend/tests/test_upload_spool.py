@@ -0,0 +1,81 @@
+# test_upload_spool.py
+# Testes da gravação de uploads em disco e do hash calculado durante a leitura
+
+import asyncio
+import hashlib
+import os
+import tempfile
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.services import upload_spool
+
+
+async def _blocks(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def test_spool_stream_writes_file_and_hash():
+    data = os.urandom(300_000)
+    spooled = asyncio.run(upload_spool.spool_stream(_blocks(data, 65536)))
+    try:
+        assert spooled.sha256 == hashlib.sha256(data).hexdigest()
+        assert spooled.size == len(data)
+        with open(spooled.path, "rb") as f:
+            assert f.read() == data
+    finally:
+        spooled.cleanup()
+    assert not os.path.exists(spooled.path)
+
+
+def test_spool_stream_writes_fixed_size_blocks(monkeypatch):
+    writes = []
+    write_block = upload_spool._write_block
+
+    def recording_write_block(spool_file, hasher, block):
+        writes.append(len(block))
+        write_block(spool_file, hasher, block)
+
+    monkeypatch.setattr(upload_spool, "_write_block", recording_write_block)
+    data = os.urandom(10_000)
+    # Pedaços pequenos e irregulares, como os de um cliente qualquer.
+    spooled = asyncio.run(upload_spool.spool_stream(_blocks(data, 700), block_size=4096))
+    try:
+        assert writes == [4096, 4096, 10_000 - 8192]
+        assert spooled.sha256 == hashlib.sha256(data).hexdigest()
+        with open(spooled.path, "rb") as f:
+            assert f.read() == data
+    finally:
+        spooled.cleanup()
+
+
+def test_spool_stream_rejects_oversized_upload(monkeypatch):
+    monkeypatch.setattr(upload_spool, "MAX_UPLOAD_BYTES", 1000)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(upload_spool.spool_stream(_blocks(b"x" * 5000, 512)))
+    assert error.value.status_code == 413
+
+
+def test_spool_upload_file_hashes_in_place_and_copies_only_on_demand():
+    data = os.urandom(200_000)
+    source = tempfile.SpooledTemporaryFile(max_size=1024)
+    source.write(data)
+    upload = UploadFile(file=source, filename="apostila.pdf")
+
+    async def run():
+        spooled = await upload_spool.spool_upload_file(upload, block_size=4096)
+        assert spooled.path is None
+        path = await spooled.ensure_path()
+        assert await spooled.ensure_path() == path
+        return spooled
+
+    spooled = asyncio.run(run())
+    try:
+        assert spooled.sha256 == hashlib.sha256(data).hexdigest()
+        assert spooled.size == len(data)
+        with open(spooled.path, "rb") as f:
+            assert f.read() == data
+    finally:
+        spooled.cleanup()
@@ -0,0 +1,65 @@
+# bench_chunker.py
+# Benchmark do chunker por sentenças contra as janelas fixas originais.
+#
+# Uso (a partir do diretório backend):
+#   python -m tools.bench_chunker --sizes 1 10
+#
+# Para cada tamanho de texto (em MB) mede o tempo de fatiamento, o número de
+# chunks, o total de caracteres enviados à IA (sobreposição incluída) e a
+# fração de chunks que terminam no meio de uma palavra ou de uma sentença.
+
+import argparse
+import random
+import time
+
+from app.services.chunker import (
+    estimate_tokens, fixed_chunk_offsets, sentence_chunk_offsets, find_boundaries
+)
+
+
+def _make_text(size_mb: float) -> str:
+    rng = random.Random(7)
+    words = ["o", "estudo", "da", "função", "derivada", "mostra", "que", "a", "taxa", "de", "variação",
+             "célula", "energia", "processo", "história", "revolução", "análise", "resultado"]
+    target = int(size_mb * 1024 * 1024)
+    paragraphs, length = [], 0
+    while length < target:
+        sentences = []
+        for _ in range(rng.randint(2, 6)):
+            sentence = " ".join(rng.choice(words) for _ in range(rng.randint(6, 30)))
+            sentences.append(sentence.capitalize() + rng.choice([".", ".", ".", "?", "!"]))
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def _report(name: str, text: str, offsets, seconds: float) -> None:
+    boundaries = set(find_boundaries(text))
+    mid_word = sum(1 for _, end in offsets if end < len(text) and not text[end - 1].isspace() and not text[end].isspace())
+    mid_sentence = sum(1 for _, end in offsets if end < len(text) and end not in boundaries)
+    sent_chars = sum(end - start for start, end in offsets)
+    max_tokens = max(estimate_tokens(text[start:end]) for start, end in offsets)
+    print(
+        f"{name:<9} {seconds * 1000:>9.1f} {len(offsets):>8} {sent_chars / len(text):>9.3f}x "
+        f"{max_tokens:>10} {mid_word / len(offsets):>9.1%} {mid_sentence / len(offsets):>12.1%}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark do chunker por sentenças.")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 10], help="Tamanhos de texto em MB.")
+    args = parser.parse_args()
+
+    for size_mb in args.sizes:
+        text = _make_text(size_mb)
+        print(f"\nTexto de {size_mb} MB ({len(text)} caracteres)")
+        print(f"{'chunker':<9} {'tempo ms':>9} {'chunks':>8} {'enviado':>10} {'max tokens':>10} {'meio pal.':>9} {'meio sent.':>12}")
+        for name, fn in (("fixed", fixed_chunk_offsets), ("sentence", sentence_chunk_offsets)):
+            start = time.perf_counter()
+            offsets = fn(text)
+            _report(name, text, offsets, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
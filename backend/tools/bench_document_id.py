@@ -0,0 +1,70 @@
+# bench_document_id.py
+# Microbenchmark do cálculo do document_id: concatenação vs. hash incremental.
+#
+# Uso (a partir do diretório backend):
+#   python -m tools.bench_document_id --sizes 1 4 16
+#
+# Para cada tamanho de documento (em MB), fatia o texto com os parâmetros do
+# backend e mede tempo e pico de memória alocada (tracemalloc) das duas versões.
+
+import argparse
+import hashlib
+import random
+import time
+import tracemalloc
+from typing import Callable, List
+
+from app.core.config import CHUNK_SIZE, CHUNK_OVERLAP
+from app.core.hashing import hash_chunks
+
+
+def _join_and_hash(chunks: List[str]) -> str:
+    """Implementação anterior de _create_document_id."""
+    full_text = "".join(chunks)
+    return hashlib.sha256(full_text.encode('utf-8')).hexdigest()
+
+
+def _make_chunks(size_mb: float) -> List[str]:
+    rng = random.Random(42)
+    words = ["estudo", "análise", "função", "derivada", "integral", "célula", "energia", "história", "é", "de"]
+    target = int(size_mb * 1024 * 1024)
+    parts, length = [], 0
+    while length < target:
+        word = rng.choice(words)
+        parts.append(word)
+        length += len(word) + 1
+    text = " ".join(parts)
+    step = CHUNK_SIZE - CHUNK_OVERLAP
+    return [text[i:i + CHUNK_SIZE] for i in range(0, len(text), step)]
+
+
+def _measure(fn: Callable[[List[str]], str], chunks: List[str], repeat: int) -> tuple:
+    tracemalloc.start()
+    fn(chunks)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        digest = fn(chunks)
+    return digest, (time.perf_counter() - start) / repeat, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Microbenchmark do cálculo do document_id.")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 4, 16], help="Tamanhos de documento em MB.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'MB':>6} {'versão':<12} {'tempo (ms)':>11} {'pico (MB)':>10}")
+    for size_mb in args.sizes:
+        chunks = _make_chunks(size_mb)
+        results = {}
+        for name, fn in (("join", _join_and_hash), ("incremental", hash_chunks)):
+            digest, seconds, peak = _measure(fn, chunks, args.repeat)
+            results[name] = digest
+            print(f"{size_mb:>6.1f} {name:<12} {seconds * 1000:>11.2f} {peak / (1024 * 1024):>10.2f}")
+        assert results["join"] == results["incremental"], "Os dois métodos devem gerar o mesmo document_id."
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# bench_normalizer.py
+# Economia de tokens da normalização do texto extraído, por PDF.
+#
+# Uso (a partir do diretório backend):
+#   python -m tools.make_pdf_corpus bench_corpus/ --pages 1 10 100
+#   python -m tools.bench_normalizer bench_corpus/
+#
+# Para cada PDF do diretório (ou para os arquivos indicados) extrai as páginas e
+# compara o texto bruto (páginas concatenadas) com o normalizado: caracteres e
+# tokens estimados, chunks gerados e linhas de cabeçalho/rodapé removidas. Os
+# tokens dos chunks incluem a sobreposição e são o que a fase MAP envia à IA.
+
+import argparse
+import asyncio
+import time
+from pathlib import Path
+from typing import List
+
+from app.services import chunker, pdf_extractor
+from app.services.text_normalizer import PageNormalizer
+
+
+def _chunk_tokens(text: str) -> tuple:
+    offsets = chunker.chunk_offsets(text)
+    return len(offsets), sum(chunker.estimate_tokens(text[start:end]) for start, end in offsets)
+
+
+async def _bench(paths: List[Path]) -> None:
+    print(f"{'arquivo':<28} {'págs':>5} {'tokens brutos':>14} {'normalizados':>13} {'economia':>9} "
+          f"{'tokens MAP (brutos -> norm.)':>30} {'linhas rem.':>11} {'ms':>7}")
+    total_raw = total_normalized = 0
+    for path in paths:
+        pages = await pdf_extractor.extract_pages(str(path))
+        start = time.perf_counter()
+        normalizer = PageNormalizer(enabled=True)
+        normalized = "".join([normalizer.feed(page_text) for page_text in pages] + [normalizer.finish()])
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        stats = normalizer.stats()
+        _, raw_map = _chunk_tokens("".join(pages))
+        _, normalized_map = _chunk_tokens(normalized)
+        total_raw += raw_map
+        total_normalized += normalized_map
+        print(
+            f"{path.name:<28} {len(pages):>5} {stats['raw_tokens']:>14} {stats['normalized_tokens']:>13} "
+            f"{stats['saved_fraction']:>9.1%} {f'{raw_map} -> {normalized_map}':>30} "
+            f"{stats['removed_lines']:>11} {elapsed_ms:>7.1f}"
+        )
+    if total_raw:
+        print(f"\nTokens enviados na fase MAP: {total_raw} -> {total_normalized} "
+              f"({1 - total_normalized / total_raw:.1%} a menos)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mede a economia de tokens da normalização do texto.")
+    parser.add_argument("paths", nargs="+", help="PDFs ou diretórios com PDFs.")
+    args = parser.parse_args()
+
+    paths: List[Path] = []
+    for name in args.paths:
+        path = Path(name)
+        paths.extend(sorted(path.rglob("*.pdf")) if path.is_dir() else [path])
+    try:
+        asyncio.run(_bench(paths))
+    finally:
+        pdf_extractor.shutdown_executor()
+
+
+if __name__ == "__main__":
+    main()
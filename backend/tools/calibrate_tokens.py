@@ -0,0 +1,80 @@
+# calibrate_tokens.py
+# Mede a razão entre caracteres e tokens do modelo nos materiais reais, para CHUNK_CHARS_PER_TOKEN.
+#
+# Uso (a partir do diretório backend, com GEMINI_API_KEY definida):
+#   python -m tools.calibrate_tokens materiais/ --samples 20
+#
+# Para cada PDF do diretório (ou para os arquivos indicados) extrai e normaliza o
+# texto como no upload, fatia com o chunker atual e conta os tokens de uma amostra
+# de chunks (espalhada pelo documento) com o countTokens da API, que não gera
+# conteúdo. Mostra a razão observada por arquivo e no total, o erro da estimativa
+# atual e o valor a usar em CHUNK_CHARS_PER_TOKEN.
+
+import argparse
+import asyncio
+from pathlib import Path
+from typing import List, Tuple
+
+from app.core.config import CHUNK_CHARS_PER_TOKEN
+from app.services import ai_service, chunker, pdf_extractor, text_processor
+
+
+def _sample(chunks: List[str], samples: int) -> List[str]:
+    if len(chunks) <= samples:
+        return chunks
+    step = len(chunks) / samples
+    return [chunks[int(i * step)] for i in range(samples)]
+
+
+async def _measure(path: Path, samples: int) -> Tuple[int, int, int]:
+    """Retorna (caracteres, tokens medidos, tokens estimados) da amostra de chunks do PDF."""
+    pages = await pdf_extractor.extract_pages(str(path))
+    text, _ = text_processor.normalize_pages(pages)
+    chunks = _sample(text_processor.chunks_from_offsets(text, chunker.chunk_offsets(text)), samples)
+    counts = await asyncio.gather(*(
+        ai_service.client.count_tokens(ai_service.MODEL_NAME, chunk) for chunk in chunks
+    ))
+    estimated = sum(chunker.estimate_tokens(chunk) for chunk in chunks)
+    return sum(len(chunk) for chunk in chunks), sum(counts), estimated
+
+
+async def _calibrate(paths: List[Path], samples: int) -> None:
+    print(f"{'arquivo':<28} {'caracteres':>11} {'tokens':>8} {'chars/token':>12} {'erro da estimativa':>19}")
+    total_chars = total_tokens = total_estimated = 0
+    try:
+        for path in paths:
+            chars, tokens, estimated = await _measure(path, samples)
+            if not tokens:
+                print(f"{path.name:<28} sem texto extraível")
+                continue
+            total_chars += chars
+            total_tokens += tokens
+            total_estimated += estimated
+            print(f"{path.name:<28} {chars:>11} {tokens:>8} {chars / tokens:>12.2f} "
+                  f"{estimated / tokens - 1:>+19.1%}")
+    finally:
+        await ai_service.close_client()
+    if total_tokens:
+        print(f"\nRazão observada: {total_chars / total_tokens:.2f} caracteres por token "
+              f"(atual: {CHUNK_CHARS_PER_TOKEN}; a estimativa atual erra {total_estimated / total_tokens - 1:+.1%}).")
+        print(f"Defina CHUNK_CHARS_PER_TOKEN={total_chars / total_tokens:.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mede a razão caracteres/token dos materiais com o countTokens da API.")
+    parser.add_argument("paths", nargs="+", help="PDFs ou diretórios com PDFs.")
+    parser.add_argument("--samples", type=int, default=20, help="Chunks medidos por PDF.")
+    args = parser.parse_args()
+
+    paths: List[Path] = []
+    for name in args.paths:
+        path = Path(name)
+        paths.extend(sorted(path.rglob("*.pdf")) if path.is_dir() else [path])
+    try:
+        asyncio.run(_calibrate(paths, args.samples))
+    finally:
+        pdf_extractor.shutdown_executor()
+
+
+if __name__ == "__main__":
+    main()
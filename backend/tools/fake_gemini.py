@@ -0,0 +1,126 @@
+# fake_gemini.py
+# Servidor falso da API Gemini para testes locais.
+#
+# Uso (a partir do diretório backend):
+#   uvicorn tools.fake_gemini:app --port 8001
+#   GEMINI_API_BASE_URL=http://127.0.0.1:8001 GEMINI_API_KEY=fake uvicorn app.main:app
+#
+# Implementa os endpoints generateContent, streamGenerateContent e countTokens usados pelo backend
+# (e por tools/calibrate_tokens.py) e responde com conteúdo determinístico compatível com os schemas de app/schemas. Latência, variação e
+# taxas de erro são configuradas pelas variáveis FAKE_GEMINI_* abaixo (usadas por tools/load_test.py).
+
+import asyncio
+import json
+import os
+import random
+import re
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Latência artificial (em segundos) de cada resposta.
+FAKE_GEMINI_LATENCY = float(os.environ.get("FAKE_GEMINI_LATENCY", "0.5"))
+# Variação aleatória somada à latência: uniforme em [0, FAKE_GEMINI_JITTER] segundos.
+FAKE_GEMINI_JITTER = float(os.environ.get("FAKE_GEMINI_JITTER", "0"))
+# Fração das chamadas que falham com 503 (indisponível) e com 429 (limite de taxa).
+FAKE_GEMINI_ERROR_RATE = float(os.environ.get("FAKE_GEMINI_ERROR_RATE", "0"))
+FAKE_GEMINI_RATE_LIMIT_RATE = float(os.environ.get("FAKE_GEMINI_RATE_LIMIT_RATE", "0"))
+# Semente do gerador aleatório, para execuções reprodutíveis.
+FAKE_GEMINI_SEED = os.environ.get("FAKE_GEMINI_SEED")
+
+_random = random.Random(FAKE_GEMINI_SEED)
+
+app = FastAPI(title="Fake Gemini API")
+
+
+def _prompt_text(body: dict) -> str:
+    return "".join(
+        part.get("text", "")
+        for content in body.get("contents", [])
+        for part in content.get("parts", [])
+    )
+
+
+def _json_payload(prompt: str) -> dict:
+    """Escolhe o formato de resposta conforme o gerador que enviou o prompt."""
+    if "Fragmentos:\n" in prompt:
+        fragments = json.loads(prompt.split("Fragmentos:\n", 1)[1])
+        return {"resumos": [
+            {"id": fragment["id"], "resumo": f"- {fragment['texto'][-200:].strip()}"} for fragment in fragments
+        ]}
+    if "flashcards" in prompt:
+        return {"flashcards": [{"frente": f"Conceito {i}?", "verso": f"Definição {i}."} for i in range(1, 6)]}
+    if "alternativas (A, B, C, D)" in prompt:
+        return {"perguntas": [
+            {
+                "pergunta": f"Pergunta {i}?",
+                "alternativas": {"A": "Opção A", "B": "Opção B", "C": "Opção C", "D": "Opção D"},
+                "resposta_correta": "A",
+            }
+            for i in range(1, 6)
+        ]}
+    return {"quiz": [
+        {
+            "pergunta": f"Pergunta {i}?",
+            "tipo": "multipla_escolha",
+            "opcoes": ["A", "B", "C", "D"],
+            "resposta_correta": "A",
+            "explicacao": "Explicação.",
+        }
+        for i in range(1, 6)
+    ]}
+
+
+def _response_text(body: dict) -> str:
+    prompt = _prompt_text(body)
+    if body.get("generationConfig", {}).get("responseMimeType") == "application/json":
+        return json.dumps(_json_payload(prompt), ensure_ascii=False)
+    return f"## Resumo\n\n- {prompt[-200:].strip()}"
+
+
+async def _simulate_latency() -> JSONResponse | None:
+    """Aguarda a latência simulada e, conforme as taxas configuradas, devolve uma resposta de erro."""
+    await asyncio.sleep(FAKE_GEMINI_LATENCY + _random.uniform(0, FAKE_GEMINI_JITTER))
+    draw = _random.random()
+    if draw < FAKE_GEMINI_ERROR_RATE:
+        return JSONResponse({"error": {"code": 503, "status": "UNAVAILABLE"}}, status_code=503)
+    if draw < FAKE_GEMINI_ERROR_RATE + FAKE_GEMINI_RATE_LIMIT_RATE:
+        return JSONResponse({"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}}, status_code=429)
+    return None
+
+
+def _candidate(text: str) -> dict:
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}]}
+
+
+@app.post("/v1beta/models/{model}:generateContent")
+async def generate_content(model: str, request: Request):
+    body = await request.json()
+    error = await _simulate_latency()
+    if error is not None:
+        return error
+    return _candidate(_response_text(body))
+
+
+@app.post("/v1beta/models/{model}:streamGenerateContent")
+async def stream_generate_content(model: str, request: Request):
+    body = await request.json()
+    text = _response_text(body)
+    error = await _simulate_latency()
+    if error is not None:
+        return error
+
+    async def events():
+        # Envia a resposta em pedaços de ~20 caracteres, como o streaming real.
+        for start in range(0, len(text), 20):
+            yield f"data: {json.dumps(_candidate(text[start:start + 20]), ensure_ascii=False)}\r\n\r\n"
+            await asyncio.sleep(0.02)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/v1beta/models/{model}:countTokens")
+async def count_tokens(model: str, request: Request):
+    # Aproximação determinística: cada palavra ou sinal de pontuação conta como um token.
+    body = await request.json()
+    return {"totalTokens": len(re.findall(r"\w+|[^\w\s]", _prompt_text(body)))}
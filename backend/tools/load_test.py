@@ -0,0 +1,397 @@
+# load_test.py
+# Benchmark de ponta a ponta da API contra o servidor falso da Gemini.
+#
+# Uso (a partir do diretório backend):
+#   python -m tools.make_pdf_corpus bench_corpus/
+#   python -m tools.load_test bench_corpus/ --concurrency 8 --requests 40 --output bench.json
+#
+# Sobe o servidor falso (tools/fake_gemini.py, com latência, variação e taxas de erro
+# configuráveis) e a API com um banco SQLite temporário, e dispara cada cenário com
+# concorrência fixa: upload de cada PDF do corpus e cada endpoint /generate-*. Para cada
+# cenário informa latência p50/p95/p99, vazão, erros, memória (RSS) e threads da API,
+# e grava tudo em JSON (--output) para comparar execuções entre commits.
+#
+# Com --cache cold (padrão) cada requisição usa um conteúdo diferente, forçando falhas
+# nos caches; com --cache warm todas repetem o mesmo conteúdo. Para medir uma API já
+# em execução, use --base-url (e --server-pid para as medidas de memória e threads).
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+API_PREFIX = "/api/v1"
+GENERATOR_SCENARIOS = [
+    "summary", "summaries", "summary-stream", "quiz", "flashcards", "study-plan", "questions"
+]
+
+
+# --- Processos (servidor falso e API) ---
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(app_path: str, port: int, env: Dict[str, str], verbose: bool) -> subprocess.Popen:
+    # Sem --verbose, os logs dos servidores são descartados para não misturar com a tabela.
+    output = None if verbose else subprocess.DEVNULL
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app_path, "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env={**os.environ, **env}, stdout=output, stderr=output
+    )
+
+
+async def _wait_ready(client: httpx.AsyncClient, url: str, process: subprocess.Popen | None) -> None:
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"O servidor em {url} encerrou com código {process.returncode}.")
+        try:
+            await client.get(url, timeout=2)
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"O servidor em {url} não respondeu a tempo.")
+
+
+def _read_status(pid: int) -> Dict[str, int]:
+    fields = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "Threads", "PPid"):
+                fields[key] = int(value.split()[0])
+    return fields
+
+
+def _process_stats(pid: int | None) -> Dict[str, float] | None:
+    """RSS (MB) e threads do processo da API, e RSS somado dos filhos (pool de extração). Só no Linux."""
+    if pid is None or not os.path.exists(f"/proc/{pid}/status"):
+        return None
+    try:
+        main = _read_status(pid)
+    except OSError:
+        return None
+    children_rss = 0
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            status = _read_status(int(entry))
+        except OSError:
+            continue
+        if status.get("PPid") == pid:
+            children_rss += status.get("VmRSS", 0)
+    return {
+        "rss_mb": main.get("VmRSS", 0) / 1024,
+        "threads": main.get("Threads", 0),
+        "children_rss_mb": children_rss / 1024,
+    }
+
+
+class _StatsSampler:
+    """Amostra periodicamente a memória e as threads da API enquanto um cenário roda."""
+
+    def __init__(self, pid: int | None, interval: float = 0.25):
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[Dict[str, float]] = []
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            stats = _process_stats(self.pid)
+            if stats is not None:
+                self.samples.append(stats)
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> Dict[str, float] | None:
+        self._task.cancel()
+        final = _process_stats(self.pid)
+        if final is not None:
+            self.samples.append(final)
+        if not self.samples:
+            return None
+        return {
+            "rss_peak_mb": round(max(s["rss_mb"] for s in self.samples), 1),
+            "rss_end_mb": round(self.samples[-1]["rss_mb"], 1),
+            "children_rss_peak_mb": round(max(s["children_rss_mb"] for s in self.samples), 1),
+            "threads_peak": max(s["threads"] for s in self.samples),
+            "threads_end": self.samples[-1]["threads"],
+        }
+
+
+# --- Cenários ---
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """Percentil pelo método do posto mais próximo."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def _vary(text: str, tag: str, cold: bool) -> str:
+    return f"[requisição {tag}]\n{text}" if cold else text
+
+
+async def _request_upload(client: httpx.AsyncClient, pdf_bytes: bytes, name: str, compact: bool, n: int, cold: bool) -> int:
+    # Um comentário após o %%EOF muda o hash do arquivo sem alterar o conteúdo extraído.
+    content = pdf_bytes + f"%bench-{n}\n".encode() if cold else pdf_bytes
+    response = await client.post(
+        f"{API_PREFIX}/upload-pdf/", params={"compact": str(compact).lower()},
+        files={"file": (name, content, "application/pdf")}
+    )
+    return response.status_code
+
+
+def _generator_request(scenario: str, text: str, chunks: List[str], levels: List[str], n: int, cold: bool):
+    """(caminho, corpo JSON) da n-ésima requisição do cenário."""
+    # O nome do cenário entra na marca para que um cenário não encontre os resultados de outro no cache.
+    tag = f"{scenario} {n}"
+    varied_chunks = [_vary(chunk, tag, cold) for chunk in chunks]
+    if scenario == "summary":
+        return "/generate-summary/", {"chunks": varied_chunks, "level": levels[0]}
+    if scenario == "summaries":
+        return "/generate-summaries/", {"chunks": varied_chunks, "levels": levels}
+    if scenario == "summary-stream":
+        return "/generate-summary/stream/", {"chunks": varied_chunks, "level": levels[0]}
+    body_text = _vary(text, tag, cold)
+    if scenario == "quiz":
+        return "/generate-quiz/", {"text": body_text, "studentLevel": levels[0]}
+    if scenario == "flashcards":
+        return "/generate-flashcards/", {"text": body_text, "studentLevel": levels[0]}
+    if scenario == "study-plan":
+        return "/generate-study-plan/", {"text": body_text, "studentLevel": levels[0], "days": 7}
+    if scenario == "questions":
+        return "/generate-questions/", {"text": body_text, "count": 5, "difficulty": "médio"}
+    raise ValueError(f"Cenário desconhecido: {scenario}")
+
+
+async def _request_generator(client: httpx.AsyncClient, path: str, body: dict) -> int:
+    if path.endswith("/stream/"):
+        # O tempo medido vai até o último evento, não só até os cabeçalhos.
+        async with client.stream("POST", f"{API_PREFIX}{path}", json=body) as response:
+            await response.aread()
+            return response.status_code
+    response = await client.post(f"{API_PREFIX}{path}", json=body)
+    return response.status_code
+
+
+async def _run_scenario(
+    client: httpx.AsyncClient, name: str, make_request: Callable[[int], object],
+    args: argparse.Namespace, server_pid: int | None
+) -> dict:
+    """Executa `args.requests` requisições com `args.concurrency` em paralelo e resume os resultados."""
+    for n in range(args.warmup):
+        await make_request(-1 - n)
+
+    latencies: List[float] = []
+    status_codes: Dict[str, int] = {}
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index
+        while next_index < args.requests:
+            n = next_index
+            next_index += 1
+            start = time.perf_counter()
+            try:
+                code = str(await make_request(n))
+            except httpx.HTTPError as e:
+                code = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            status_codes[code] = status_codes.get(code, 0) + 1
+
+    sampler = _StatsSampler(server_pid)
+    sampler.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    duration = time.perf_counter() - start
+    server = await sampler.stop()
+
+    latencies.sort()
+    errors = sum(count for code, count in status_codes.items() if not code.startswith("2"))
+    result = {
+        "requests": len(latencies),
+        "concurrency": args.concurrency,
+        "errors": errors,
+        "status_codes": status_codes,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 3) if duration else 0.0,
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 50) * 1000, 1),
+            "p95": round(_percentile(latencies, 95) * 1000, 1),
+            "p99": round(_percentile(latencies, 99) * 1000, 1),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+            "max": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        },
+        "server": server,
+    }
+    print(
+        f"{name:<28} p50 {result['latency_ms']['p50']:>9.1f} ms  p95 {result['latency_ms']['p95']:>9.1f} ms  "
+        f"p99 {result['latency_ms']['p99']:>9.1f} ms  {result['throughput_rps']:>8.2f} req/s  "
+        f"erros {errors:>3}  RSS {server['rss_peak_mb'] if server else '-'} MB  "
+        f"threads {server['threads_peak'] if server else '-'}",
+        flush=True
+    )
+    return result
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def _benchmark(args: argparse.Namespace, base_url: str, server_pid: int | None) -> dict:
+    corpus = Path(args.corpus)
+    pdfs = sorted(corpus.glob("*.pdf"))
+    if not pdfs:
+        raise SystemExit(f"Nenhum PDF em {corpus}. Gere o corpus com python -m tools.make_pdf_corpus.")
+    text_pdf = corpus / args.text_pdf if args.text_pdf else pdfs[0]
+    text = text_pdf.with_suffix(".txt").read_text(encoding="utf-8")
+    cold = args.cache == "cold"
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        await _wait_ready(client, f"{base_url}/", None)
+        # Chunks de referência para os cenários de resumo, fatiados pela própria API.
+        response = await client.post(
+            f"{API_PREFIX}/upload-pdf/", files={"file": (text_pdf.name, text_pdf.read_bytes(), "application/pdf")}
+        )
+        response.raise_for_status()
+        chunks = response.json()["chunks"]
+        print(f"Texto dos geradores: {text_pdf.name} ({len(text)} caracteres, {len(chunks)} chunks).", flush=True)
+
+        results = {}
+        if "upload" in args.scenarios:
+            for pdf in pdfs:
+                pdf_bytes = pdf.read_bytes()
+                results[f"upload-pdf:{pdf.name}"] = await _run_scenario(
+                    client, f"upload-pdf:{pdf.name}",
+                    lambda n, pdf_bytes=pdf_bytes, name=pdf.name: _request_upload(
+                        client, pdf_bytes, name, args.compact, n, cold
+                    ),
+                    args, server_pid
+                )
+        for scenario in args.scenarios:
+            if scenario == "upload":
+                continue
+            results[scenario] = await _run_scenario(
+                client, scenario,
+                lambda n, scenario=scenario: _request_generator(
+                    client, *_generator_request(scenario, text, chunks, args.levels, n, cold)
+                ),
+                args, server_pid
+            )
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "cache": args.cache,
+            "compact": args.compact,
+            "text_pdf": text_pdf.name,
+            "ai_latency": args.ai_latency,
+            "ai_jitter": args.ai_jitter,
+            "ai_error_rate": args.ai_error_rate,
+            "ai_rate_limit_rate": args.ai_rate_limit_rate,
+        },
+        "scenarios": results,
+    }
+
+
+async def _main(args: argparse.Namespace) -> dict:
+    if args.base_url:
+        return await _benchmark(args, args.base_url.rstrip("/"), args.server_pid)
+
+    processes: List[subprocess.Popen] = []
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp_dir:
+        try:
+            fake_port, api_port = _free_port(), _free_port()
+            processes.append(_start_server("tools.fake_gemini:app", fake_port, {
+                "FAKE_GEMINI_LATENCY": str(args.ai_latency),
+                "FAKE_GEMINI_JITTER": str(args.ai_jitter),
+                "FAKE_GEMINI_ERROR_RATE": str(args.ai_error_rate),
+                "FAKE_GEMINI_RATE_LIMIT_RATE": str(args.ai_rate_limit_rate),
+                "FAKE_GEMINI_SEED": str(args.seed),
+            }, args.verbose))
+            api = _start_server("app.main:app", api_port, {
+                "GEMINI_API_BASE_URL": f"http://127.0.0.1:{fake_port}",
+                "GEMINI_API_KEY": "bench",
+                "DATABASE_URL": f"sqlite+aiosqlite:///{tmp_dir}/bench.db",
+            }, args.verbose)
+            processes.append(api)
+            async with httpx.AsyncClient() as client:
+                await _wait_ready(client, f"http://127.0.0.1:{fake_port}/docs", processes[0])
+                await _wait_ready(client, f"http://127.0.0.1:{api_port}/", api)
+            return await _benchmark(args, f"http://127.0.0.1:{api_port}", api.pid)
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de ponta a ponta da API com o servidor falso da Gemini.")
+    parser.add_argument("corpus", help="Diretório gerado por tools.make_pdf_corpus.")
+    parser.add_argument(
+        "--scenarios", nargs="+", default=["upload"] + GENERATOR_SCENARIOS,
+        choices=["upload"] + GENERATOR_SCENARIOS
+    )
+    parser.add_argument("--concurrency", type=int, default=8, help="Requisições em paralelo.")
+    parser.add_argument("--requests", type=int, default=40, help="Requisições medidas por cenário.")
+    parser.add_argument("--warmup", type=int, default=0, help="Requisições de aquecimento (não medidas) por cenário.")
+    parser.add_argument("--cache", choices=["cold", "warm"], default="cold", help="Conteúdo novo a cada requisição (cold) ou repetido (warm).")
+    parser.add_argument("--compact", action="store_true", help="Uploads com ?compact=true (document_handle).")
+    parser.add_argument("--text-pdf", help="PDF do corpus cujo texto alimenta os geradores (padrão: o primeiro).")
+    parser.add_argument("--levels", nargs="+", default=["ensino médio", "graduação"], help="Níveis de aluno.")
+    parser.add_argument("--timeout", type=float, default=300, help="Timeout de cada requisição (s).")
+    parser.add_argument("--ai-latency", type=float, default=0.5, help="Latência do servidor falso (s).")
+    parser.add_argument("--ai-jitter", type=float, default=0.2, help="Variação máxima somada à latência (s).")
+    parser.add_argument("--ai-error-rate", type=float, default=0.0, help="Fração de respostas 503.")
+    parser.add_argument("--ai-rate-limit-rate", type=float, default=0.0, help="Fração de respostas 429.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--base-url", help="Usa uma API já em execução em vez de subir uma.")
+    parser.add_argument("--server-pid", type=int, help="PID da API em --base-url, para memória e threads.")
+    parser.add_argument("--verbose", action="store_true", help="Mostra os logs dos servidores.")
+    parser.add_argument("--output", help="Arquivo JSON com os resultados (padrão: só a tabela).")
+    args = parser.parse_args()
+
+    report = asyncio.run(_main(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Resultados gravados em {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
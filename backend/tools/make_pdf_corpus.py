@@ -0,0 +1,117 @@
+# make_pdf_corpus.py
+# Gera um corpus de PDFs sintéticos para benchmarks (de 1 a 500 páginas).
+#
+# Uso (a partir do diretório backend):
+#   python -m tools.make_pdf_corpus bench_corpus/ --pages 1 10 100 500
+#
+# Os PDFs são escritos diretamente (fonte Helvetica, sem dependências externas),
+# com cabeçalho e rodapé em cada página como em apostilas reais. Para cada PDF é
+# gravado também um .txt com o mesmo texto, usado como entrada dos geradores pelo
+# tools/load_test.py. O conteúdo é determinístico: a mesma semente gera os mesmos arquivos.
+
+import argparse
+import random
+from pathlib import Path
+from typing import List
+
+WORDS = [
+    "o", "a", "de", "que", "estudo", "da", "função", "derivada", "mostra", "taxa", "variação", "célula",
+    "energia", "processo", "história", "revolução", "análise", "resultado", "equação", "sistema",
+    "conceito", "exemplo", "período", "população", "teoria", "modelo", "método", "conjunto", "valor",
+]
+LINES_PER_PAGE = 54
+CHARS_PER_LINE = 95
+FONT_SIZE = 10
+LEADING = 13
+
+
+def _paragraph_lines(rng: random.Random) -> List[str]:
+    sentences = []
+    for _ in range(rng.randint(2, 6)):
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 24)))
+        sentences.append(sentence.capitalize() + rng.choice([".", ".", ".", "?", ";"]))
+    lines, current = [], ""
+    for word in " ".join(sentences).split(" "):
+        if current and len(current) + 1 + len(word) > CHARS_PER_LINE:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    lines.append(current)
+    return lines
+
+
+def make_pages(total_pages: int, seed: int) -> List[List[str]]:
+    """Linhas de texto de cada página, incluindo cabeçalho e rodapé."""
+    rng = random.Random(seed)
+    pages: List[List[str]] = []
+    body: List[str] = []
+    for number in range(1, total_pages + 1):
+        while len(body) < LINES_PER_PAGE:
+            body.extend(_paragraph_lines(rng) + [""])
+        header = f"Apostila de Estudos - Capítulo {(number - 1) // 20 + 1}"
+        footer = f"Página {number} de {total_pages}"
+        pages.append([header, ""] + body[:LINES_PER_PAGE] + ["", footer])
+        body = body[LINES_PER_PAGE:]
+    return pages
+
+
+def _escape(line: str) -> bytes:
+    # Strings literais do PDF: parênteses e barras invertidas precisam de escape.
+    escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return escaped.encode("cp1252", errors="replace")
+
+
+def write_pdf(path: Path, pages: List[List[str]]) -> None:
+    """Escreve um PDF mínimo (objetos, tabela xref e trailer) com uma página por lista de linhas."""
+    objects: List[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # /Pages, preenchido depois de numerar as páginas
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for lines in pages:
+        content = b"BT /F1 %d Tf %d TL 50 800 Td " % (FONT_SIZE, LEADING)
+        content += b"".join(b"(" + _escape(line) + b") Tj T* " for line in lines) + b"ET"
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    path.write_bytes(bytes(output))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Gera PDFs sintéticos para benchmarks.")
+    parser.add_argument("directory", help="Diretório de saída.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 500], help="Páginas de cada PDF.")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    directory = Path(args.directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for total_pages in args.pages:
+        pages = make_pages(total_pages, args.seed + total_pages)
+        name = f"paginas_{total_pages:03d}"
+        write_pdf(directory / f"{name}.pdf", pages)
+        (directory / f"{name}.txt").write_text("\n".join("\n".join(lines) for lines in pages), encoding="utf-8")
+        size_kb = (directory / f"{name}.pdf").stat().st_size / 1024
+        print(f"{name}.pdf: {total_pages} páginas, {size_kb:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+# precompute.py
+# Pré-cálculo em lote dos caches para os materiais de um curso.
+#
+# Uso (a partir do diretório backend):
+#   python -m tools.precompute materiais/ --levels "ensino médio" graduação \
+#       --generators summary quiz flashcards --concurrency 2 --batch-size 20
+#
+# Para cada PDF do diretório (e subdiretórios): extrai e fatia o texto (cache de
+# extração), gera o resumo de cada nível (com uma única fase MAP por documento) e
+# as respostas dos geradores, usando os mesmos serviços da API e respeitando o
+# agendador de chamadas à IA. Os resultados são gravados no SummaryCache e no
+# cache de gerações em lotes, com uma transação por lote. Os itens gravados são
+# registrados no arquivo de estado (--state): ao rodar de novo, são pulados.
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import GENERATION_CACHE_TTL
+from app.core.hashing import hash_chunks, hash_file
+from app.database import init_db, close_db
+from app.database.database import AsyncSessionLocal
+from app.repositories import (
+    extraction_cache_repository, summary_cache_repository, generation_cache_repository
+)
+from app.services import ai_service, chunker, pdf_extractor, text_normalizer, text_processor
+
+GENERATORS = ["summary"] + list(ai_service.PRECOMPUTABLE_GENERATORS)
+
+
+def _item_id(pdf_sha256: str, generator: str, level: str) -> str:
+    # Inclui as versões de normalização/prompt/chunking: ao mudarem, o item é recalculado.
+    if generator == "summary":
+        version = f"{chunker.chunking_signature()}:{text_processor.MAP_PROMPT_VERSION}"
+    else:
+        version = ai_service.PRECOMPUTABLE_GENERATORS[generator][0].version
+    return f"{pdf_sha256}:{text_normalizer.normalization_signature()}:{generator}:{level}:{version}"
+
+
+class _State:
+    """Itens já gravados no banco, persistidos em um arquivo JSON."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.done = set(json.load(f).get("done", []))
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self.done
+
+    def mark(self, item_ids: List[str]) -> None:
+        self.done.update(item_ids)
+        # Escrita atômica: uma interrupção nunca deixa o arquivo pela metade.
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"done": sorted(self.done)}, f)
+        os.replace(tmp_path, self.path)
+
+
+class _Progress:
+    def __init__(self, total: int):
+        self.total = total
+        self.completed = 0
+        self.failed_documents = 0
+        self.start = time.monotonic()
+
+    def report(self, name: str, generator: str, level: str, status: str, count: int = 1) -> None:
+        self.completed += count
+        elapsed = time.monotonic() - self.start
+        remaining = self.total - self.completed
+        eta = elapsed / self.completed * remaining if self.completed else 0
+        print(
+            f"[{self.completed}/{self.total}] {name} · {generator} · {level}: {status} "
+            f"({elapsed:.0f}s decorridos, ~{eta:.0f}s restantes)",
+            flush=True
+        )
+
+
+class _BatchWriter:
+    """
+    Acumula resumos e respostas geradas e os grava a cada `batch_size` itens,
+    em uma única transação por lote. Só depois do commit os itens entram no estado.
+    """
+
+    def __init__(self, state: _State, batch_size: int):
+        self.state = state
+        self.batch_size = batch_size
+        self.written = 0
+        self._summaries: List[Tuple[str, str, str]] = []
+        self._generations: List[Tuple[str, str, str]] = []
+        self._item_ids: List[str] = []
+        self._lock = asyncio.Lock()
+
+    async def add_summary(self, item_id: str, document_id: str, level: str, summary_text: str) -> None:
+        self._summaries.append((document_id, level, summary_text))
+        self._item_ids.append(item_id)
+        await self._flush_if_full()
+
+    async def add_generation(self, item_id: str, cache_key: str, endpoint: str, payload: str) -> None:
+        self._generations.append((cache_key, endpoint, payload))
+        self._item_ids.append(item_id)
+        await self._flush_if_full()
+
+    async def _flush_if_full(self) -> None:
+        if len(self._item_ids) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            summaries, generations, item_ids = self._summaries, self._generations, self._item_ids
+            self._summaries, self._generations, self._item_ids = [], [], []
+            if not item_ids:
+                return
+            for attempt in range(2):
+                async with AsyncSessionLocal() as db:
+                    try:
+                        added = await summary_cache_repository.add_summaries_bulk(db, summaries)
+                        added += await generation_cache_repository.add_generations_bulk(
+                            db, generations, GENERATION_CACHE_TTL
+                        )
+                        await db.commit()
+                        break
+                    except IntegrityError:
+                        # A API gravou parte do lote no meio tempo; a nova tentativa ignora o que já existe.
+                        await db.rollback()
+                        if attempt:
+                            raise
+            self.written += added
+            self.state.mark(item_ids)
+            print(f"Lote gravado: {added} novos registros ({len(item_ids)} itens).", flush=True)
+
+
+def _hash_path(path: Path) -> str:
+    with open(path, "rb") as f:
+        return hash_file(f)
+
+
+async def _load_document(path: Path, pdf_sha256: str) -> Tuple[str, List[str]]:
+    """Texto completo e chunks do PDF, pelo cache de extração (preenchendo-o se preciso)."""
+    cache_key = text_processor.create_extraction_key(pdf_sha256)
+    async with AsyncSessionLocal() as db:
+        entry = await extraction_cache_repository.get_document(db, cache_key)
+        if entry is not None:
+            full_text = entry.full_text
+            return full_text, text_processor.chunks_from_offsets(
+                full_text, extraction_cache_repository.get_chunk_offsets(entry)
+            )
+        full_text, page_offsets = await text_processor.extract_document_async(str(path))
+        if not full_text.strip():
+            raise ValueError("O PDF parece estar vazio ou não contém texto extraível.")
+        offsets = text_processor.chunk_offsets(full_text)
+        await extraction_cache_repository.save_extraction_to_cache(
+            db, cache_key=cache_key, pdf_sha256=pdf_sha256, full_text=full_text,
+            chunk_offsets=offsets, page_offsets=page_offsets
+        )
+        return full_text, text_processor.chunks_from_offsets(full_text, offsets)
+
+
+async def _precompute_summaries(
+    name: str, pdf_sha256: str, chunks: List[str], levels: List[str],
+    writer: _BatchWriter, progress: _Progress
+) -> None:
+    document_id = hash_chunks(chunks)
+    missing = []
+    async with AsyncSessionLocal() as db:
+        for level in levels:
+            if await summary_cache_repository.get_cached_summary(db, document_id, level):
+                writer.state.mark([_item_id(pdf_sha256, "summary", level)])
+                progress.report(name, "summary", level, "em cache")
+            else:
+                missing.append(level)
+        if not missing:
+            return
+        summaries: Dict[str, str] = await text_processor.summarize_levels(chunks, missing, db)
+    for level, summary_text in summaries.items():
+        await writer.add_summary(_item_id(pdf_sha256, "summary", level), document_id, level, summary_text)
+        progress.report(name, "summary", level, "gerado")
+
+
+async def _precompute_generation(
+    name: str, pdf_sha256: str, text: str, generator: str, level: str,
+    writer: _BatchWriter, progress: _Progress
+) -> None:
+    cache, generate = ai_service.PRECOMPUTABLE_GENERATORS[generator]
+    item_id = _item_id(pdf_sha256, generator, level)
+    # Mesmos parâmetros usados pelos endpoints, para que a chave coincida.
+    cache_key = cache.make_key({"text": text, "studentLevel": level})
+    async with AsyncSessionLocal() as db:
+        if await generation_cache_repository.get_cached_generation(db, cache_key):
+            writer.state.mark([item_id])
+            progress.report(name, generator, level, "em cache")
+            return
+    value = await generate(text, level)
+    await writer.add_generation(item_id, cache_key, cache.endpoint, value.model_dump_json())
+    progress.report(name, generator, level, "gerado")
+
+
+async def _process_document(
+    path: Path, args: argparse.Namespace, state: _State, writer: _BatchWriter, progress: _Progress
+) -> None:
+    name = path.name
+    pdf_sha256 = await asyncio.to_thread(_hash_path, path)
+    pending = [
+        (generator, level) for generator in args.generators for level in args.levels
+        if _item_id(pdf_sha256, generator, level) not in state
+    ]
+    skipped = len(args.generators) * len(args.levels) - len(pending)
+    if skipped:
+        progress.report(name, "*", "*", "já calculado", count=skipped)
+    if not pending:
+        return
+
+    try:
+        full_text, chunks = await _load_document(path, pdf_sha256)
+        summary_levels = [level for generator, level in pending if generator == "summary"]
+        tasks = [
+            _precompute_generation(name, pdf_sha256, full_text, generator, level, writer, progress)
+            for generator, level in pending if generator != "summary"
+        ]
+        if summary_levels:
+            tasks.append(_precompute_summaries(name, pdf_sha256, chunks, summary_levels, writer, progress))
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    except Exception as e:
+        results = [e]
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        # Itens que falharam não entram no estado e são refeitos na próxima execução.
+        progress.failed_documents += 1
+        print(f"Falha em {name} ({len(errors)} erros): {getattr(errors[0], 'detail', errors[0])}", flush=True)
+
+
+async def _main(args: argparse.Namespace) -> int:
+    unknown = set(args.generators) - set(GENERATORS)
+    if unknown:
+        print(f"Geradores desconhecidos: {', '.join(sorted(unknown))}. Disponíveis: {', '.join(GENERATORS)}.")
+        return 2
+    pdfs = sorted(p for p in Path(args.directory).rglob("*") if p.is_file() and p.suffix.lower() == ".pdf")
+    if not pdfs:
+        print(f"Nenhum PDF encontrado em {args.directory}.")
+        return 1
+
+    await init_db()
+    state = _State(args.state)
+    writer = _BatchWriter(state, args.batch_size)
+    progress = _Progress(len(pdfs) * len(args.generators) * len(args.levels))
+    print(f"{len(pdfs)} PDFs, níveis {args.levels}, geradores {args.generators}.", flush=True)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def run(path: Path) -> None:
+        async with semaphore:
+            await _process_document(path, args, state, writer, progress)
+
+    try:
+        await asyncio.gather(*(run(path) for path in pdfs))
+    finally:
+        # Grava o que já foi gerado mesmo se a execução for interrompida.
+        await writer.flush()
+        async with AsyncSessionLocal() as db:
+            await generation_cache_repository.evict_generations(db)
+        pdf_extractor.shutdown_executor()
+        await ai_service.close_client()
+        await close_db()
+
+    print(
+        f"Concluído em {time.monotonic() - progress.start:.0f}s: {writer.written} registros gravados, "
+        f"{progress.failed_documents} PDFs com falha (rode de novo para refazê-los).",
+        flush=True
+    )
+    return 1 if progress.failed_documents else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pré-calcula resumos e gerações para os PDFs de um diretório.")
+    parser.add_argument("directory", help="Diretório com os PDFs (busca recursiva).")
+    parser.add_argument("--levels", nargs="+", required=True, help="Níveis de aluno.")
+    parser.add_argument("--generators", nargs="+", default=GENERATORS, help=f"Entre {GENERATORS}.")
+    parser.add_argument("--concurrency", type=int, default=2, help="PDFs processados ao mesmo tempo.")
+    parser.add_argument("--batch-size", type=int, default=20, help="Itens gravados por transação.")
+    parser.add_argument("--state", default="precompute_state.json", help="Arquivo de estado para retomar.")
+    raise SystemExit(asyncio.run(_main(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()